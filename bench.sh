@@ -0,0 +1 @@
+cd src && python3 -m benchmarks "$@"
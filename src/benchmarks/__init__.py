@@ -0,0 +1,5 @@
+# Benchmarks for the site generator. Run them from src/:
+#     python3 -m benchmarks            (the whole suite, as JSON)
+#     python3 -m benchmarks.memory     (node tree memory for one big page)
+#     python3 -m benchmarks.inline     (inline parsing, old vs new)
+# or just use bench.sh from the top of the repo, which runs the suite.
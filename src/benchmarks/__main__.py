@@ -0,0 +1,132 @@
+import argparse, contextlib, io, json, os, platform, shutil, subprocess, sys, tempfile, time
+
+from markdown_to_nodes import text_to_textnodes, markdown_to_html_node, scan_blocks, create_list_from_lines
+from main import build
+from benchmarks.corpus import synthetic_markdown, write_site
+from benchmarks.lists import deep_list
+
+# The benchmark suite. Runs every benchmark (or the ones named with --only)
+# and emits the results as JSON, so runs from different commits can be saved
+# and compared with --compare.
+
+def best_of(repeat, function):
+    # Best wall time of repeat runs. Best (not mean) is the least noisy.
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return best
+
+def bench_text_to_textnodes(args):
+    md = synthetic_markdown(args.size, args.seed)
+    blocks = md.split("\n\n")
+    def run():
+        for block in blocks:
+            text_to_textnodes(block)
+    seconds = best_of(args.repeat, run)
+    return {"seconds": seconds, "bytes": len(md), "mb_per_s": len(md) / seconds / 1e6}
+
+def bench_scan_blocks(args):
+    # Splitting and classifying blocks, without building anything.
+    md = synthetic_markdown(args.size, args.seed)
+    seconds = best_of(args.repeat, lambda : sum(1 for block in scan_blocks(md)))
+    return {"seconds": seconds, "bytes": len(md), "mb_per_s": len(md) / seconds / 1e6}
+
+def bench_markdown_to_html_node(args):
+    md = synthetic_markdown(args.size, args.seed)
+    def run():
+        # The blocks are built lazily, so make sure they all get built.
+        list(markdown_to_html_node(md).children)
+    seconds = best_of(args.repeat, run)
+    return {"seconds": seconds, "bytes": len(md), "mb_per_s": len(md) / seconds / 1e6}
+
+def bench_nested_list(args):
+    # One deeply nested outline, through the list builder alone.
+    lines = deep_list(args.list_items, args.seed, run = max(1, args.list_items // 10))
+    seconds = best_of(args.repeat, lambda : create_list_from_lines(list(lines)))
+    return {"seconds": seconds, "items": len(lines), "us_per_item": seconds / len(lines) * 1e6}
+
+def bench_to_html(args):
+    node = markdown_to_html_node(synthetic_markdown(args.size, args.seed))
+    node.children = list(node.children)
+    size = len(node.to_html())
+    seconds = best_of(args.repeat, node.to_html)
+    return {"seconds": seconds, "bytes": size, "mb_per_s": size / seconds / 1e6}
+
+def bench_build(args):
+    # A whole site build, from scratch and then again with nothing changed.
+    root = tempfile.mkdtemp()
+    try:
+        size = write_site(root, pages = args.pages, page_size = args.page_size, seed = args.seed)
+        paths = {
+            "static_path": os.path.join(root, "static"),
+            "content_path": os.path.join(root, "content"),
+            "template_path": os.path.join(root, "template.html"),
+            "dest_path": os.path.join(root, "docs"),
+            "manifest_path": os.path.join(root, ".cache", "manifest.json"),
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            full = best_of(args.repeat, lambda : build("/", full = True, jobs = args.jobs, **paths))
+            noop = best_of(args.repeat, lambda : build("/", jobs = args.jobs, **paths))
+    finally:
+        shutil.rmtree(root)
+    return {"seconds": full, "noop_seconds": noop, "pages": args.pages, "bytes": size, "pages_per_s": args.pages / full}
+
+BENCHMARKS = {
+    "text_to_textnodes": bench_text_to_textnodes,
+    "scan_blocks": bench_scan_blocks,
+    "markdown_to_html_node": bench_markdown_to_html_node,
+    "nested_list": bench_nested_list,
+    "to_html": bench_to_html,
+    "build": bench_build,
+}
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    # Prints each benchmark's time against the same benchmark in an older run.
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)["results"]
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result["seconds"] / baseline[name]["seconds"]
+            print(f"{name:<24} {baseline[name]['seconds'] * 1000:>10.1f} ms -> {result['seconds'] * 1000:>10.1f} ms ({ratio:.2f}x)", file = sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(prog = "python3 -m benchmarks", description = "Run the benchmark suite and print the results as JSON.")
+    parser.add_argument("--only", action = "append", choices = sorted(BENCHMARKS), help = "run just this benchmark (can be repeated)")
+    parser.add_argument("--size", type = int, default = 1 << 20, help = "markdown bytes for the single-document benchmarks")
+    parser.add_argument("--pages", type = int, default = 200, help = "pages in the site for the build benchmark")
+    parser.add_argument("--page-size", type = int, default = 4096, help = "approximate bytes per page for the build benchmark")
+    parser.add_argument("--jobs", type = int, default = 1, help = "--jobs for the build benchmark")
+    parser.add_argument("--list-items", type = int, default = 5000, help = "items in the outline for the nested_list benchmark")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs per benchmark (the best one counts)")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--output", metavar = "PATH", help = "write the JSON here instead of stdout")
+    parser.add_argument("--compare", metavar = "PATH", help = "JSON from an earlier run to compare against")
+    args = parser.parse_args()
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args)
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "only")},
+        "results": results,
+    }
+    if args.output != None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent = 1, sort_keys = True)
+    else:
+        print(json.dumps(report, indent = 1, sort_keys = True))
+    if args.compare != None:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import re, sys, time
+
+from markdown_to_nodes import *
+from patterns import QUOTE_LINE, LIST_LINE, BLOCK_LINE, QUOTE_KIND, HEADING_KIND
+from benchmarks.corpus import synthetic_markdown
+
+# Per-block classification cost, in microseconds per block.
+#
+# block_to_block_type: the classifiers as they were, calling re.match with
+# pattern strings (rebuilt here), against the same classifiers on compiled
+# patterns. Both run once with re's cache warm, and once with it thrashed
+# the way a site with its own regex-heavy plugins would (re.purge() between
+# blocks; the cost of the purge itself is measured and taken back out).
+#
+# line kinds: what scan_blocks does for every line, first as two compiled
+# matches (quote, then list), then as the one combined BLOCK_LINE match.
+
+def string_is_heading(text):
+    lines = text.split("\n")
+    if len(lines) > 1:
+        return False
+    return bool(re.match(r"#{1,6} ", lines[0]))
+
+def string_is_quote(text):
+    lines = text.split("\n")
+    return re.match(r">", lines[0]) and all(map(lambda s : re.match(r"\s*>", s), lines))
+
+def string_is_list(text):
+    lines = text.split("\n")
+    return all(map(lambda s : re.match(r"([\s]*[-*] )|([\s]*[0-9a-zA-Z]*[.)] )", s), lines))
+
+def string_block_to_block_type(text):
+    if is_code(text):
+        return BlockType.CODE
+    if string_is_heading(text):
+        return BlockType.HEADING
+    if string_is_quote(text):
+        return BlockType.QUOTE
+    if string_is_list(text):
+        return BlockType.LIST
+    return BlockType.PARAGRAPH
+
+def separate_line_kinds(lines):
+    all_quote = all_list = True
+    for line in lines:
+        all_quote = all_quote and bool(QUOTE_LINE.match(line))
+        all_list = all_list and bool(LIST_LINE.match(line))
+    return all_quote, all_list
+
+def combined_line_kinds(lines):
+    all_quote = all_list = True
+    for line in lines:
+        if not (all_quote or all_list):
+            continue
+        kind = BLOCK_LINE.match(line)
+        if kind == None:
+            all_quote = all_list = False
+        elif kind.lastindex == QUOTE_KIND:
+            all_list = False
+        else:
+            all_quote = False
+            if kind.lastindex == HEADING_KIND:
+                all_list = False
+    return all_quote, all_list
+
+def per_block(function, blocks, thrash = False, repeat = 5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for block in blocks:
+            if thrash:
+                re.purge()
+            function(block)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return best / len(blocks) * 1e6
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    blocks = markdown_to_blocks(synthetic_markdown(size))
+    for block in blocks:
+        assert string_block_to_block_type(block) == block_to_block_type(block)
+    purge = per_block(lambda block : None, blocks, thrash = True)
+    for label, thrash in (("warm re cache", False), ("thrashed re cache", True)):
+        offset = purge if thrash else 0
+        before = per_block(string_block_to_block_type, blocks, thrash) - offset
+        after = per_block(block_to_block_type, blocks, thrash) - offset
+        print(f"block_to_block_type, {label}: {before:.2f} us -> {after:.2f} us per block ({before / after:.1f}x)")
+    line_blocks = [block.split("\n") for block in blocks]
+    for lines in line_blocks:
+        assert separate_line_kinds(lines) == combined_line_kinds(lines)
+    before = per_block(separate_line_kinds, line_blocks)
+    after = per_block(combined_line_kinds, line_blocks)
+    print(f"scan_blocks line kinds: {before:.2f} us -> {after:.2f} us per block ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
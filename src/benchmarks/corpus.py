@@ -0,0 +1,116 @@
+import os, random
+
+# Deterministic synthetic markdown, for benchmarks. Everything comes from a
+# seeded random.Random, so the same arguments always give the same corpus.
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do"]
+
+# Relative weights of each kind of block.
+DEFAULT_MIX = {
+    "paragraph": 6,
+    "list": 2,
+    "quote": 1,
+    "code": 1,
+    "heading": 1,
+}
+
+class CorpusGenerator():
+    def __init__(self, seed = 0, mix = None, link_rate = 0.05, image_rate = 0.02, emphasis_rate = 0.25, list_depth = 3):
+        self.rng = random.Random(seed)
+        self.mix = mix if mix != None else DEFAULT_MIX
+        self.link_rate = link_rate
+        self.image_rate = image_rate
+        self.emphasis_rate = emphasis_rate
+        self.list_depth = list_depth
+
+    def word(self):
+        word = self.rng.choice(WORDS)
+        roll = self.rng.random()
+        if roll < self.link_rate:
+            return f"[{word}](/{word}/)"
+        roll -= self.link_rate
+        if roll < self.image_rate:
+            return f"![{word}](/images/{word}.png)"
+        roll -= self.image_rate
+        if roll < self.emphasis_rate:
+            return self.rng.choice(["**{}**", "*{}*", "_{}_", "`{}`", "~~{}~~"]).format(word)
+        return word
+
+    def sentence(self):
+        return " ".join(self.word() for _ in range(self.rng.randint(6, 14))) + "."
+
+    def paragraph(self):
+        return "\n".join(self.sentence() for _ in range(self.rng.randint(2, 6)))
+
+    def list_block(self):
+        lines = []
+        depth = 0
+        for idx in range(self.rng.randint(2, 12)):
+            # Wander up and down the nesting levels, one step at a time.
+            depth = max(0, min(self.list_depth - 1, depth + self.rng.choice([-1, 0, 0, 1])))
+            marker = self.rng.choice(["-", "*", f"{idx + 1}."])
+            lines.append("  " * depth + f"{marker} {self.sentence()}")
+        # A list can't start nested.
+        lines[0] = lines[0].lstrip()
+        return "\n".join(lines)
+
+    def quote(self):
+        return "\n".join(f"> {self.sentence()}" for _ in range(self.rng.randint(1, 4)))
+
+    def code(self):
+        lines = [f"{self.rng.choice(WORDS)} = {self.rng.randint(0, 1000)}" for _ in range(self.rng.randint(2, 10))]
+        return "```\n" + "\n".join(lines) + "\n```"
+
+    def heading(self):
+        return "#" * self.rng.randint(2, 4) + " " + " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(1, 5)))
+
+    def block(self):
+        kinds = list(self.mix)
+        kind = self.rng.choices(kinds, weights = [self.mix[kind] for kind in kinds])[0]
+        return getattr(self, "list_block" if kind == "list" else kind)()
+
+    def page(self, size = 4096, title = "Synthetic page"):
+        blocks = [f"# {title}"]
+        total = len(blocks[0])
+        while total < size:
+            blocks.append(self.block())
+            total += len(blocks[-1]) + 2
+        return "\n\n".join(blocks)
+
+def synthetic_markdown(size = 1 << 20, seed = 0):
+    # One big page of about size bytes.
+    return CorpusGenerator(seed).page(size)
+
+def page_paths(pages, depth = 2, fanout = 4):
+    # Relative paths for pages spread over a directory tree depth levels deep,
+    # with fanout subdirectories at each level.
+    paths = []
+    for idx in range(pages):
+        parts = []
+        remainder = idx
+        for _ in range(depth):
+            parts.append(f"section{remainder % fanout}")
+            remainder //= fanout
+        paths.append(os.path.join(*parts, f"page{idx}.md"))
+    return paths
+
+def write_site(root, pages = 100, page_size = 4096, depth = 2, fanout = 4, seed = 0, mix = None):
+    # Lays out a whole site (content/, static/ and template.html) under root.
+    generator = CorpusGenerator(seed, mix)
+    os.makedirs(os.path.join(root, "static", "images"), exist_ok = True)
+    with open(os.path.join(root, "template.html"), "w") as f:
+        f.write('<!doctype html>\n<html><head><title>{{ Title }}</title><link href="/index.css" rel="stylesheet" /></head>\n<body><article>{{ Content }}</article></body></html>')
+    with open(os.path.join(root, "static", "index.css"), "w") as f:
+        f.write("body { margin: 0 auto; max-width: 40em; }\n")
+    for word in WORDS:
+        with open(os.path.join(root, "static", "images", f"{word}.png"), "wb") as f:
+            f.write(bytes(generator.rng.getrandbits(8) for _ in range(1024)))
+    total = 0
+    for idx, path in enumerate(page_paths(pages, depth, fanout)):
+        full_path = os.path.join(root, "content", path)
+        os.makedirs(os.path.dirname(full_path), exist_ok = True)
+        md = generator.page(page_size, f"Page {idx}")
+        with open(full_path, "w") as f:
+            f.write(md)
+        total += len(md)
+    return total
@@ -0,0 +1,96 @@
+import sys, time
+from html import escape
+from html.parser import HTMLParser
+
+from htmlnode import LeafNode, RawNode, VoidNode
+from markdown_to_nodes import markdown_to_html_node
+from benchmarks.corpus import synthetic_markdown
+
+# What escaping costs us, in MB/s of HTML out, three ways:
+#
+#   unescaped  serializing the way it was before we escaped anything, rebuilt
+#              here (every value and prop as it is).
+#   escaped    to_html as it is now, escaping text and attributes on the way.
+#   external   the unescaped HTML, then a second pass that parses it and
+#              writes it back out escaped, which is what you'd be stuck with
+#              if the serializer didn't do it. (It's not even right: by then
+#              a "<" in the text already looks like a tag.)
+
+def unescaped_props(props):
+    if props == None:
+        return ""
+    return " " + " ".join(f"{key}=\"{val}\"" for (key, val) in props.items())
+
+def unescaped_html(node):
+    parts = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+        elif isinstance(node, RawNode):
+            parts.append(node.value)
+        elif isinstance(node, LeafNode):
+            if node.tag == None:
+                parts.append(f"{node.value}")
+            else:
+                parts.append(f"<{node.tag}{unescaped_props(node.properties)}>{node.value}</{node.tag}>")
+        elif isinstance(node, VoidNode):
+            # Like VoidNode.iter_html: just the opening tag.
+            parts.append(f"<{node.tag}{unescaped_props(node.properties)}>")
+        else:
+            parts.append(f"<{node.tag}{unescaped_props(node.properties)}>")
+            stack.append(f"</{node.tag}>")
+            stack.extend(reversed(node.children))
+    return "".join(parts)
+
+class Reescaper(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs = False)
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        self.parts.append(f"<{tag}" + "".join(f" {key}=\"{escape(value or '')}\"" for key, value in attrs) + ">")
+
+    def handle_endtag(self, tag):
+        self.parts.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.parts.append(escape(data, quote = False))
+
+    def handle_entityref(self, name):
+        self.parts.append(f"&{name};")
+
+    def handle_charref(self, name):
+        self.parts.append(f"&#{name};")
+
+def reescape(html):
+    parser = Reescaper()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
+
+def best(function, repeat = 3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    node = markdown_to_html_node(synthetic_markdown(size))
+    node.children = list(node.children)
+    html = node.to_html()
+    mb = len(html) / 1e6
+    unescaped = best(lambda : unescaped_html(node))
+    escaped = best(node.to_html)
+    external = best(lambda : reescape(unescaped_html(node)))
+    print(f"{len(html)} bytes of HTML")
+    print(f"unescaped: {mb / unescaped:7.1f} MB/s")
+    print(f"escaped:   {mb / escaped:7.1f} MB/s ({escaped / unescaped - 1:+.0%})")
+    print(f"external:  {mb / external:7.1f} MB/s ({external / unescaped - 1:+.0%})")
+
+if __name__ == "__main__":
+    main()
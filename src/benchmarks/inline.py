@@ -0,0 +1,41 @@
+import sys, time
+
+from markdown_to_nodes import *
+from benchmarks.corpus import synthetic_markdown
+
+# Inline parsing throughput, in MB/s of markdown. We compare the single-pass
+# text_to_textnodes against the old pipeline of chained split_nodes_* passes,
+# which is rebuilt here from the functions that still exist.
+
+def chained_text_to_textnodes(text):
+    nodes = [TextNode(text, [], None)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "~~", TextType.STRIKETHROUGH)
+    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+def throughput(function, blocks, repeat = 5):
+    size = sum(len(block) for block in blocks)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for block in blocks:
+            function(block)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return size / best / 1e6
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    blocks = synthetic_markdown(size).split("\n\n")
+    before = throughput(chained_text_to_textnodes, blocks)
+    after = throughput(text_to_textnodes, blocks)
+    print(f"chained split_nodes_*: {before:.2f} MB/s")
+    print(f"   text_to_textnodes: {after:.2f} MB/s ({after / before:.1f}x)")
+
+if __name__ == "__main__":
+    main()
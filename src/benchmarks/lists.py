@@ -0,0 +1,103 @@
+import random, re, sys, time
+
+from markdown_to_nodes import *
+
+# Nested list building, in microseconds per item, at a few sizes, for a deep
+# outline (every item one level deeper than the last, in runs that get longer
+# as the list does) and a wide one (one level, every item a sibling). A
+# builder that scales linearly keeps the per-item cost flat as the list grows.
+#
+# recursive_list_from_lines is the builder as it was, rebuilt here (minus its
+# debug print, and with upper-alpha values fixed so it gets through the same
+# input). It recomputes the common indentation of every line and rewrites the
+# lines at every level of nesting.
+
+def recursive_longest_common_prefix(string1, string2):
+    p = ''
+    for idx, let in enumerate(string1):
+        if string2[idx] == let:
+            p += let
+        else:
+            break
+    return p
+
+def recursive_list_from_lines(lines, depth = 0, basepath = "/"):
+    base_prefix = re.match(r"\s*", lines[0]).group()
+    for line in lines:
+        if not line.startswith(base_prefix):
+            new_base_prefix_candidate = re.match(r"\s*", line).group()
+            if base_prefix.startswith(new_base_prefix_candidate):
+                base_prefix = new_base_prefix_candidate
+            else:
+                base_prefix = recursive_longest_common_prefix(base_prefix, new_base_prefix_candidate)
+    for idx, line in enumerate(lines):
+        lines[idx] = line.removeprefix(base_prefix)
+    children = []
+    idx = 0
+    while idx < len(lines):
+        current_line = lines[idx]
+        if re.match(r"\s*", current_line).group():
+            sublist = [current_line]
+            idx += 1
+            while idx < len(lines) and re.match(r"\s+", lines[idx]):
+                sublist.append(lines[idx])
+                idx += 1
+            children.append(recursive_list_from_lines(sublist, depth = depth + 1, basepath = basepath))
+        else:
+            text_start = re.match(r"([0-9a-zA-Z]*[.)] )|([-*] )", current_line).end()
+            subchildren = text_to_html_nodes(current_line[text_start:], basepath)
+            if is_unordered_list_item(current_line):
+                children.append(ParentNode("li", subchildren, shared_props(style = "list-style-type:" + ("disc" if depth == 0 else "circle" if depth == 1 else "square"))))
+            else:
+                if current_line[0].islower():
+                    style, value = "lower-alpha", alpha_value(re.match(r"[a-z]*", current_line).group(), LOWERCASE_DIGITS)
+                elif current_line[0].isupper():
+                    style, value = "upper-alpha", alpha_value(re.match(r"[A-Z]*", current_line).group(), UPPERCASE_DIGITS)
+                else:
+                    style, value = "decimal", int(re.match(r"[0-9]*", current_line).group())
+                children.append(ParentNode("li", subchildren, {"style": "list-style-type:" + style, "value": value}))
+            idx += 1
+    return ParentNode("ol", children)
+
+MARKERS = ["-", "*", "1.", "12)", "b.", "C)"]
+
+def deep_list(items, seed = 0, run = 50):
+    # Climbs a level per item for run items, then drops back to the top.
+    rng = random.Random(seed)
+    return [" " * (2 * (idx % run)) + rng.choice(MARKERS) + f" item {idx}" for idx in range(items)]
+
+def wide_list(items, seed = 0):
+    rng = random.Random(seed)
+    return [rng.choice(MARKERS) + f" item {idx}" for idx in range(items)]
+
+def ragged_list(items, seed = 0):
+    # Indentation all over the place, including dedents that aren't back to
+    # any earlier level.
+    rng = random.Random(seed)
+    return [" " * rng.randrange(12) + rng.choice(MARKERS) + f" item {idx}" for idx in range(items)]
+
+def per_item(function, lines, repeat = 3):
+    best = None
+    for _ in range(repeat):
+        copy = list(lines)
+        start = time.perf_counter()
+        function(copy)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return best / len(lines) * 1e6
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    sizes = [largest // 8, largest // 4, largest // 2, largest]
+    for seed in range(20):
+        for lines in (deep_list(300, seed, run = 7 + seed), wide_list(300, seed), ragged_list(300, seed)):
+            assert recursive_list_from_lines(list(lines)).to_html() == create_list_from_lines(list(lines)).to_html()
+    for label, make in (("deep", lambda size : deep_list(size, run = size // 10)), ("wide", wide_list)):
+        for size in sizes:
+            lines = make(size)
+            before = per_item(recursive_list_from_lines, lines)
+            after = per_item(create_list_from_lines, lines)
+            print(f"{label} list, {size:>6} items: {before:8.2f} us -> {after:6.2f} us per item ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import sys, tracemalloc
+from types import MappingProxyType
+
+from htmlnode import LeafNode, ParentNode, VoidNode
+from markdown_to_nodes import markdown_to_html_node
+from benchmarks.corpus import synthetic_markdown
+
+# How much memory does the node tree for one big page take? We build a
+# synthetic ~1 MB markdown document heavy on inline formatting (which is where
+# the node count explodes), then measure tracemalloc's peak while building the
+# whole tree, and how much of it is still held once it's built.
+#
+# Then the same tree two ways, to see what the compact nodes save: copied
+# into the nodes as they are, and into the nodes as they were before, rebuilt
+# here as DictLeafNode and DictParentNode. Those have a __dict__ each, their
+# own props dict each (even for the list styles that repeat on every <li>),
+# and put inline formatting (and images, with their alt text) on a ParentNode
+# around an untagged leaf instead of on the leaf itself. Both copies share the
+# text, so what we're comparing is just the nodes.
+
+class DictHTMLNode():
+    def __init__(self, tag = None, value = None, children = None, props = None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.properties = props
+
+class DictLeafNode(DictHTMLNode):
+    def __init__(self, tag = None, value = "", props = None):
+        super().__init__(tag, value, None, props)
+
+class DictParentNode(DictHTMLNode):
+    def __init__(self, tag, children, props = None):
+        super().__init__(tag, None, children, props)
+
+def own_props(props):
+    return dict(props) if props != None else None
+
+def as_dict_nodes(node, parent_tag = None):
+    if isinstance(node, VoidNode):
+        props = dict(node.properties)
+        alt, props["alt"] = props["alt"], ""
+        return DictParentNode(node.tag, [DictLeafNode(None, alt)], props)
+    if isinstance(node, LeafNode):
+        if node.tag == None or parent_tag == "pre":
+            # Untagged text, or a code block's <code>, were leaves already.
+            return DictLeafNode(node.tag, node.value, own_props(node.properties))
+        return DictParentNode(node.tag, [DictLeafNode(None, node.value)], own_props(node.properties))
+    return DictParentNode(node.tag, [as_dict_nodes(child, node.tag) for child in node.children], own_props(node.properties))
+
+def as_slot_nodes(node):
+    # Shared props stay shared, like they are when the tree gets built.
+    props = node.properties
+    if props != None and not isinstance(props, MappingProxyType):
+        props = dict(props)
+    if isinstance(node, VoidNode):
+        return VoidNode(node.tag, props)
+    if isinstance(node, LeafNode):
+        return LeafNode(node.tag, node.value, props)
+    return ParentNode(node.tag, [as_slot_nodes(child) for child in node.children], props)
+
+def copy_bytes(copy, node):
+    # (nodes, bytes still allocated) for copy(node).
+    tracemalloc.start()
+    copied = copy(node)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return count_nodes(copied), retained
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        if current.children != None:
+            stack.extend(current.children)
+    return count
+
+def measure(md):
+    tracemalloc.start()
+    node = markdown_to_html_node(md)
+    # markdown_to_html_node builds its blocks lazily; force the whole tree.
+    node.children = list(node.children)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    dict_nodes, dict_bytes = copy_bytes(as_dict_nodes, node)
+    slot_nodes, slot_bytes = copy_bytes(as_slot_nodes, node)
+    return {
+        "markdown_bytes": len(md),
+        "html_bytes": len(node.to_html()),
+        "nodes": count_nodes(node),
+        "tree_peak_bytes": peak,
+        "tree_retained_bytes": retained,
+        "dict_nodes": dict_nodes,
+        "dict_node_bytes": dict_bytes,
+        "slot_nodes": slot_nodes,
+        "slot_node_bytes": slot_bytes,
+    }
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    result = measure(synthetic_markdown(size))
+    for key, value in result.items():
+        print(f"{key:>20}: {value:,}")
+    print(f"{'bytes per node':>20}: {result['tree_retained_bytes'] / result['nodes']:.1f}")
+    print(f"{'slot vs dict nodes':>20}: {result['slot_node_bytes'] / result['dict_node_bytes'] - 1:+.0%} bytes, {result['slot_nodes'] / result['dict_nodes'] - 1:+.0%} nodes")
+
+if __name__ == "__main__":
+    main()
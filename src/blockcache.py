@@ -0,0 +1,96 @@
+import hashlib, json, os
+from collections import OrderedDict
+from htmlnode import HTML_FORMAT
+
+# Lots of blocks show up on page after page (license footers, notices, the
+# same code sample over and over), and most edits only touch one block of a
+# page. So we remember the rendered HTML for each block, keyed by a hash of
+# its type, its text and the basepath its links were rebased against (and
+# for blocks with images in them, what images.py knows about those images).
+# Alongside the HTML we keep the block's refs (the links, images and heading
+# anchors in it, see linkindex.py) and its plain text (for search.py), so a
+# cache hit still tells the link checker and the search index everything
+# rendering the block would have.
+
+class BlockCache():
+    def __init__(self, max_bytes = 64 << 20):
+        # key -> (rendered HTML, refs, text), least recently used first.
+        self.entries = OrderedDict()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # If this is a list, every put() also gets recorded in it. Worker
+        # processes use it to send their new entries back to the parent.
+        self.added = None
+
+    def key(self, block_type, text, basepath, extra = ""):
+        # HTML_FORMAT is in there so blocks rendered by an older version
+        # (say, in a persisted cache) just never get hit.
+        return hashlib.sha1(f"{HTML_FORMAT}\0{basepath}\0{block_type.name}\0{text}\0{extra}".encode()).hexdigest()
+
+    def get(self, key):
+        # (html, refs, text), or None.
+        entry = self.entries.get(key)
+        if entry == None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, html, refs = (), text = ""):
+        old = self.entries.pop(key, None)
+        if old != None:
+            self.size -= len(old[0]) + len(old[2])
+        if len(html) + len(text) > self.max_bytes:
+            return
+        entry = (html, refs, text)
+        self.entries[key] = entry
+        self.size += len(html) + len(text)
+        if self.added != None:
+            self.added.append((key, entry))
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last = False)
+            self.size -= len(evicted[0]) + len(evicted[2])
+
+    def update(self, entries):
+        # Bulk put, for entries that came from somewhere else (disk, a worker).
+        for key, entry in entries:
+            if isinstance(entry, str) or len(entry) != 3:
+                # Saved before we kept refs and text. The HTML is still good,
+                # but it's cheaper to render it again than to dig those out of it.
+                continue
+            html, refs, text = entry
+            self.put(key, html, tuple(tuple(ref) for ref in refs), text)
+
+    def take_added(self):
+        added = self.added
+        self.added = []
+        return added
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0
+        return f"Block cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self.entries)} blocks cached"
+
+    @classmethod
+    def load(cls, path, max_bytes = 64 << 20):
+        # Like the manifest, a missing or broken cache file just means a cold cache.
+        cache = cls(max_bytes)
+        try:
+            with open(path, "r") as f:
+                cache.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return cache
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            # Oldest first, so loading it back in keeps the LRU order.
+            json.dump(list(self.entries.items()), f)
+        os.replace(temp_path, path)
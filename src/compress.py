@@ -0,0 +1,102 @@
+import gzip, os
+from concurrent.futures import ThreadPoolExecutor
+from pipeline import atomic_open
+
+# Precompressed siblings: for docs/foo.html we write docs/foo.html.gz, which
+# static file servers can hand out as-is instead of compressing on every
+# request. zlib releases the GIL while it works, so a thread pool is enough
+# to keep every core busy.
+#
+# We only ever touch .gz files we wrote ourselves: the ones precompress
+# reports as written get kept in the manifest, and handed back next time as
+# ours. Anything else, like a .gz someone put in static/ on purpose, gets left
+# alone (and isn't overwritten either).
+
+COMPRESSIBLE = (".html", ".css", ".js", ".svg")
+
+def find_candidates(root, min_size = 1024, ours = (), keep = ()):
+    # (path, size, mtime) for every compressible file at least min_size bytes
+    # whose .gz isn't in keep, plus the list of .gz files in ours whose source
+    # is gone or now too small.
+    candidates = []
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.endswith(COMPRESSIBLE) and entry.path + ".gz" not in keep:
+                    stat = entry.stat()
+                    if stat.st_size >= min_size:
+                        candidates.append((entry.path, stat.st_size, stat.st_mtime_ns))
+    candidates.sort()
+    stale = []
+    for path in sorted(ours):
+        source = path[:-3]
+        if path not in keep and os.path.isfile(path) and (not os.path.isfile(source) or os.path.getsize(source) < min_size):
+            stale.append(path)
+    return candidates, stale
+
+def is_up_to_date(path, mtime_ns):
+    try:
+        return os.stat(path + ".gz").st_mtime_ns >= mtime_ns
+    except OSError:
+        return False
+
+def compress_file(path, level = 9):
+    # Writes path.gz and returns (original size, compressed size). If gzip
+    # doesn't actually make it smaller there's no point serving it, so we
+    # don't write it (and remove any old one).
+    with open(path, "rb") as f:
+        data = f.read()
+    # mtime = 0 keeps the output the same from build to build.
+    compressed = gzip.compress(data, compresslevel = level, mtime = 0)
+    if len(compressed) >= len(data):
+        if os.path.exists(path + ".gz"):
+            os.remove(path + ".gz")
+        return len(data), len(data)
+    with atomic_open(path + ".gz", "wb") as f:
+        f.write(compressed)
+    return len(data), len(compressed)
+
+class CompressionReport():
+    def __init__(self):
+        self.compressed = 0
+        self.skipped = 0
+        self.removed = 0
+        self.original_bytes = 0
+        self.compressed_bytes = 0
+        # Every .gz that's ours after this run, for the next one.
+        self.written = []
+
+    def saved(self):
+        return self.original_bytes - self.compressed_bytes
+
+    def __str__(self):
+        return f"Precompressed {self.compressed} file(s) ({self.skipped} already up to date, {self.removed} stale removed), saving {self.saved():,} bytes"
+
+def precompress(root, min_size = 1024, level = 9, threads = None, ours = (), keep = ()):
+    # ours is the .gz files an earlier run wrote (its report's written), the
+    # only ones we'll remove; keep is files that aren't ours at all (static
+    # outputs), which we never write over or remove.
+    report = CompressionReport()
+    candidates, stale = find_candidates(root, min_size, set(ours), set(keep))
+    for path in stale:
+        os.remove(path)
+        report.removed += 1
+    work = []
+    for path, size, mtime_ns in candidates:
+        if is_up_to_date(path, mtime_ns):
+            report.skipped += 1
+            report.written.append(path + ".gz")
+        else:
+            work.append(path)
+    with ThreadPoolExecutor(threads or os.cpu_count() or 1) as pool:
+        for path, (original, compressed) in zip(work, pool.map(lambda path : compress_file(path, level), work)):
+            report.compressed += 1
+            report.original_bytes += original
+            report.compressed_bytes += compressed
+            if compressed < original:
+                report.written.append(path + ".gz")
+    report.written.sort()
+    return report
@@ -0,0 +1,180 @@
+import marshal, os
+from array import array
+from collections import deque
+
+# What every output was built from. Nodes are file paths; each node can have
+# inputs (the files it was built from, which are nodes too) and a hash (of
+# the file's contents the last time something was built from it). A page's
+# inputs are its markdown, its template and the static files it references;
+# a template's inputs are its partials and the static files it references;
+# a partial's are its own partials, and so on.
+#
+# When a build starts, we hash every node we have a hash for. Anything whose
+# hash changed, plus everything that depends on it (transitively), is dirty.
+#
+# On disk, the graph is a handful of flat strings and arrays (marshal'd)
+# rather than a container per node: every path joined into one string, every
+# hash into another, and the edges in both directions as offsets into long
+# arrays of node ids. Loading is a few big allocations instead of hundreds of
+# thousands of little ones, and we keep using the arrays as they are, so even
+# at 100k+ nodes it takes milliseconds. marshal's format can change between
+# Python versions; if it won't load, we just start over.
+
+GRAPH_VERSION = 3
+
+def empty_adjacency(count):
+    return array("i", [0]) * (count + 1), array("i")
+
+def adjacency(rows, count):
+    # rows: node -> list of node ids. Packs them into (offsets, ids), where
+    # row n is ids[offsets[n]:offsets[n + 1]].
+    offsets = array("i", [0])
+    ids = array("i")
+    for node in range(count):
+        ids.extend(rows.get(node, ()))
+        offsets.append(len(ids))
+    return offsets, ids
+
+class DependencyGraph():
+    def __init__(self):
+        # node id -> path. The path -> node id dict gets built when first needed.
+        self.paths = []
+        self.path_ids = None
+        # node id -> hash the last build saw, or "" for none.
+        self.hashes = []
+        # Inputs and users (the reverse edges) as they were loaded, plus the
+        # inputs of every node that's been given new ones since.
+        self.input_offsets, self.input_ids = empty_adjacency(0)
+        self.user_offsets, self.user_ids = empty_adjacency(0)
+        self.new_inputs = {}
+
+    @property
+    def ids(self):
+        if self.path_ids == None:
+            self.path_ids = dict(zip(self.paths, range(len(self.paths))))
+        return self.path_ids
+
+    def node(self, path):
+        ids = self.ids
+        node = ids.get(path)
+        if node == None:
+            node = ids[path] = len(self.paths)
+            self.paths.append(path)
+            self.hashes.append("")
+        return node
+
+    def node_inputs(self, node):
+        inputs = self.new_inputs.get(node)
+        if inputs != None:
+            return inputs
+        if node + 1 < len(self.input_offsets):
+            return self.input_ids[self.input_offsets[node]:self.input_offsets[node + 1]]
+        return ()
+
+    def set_inputs(self, path, inputs):
+        self.new_inputs[self.node(path)] = [self.node(input_path) for input_path in inputs]
+
+    def inputs_of(self, path):
+        # Paths of path's direct inputs, or None if nothing's been recorded for it.
+        node = self.ids.get(path)
+        if node == None:
+            return None
+        inputs = self.node_inputs(node)
+        if not inputs and node not in self.new_inputs:
+            return None
+        return [self.paths[input_node] for input_node in inputs]
+
+    def depends_on(self, path, input_path):
+        # Is input_path one of path's direct inputs?
+        inputs = self.inputs_of(path)
+        return inputs != None and input_path in inputs
+
+    def set_hash(self, path, file_hash):
+        self.hashes[self.node(path)] = file_hash or ""
+
+    def changed(self, current_hash):
+        # Paths whose hash isn't what we recorded. current_hash(path) gives
+        # the hash now (None if the file's gone).
+        return [self.paths[node] for node, old_hash in enumerate(self.hashes) if old_hash and current_hash(self.paths[node]) != old_hash]
+
+    def users(self, node):
+        if self.new_inputs:
+            # Edges changed since we loaded, so the saved users are stale.
+            self.rebuild_users()
+        if node + 1 < len(self.user_offsets):
+            return self.user_ids[self.user_offsets[node]:self.user_offsets[node + 1]]
+        return ()
+
+    def rebuild_users(self):
+        rows = {}
+        for node in range(len(self.paths)):
+            for input_node in self.node_inputs(node):
+                rows.setdefault(input_node, []).append(node)
+        self.input_offsets, self.input_ids = adjacency({node: self.node_inputs(node) for node in range(len(self.paths))}, len(self.paths))
+        self.user_offsets, self.user_ids = adjacency(rows, len(self.paths))
+        self.new_inputs = {}
+
+    def dependents(self, paths):
+        # Everything that depends on any of paths, directly or not (paths
+        # themselves included).
+        ids = self.ids
+        seen = set(ids[path] for path in paths if path in ids)
+        queue = deque(seen)
+        while queue:
+            for user in self.users(queue.popleft()):
+                if user not in seen:
+                    seen.add(user)
+                    queue.append(user)
+        return set(self.paths[node] for node in seen)
+
+    def compacted(self, outputs):
+        # A new graph with just outputs and whatever they (transitively) use,
+        # so nodes for deleted pages and unused partials don't pile up.
+        ids = self.ids
+        queue = deque(ids[path] for path in outputs if path in ids)
+        seen = set(queue)
+        while queue:
+            for input_node in self.node_inputs(queue.popleft()):
+                if input_node not in seen:
+                    seen.add(input_node)
+                    queue.append(input_node)
+        graph = DependencyGraph()
+        kept = sorted(seen)
+        for node in kept:
+            graph.hashes[graph.node(self.paths[node])] = self.hashes[node]
+        for node in kept:
+            inputs = self.node_inputs(node)
+            if inputs or node in self.new_inputs:
+                graph.new_inputs[graph.ids[self.paths[node]]] = [graph.ids[self.paths[input_node]] for input_node in inputs]
+        return graph
+
+    @classmethod
+    def load(cls, path):
+        graph = cls()
+        try:
+            with open(path, "rb") as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return graph
+        if not isinstance(data, tuple) or len(data) != 7 or data[0] != GRAPH_VERSION:
+            return graph
+        version, paths, hashes, input_offsets, input_ids, user_offsets, user_ids = data
+        graph.paths = paths.split("\0") if paths else []
+        graph.hashes = hashes.split("\0") if paths else []
+        graph.input_offsets = array("i", input_offsets)
+        graph.input_ids = array("i", input_ids)
+        graph.user_offsets = array("i", user_offsets)
+        graph.user_ids = array("i", user_ids)
+        return graph
+
+    def save(self, path):
+        self.rebuild_users()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        data = (GRAPH_VERSION, "\0".join(self.paths), "\0".join(self.hashes),
+                self.input_offsets.tobytes(), self.input_ids.tobytes(), self.user_offsets.tobytes(), self.user_ids.tobytes())
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            marshal.dump(data, f)
+        os.replace(temp_path, path)
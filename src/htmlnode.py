@@ -1,40 +1,176 @@
+from sys import intern
+from types import MappingProxyType
+
+# Big pages have a *lot* of nodes, so they're kept compact: no per-instance
+# __dict__, tag names interned so every "li" is the same string, and props
+# that are the same across many nodes can be shared (see shared_props).
+#
+# Text and attribute values get escaped as they're serialized. Most text has
+# nothing to escape, so we check for that first; when there is something,
+# chained str.replace (each one a C-level scan that doesn't copy unless it
+# finds something) beats str.translate, which goes character by character.
+
+# Bump this whenever the same nodes would serialize differently, so that HTML
+# cached or written by an older version doesn't get reused.
+HTML_FORMAT = 3
+
+def escape_text(text):
+    if "&" in text or "<" in text or ">" in text:
+        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+def escape_attribute(value):
+    if "&" in value or "<" in value or ">" in value or "\"" in value:
+        return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\"", "&quot;")
+    return value
+
+def serialize_props(props):
+    return " ".join(f"{key}=\"{escape_attribute(str(val))}\"" for (key, val) in props.items())
 
 class HTMLNode():
+    __slots__ = ("tag", "value", "children", "properties")
+
     def __init__(self, tag = None, value = None, children = None, props = None):
-        self.tag = tag
+        self.tag = intern(tag) if type(tag) == str else tag
         self.value = value
         self.children = children
         self.properties = props
     
     def to_html(self):
         raise NotImplementedError()
+
+    def iter_html(self):
+        # Generator of HTML fragments which, joined together, make up to_html().
+        raise NotImplementedError()
+
+    def write_html(self, stream, buffer_size = 1 << 16):
+        # Streams our HTML to a file-like object. Fragments are tiny, so we
+        # batch them up rather than paying for a write() call on every tag.
+        buffer = []
+        buffered = 0
+        for fragment in self.iter_html():
+            buffer.append(fragment)
+            buffered += len(fragment)
+            if buffered >= buffer_size:
+                stream.write("".join(buffer))
+                buffer.clear()
+                buffered = 0
+        if buffer:
+            stream.write("".join(buffer))
     
-    def props_to_html(self):
+    def opening_tag(self):
         if self.properties == None:
+            return f"<{self.tag}>"
+        return f"<{self.tag} {self.props_to_html()}>"
+
+    def props_to_html(self):
+        props = self.properties
+        if props == None:
             return ""
-        return " ".join(f"{key}=\"{val}\"" for (key, val) in self.properties.items())
+        # Shared props were serialized once, when they were made.
+        serialized = _serialized_props.get(id(props))
+        if serialized == None:
+            serialized = serialize_props(props)
+        return serialized
     
     def __repr__(self):
         return f"HTMLNode(tag = {repr(self.tag)}, value = {repr(self.value)}, children = {repr(self.children)}, props = {repr(self.properties)})"
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag = None, value = "", props = None):
         super().__init__(tag, value, None, props)
 
     def to_html(self):
         if self.tag == None:
-            return f"{self.value}"
-        return f"<{self.tag}{(' ' + self.props_to_html()) * (self.properties != None)}>{self.value}</{self.tag}>"
+            return escape_text(str(self.value))
+        return f"{self.opening_tag()}{escape_text(str(self.value))}</{self.tag}>"
+
+    def iter_html(self):
+        yield self.to_html()
     
     def __repr__(self):
         return f"LeafNode(tag = {repr(self.tag)}, value = {repr(self.value)}, props = {repr(self.properties)})"
     
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props = None):
         super().__init__(tag, None, children, props)
     
     def to_html(self):
-        return f"<{self.tag}{(' ' + self.props_to_html()) * (self.properties != None)}>{''.join((child.to_html() for child in self.children))}</{self.tag}>"
+        return "".join(self.iter_html())
+
+    def iter_html(self):
+        # We walk the tree with an explicit stack of (children iterator, closing tag)
+        # rather than recursing. Recursing re-copies every subtree's HTML at every
+        # level, and deep enough nesting blows the recursion limit.
+        # Children only get iterated once, so lazy children (like a map) are fine.
+        yield self.opening_tag()
+        stack = [(iter(self.children), f"</{self.tag}>")]
+        while stack:
+            children, closing_tag = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield closing_tag
+            elif isinstance(child, ParentNode):
+                yield child.opening_tag()
+                stack.append((iter(child.children), f"</{child.tag}>"))
+            else:
+                yield from child.iter_html()
     
     def __repr__(self):
-        return f"ParentNode(tag = {repr(self.tag)}, children = {repr(self.children)}, props = {repr(self.properties)})"
\ No newline at end of file
+        return f"ParentNode(tag = {repr(self.tag)}, children = {repr(self.children)}, props = {repr(self.properties)})"
+
+class VoidNode(HTMLNode):
+    # Elements that can't have content, like <img>: no value, no children,
+    # and no closing tag.
+    __slots__ = ()
+
+    def __init__(self, tag, props = None):
+        super().__init__(tag, None, None, props)
+
+    def to_html(self):
+        return self.opening_tag()
+
+    def iter_html(self):
+        yield self.opening_tag()
+
+    def __repr__(self):
+        return f"VoidNode(tag = {repr(self.tag)}, props = {repr(self.properties)})"
+
+class RawNode(HTMLNode):
+    # HTML that has already been serialized (e.g. from the block cache).
+    # It goes out exactly as it came in, unescaped.
+    __slots__ = ()
+
+    def __init__(self, html):
+        super().__init__(None, html, None, None)
+
+    def to_html(self):
+        return self.value
+
+    def iter_html(self):
+        yield self.value
+
+    def __repr__(self):
+        return f"RawNode({repr(self.value)})"
+
+_shared_props = {}
+# id of a shared props mapping -> its serialized form. Shared props live
+# forever (in _shared_props), so their ids can't be reused by anything else.
+_serialized_props = {}
+
+def shared_props(**props):
+    # One read-only props mapping per distinct set of props, handed out to
+    # every node that asks for it. Only use this for props that get repeated
+    # a lot (list styles and the like), since the cache never shrinks.
+    key = tuple(props.items())
+    shared = _shared_props.get(key)
+    if shared == None:
+        shared = MappingProxyType(props)
+        _shared_props[key] = shared
+        _serialized_props[id(shared)] = serialize_props(shared)
+    return shared
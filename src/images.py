@@ -0,0 +1,248 @@
+import json, os, struct
+from concurrent.futures import ProcessPoolExecutor
+from htmlnode import serialize_props
+from patterns import IMAGE
+from staticsync import place_file
+from textnode import rebase_url
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Images in static/ get looked at once per version of the file, not once per
+# page: we read their width and height out of the file header (no pixels get
+# decoded), and if Pillow is installed, make smaller copies of them for
+# srcset, VARIANT_WIDTHS wide (the ones narrower than the image, anyway).
+# Those go in .cache/images/, named by the hash of the image they came from,
+# so an image is only ever resized once, even across --full builds; from there
+# they're put into docs/ next to the image, as logo-480w.png and so on.
+#
+# What we found is kept in .cache/images.json, by source and hash. While pages
+# render, every <img> whose src is one of our images (written site-absolute,
+# like /images/logo.png; a relative src means something different on every
+# page) gets its width, height, srcset and loading="lazy" from there.
+#
+# Sizes are as stored: we don't look at EXIF orientation, so a JPEG that's
+# meant to be shown rotated gets its width and height the wrong way round.
+
+IMAGE_EXTENSIONS = frozenset([".png", ".jpg", ".jpeg", ".gif", ".webp"])
+# GIFs don't get resized, since that would lose any animation.
+RESIZABLE = frozenset([".png", ".jpg", ".jpeg", ".webp"])
+VARIANT_WIDTHS = (480, 960, 1440)
+IMAGES_VERSION = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Start-of-frame markers, which are where a JPEG keeps its size. The rest of
+# C0-CF are other things (C4 huffman tables, C8 reserved, CC arithmetic coding).
+JPEG_FRAMES = frozenset(range(0xc0, 0xd0)) - frozenset([0xc4, 0xc8, 0xcc])
+# Markers that stand alone, without a length after them.
+JPEG_STANDALONE = frozenset([0x01, 0xd8]) | frozenset(range(0xd0, 0xd8))
+
+def jpeg_size(f):
+    # f is positioned just after the start-of-image marker. Walks the
+    # segments (skipping over their contents) until it finds the frame.
+    while True:
+        byte = f.read(1)
+        while byte == b"\xff":
+            marker = f.read(1)
+            if marker != b"\xff":
+                break
+        else:
+            return None
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in JPEG_STANDALONE:
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack(">H", header)[0]
+        if marker in JPEG_FRAMES:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+def webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == b"VP8L" and head[20] == 0x2f:
+        bits = struct.unpack("<I", head[21:25])[0]
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+def image_size(path):
+    # (width, height) of a PNG, JPEG, GIF or WebP, from its header, or None
+    # if it's none of those (or we can't make sense of it).
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(PNG_SIGNATURE) and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+            return webp_size(head)
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return jpeg_size(f)
+    return None
+
+def make_variants(job):
+    # Worker side of process_images: (source, [(width, height, path)]) in,
+    # every variant written to its path.
+    source, variants = job
+    with Image.open(source) as image:
+        for width, height, path in variants:
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            image.resize((width, height), Image.LANCZOS).save(temp_path, format = image.format)
+            os.replace(temp_path, path)
+    return source
+
+def variant_path(cache_path, source_hash, width, extension):
+    return os.path.join(cache_path, "images", f"{source_hash}-{width}{extension}")
+
+class ImageIndex():
+    def __init__(self, images = None, basepath = "/"):
+        # source -> {"hash", "url", "width", "height", "variants": [[width, url], ...]},
+        # where urls are relative to the site root, with "/"s.
+        self.images = images if images != None else {}
+        self.basepath = basepath
+        # img src (as rendered, so after rebasing) -> extra props
+        self.by_src = None
+
+    def __getstate__(self):
+        return self.images, self.basepath
+
+    def __setstate__(self, state):
+        self.images, self.basepath = state
+        self.by_src = None
+
+    def attributes(self, src):
+        # The props an <img> pointing at src gets on top of its src and alt,
+        # or None if it isn't one of our images.
+        if self.by_src == None:
+            self.by_src = {}
+            for record in self.images.values():
+                props = {"width": record["width"], "height": record["height"]}
+                if record["variants"]:
+                    widths = record["variants"] + [[record["width"], record["url"]]]
+                    props["srcset"] = ", ".join(f"{self.basepath}{url} {width}w" for width, url in widths)
+                    props["sizes"] = f"(max-width: {record['width']}px) 100vw, {record['width']}px"
+                props["loading"] = "lazy"
+                self.by_src[self.basepath + record["url"]] = props
+        return self.by_src.get(src)
+
+    def stamp(self, text):
+        # What the images in a block of markdown would add to it, for the
+        # block cache's key, so a block doesn't come out of the cache with
+        # the size of an image that's since changed.
+        found = []
+        for match in IMAGE.finditer(text):
+            props = self.attributes(rebase_url(match.group(2), self.basepath))
+            if props != None:
+                found.append(serialize_props(props))
+        return "\0".join(found)
+
+    def annotate(self, node):
+        # Fills in the props of every one of our images under node.
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.children != None:
+                stack.extend(current.children)
+            elif current.tag == "img" and current.properties != None:
+                props = self.attributes(current.properties.get("src"))
+                if props != None:
+                    current.properties.update(props)
+
+    @classmethod
+    def load(cls, path, basepath = "/"):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(basepath = basepath)
+        if not isinstance(data, dict) or data.get("version") != IMAGES_VERSION:
+            return cls(basepath = basepath)
+        return cls(data["images"], basepath)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"version": IMAGES_VERSION, "images": self.images}, f)
+        os.replace(temp_path, path)
+
+def process_images(static, old_variants, dest_path, cache_path, basepath = "/", jobs = 1, mode = "copy"):
+    # static is a manifest's static entries (source -> {"hash", "output"}),
+    # old_variants the variants we put in dest_path last time (output ->
+    # {"hash", "output"}). Sizes up every image that's new or changed, makes
+    # whatever variants aren't in the cache yet (across jobs processes), and
+    # puts them in dest_path. Returns (ImageIndex, variants, how many
+    # variants were made).
+    index_path = os.path.join(cache_path, "images.json")
+    old = ImageIndex.load(index_path, basepath)
+    index = ImageIndex(basepath = basepath)
+    outputs = set(entry["output"] for entry in static.values())
+    variants = {}
+    placements = []
+    work = []
+    for source, entry in sorted(static.items()):
+        extension = os.path.splitext(source)[1].lower()
+        if extension not in IMAGE_EXTENSIONS:
+            continue
+        record = old.images.get(source)
+        if record == None or record["hash"] != entry["hash"]:
+            size = image_size(source)
+            if size == None:
+                continue
+            record = {"hash": entry["hash"], "width": size[0], "height": size[1]}
+        record["url"] = os.path.relpath(entry["output"], dest_path).replace(os.sep, "/")
+        record["variants"] = []
+        missing = []
+        if Image != None and extension in RESIZABLE:
+            stem = os.path.splitext(entry["output"])[0]
+            for width in VARIANT_WIDTHS:
+                output = f"{stem}-{width}w{extension}"
+                if width >= record["width"] or output in outputs:
+                    continue
+                cached = variant_path(cache_path, entry["hash"], width, extension)
+                if not os.path.isfile(cached):
+                    missing.append((width, max(1, round(record["height"] * width / record["width"])), cached))
+                record["variants"].append([width, os.path.relpath(output, dest_path).replace(os.sep, "/")])
+                variants[output] = {"hash": f"{entry['hash']}-{width}", "output": output}
+                placements.append((cached, output))
+        if missing:
+            work.append((source, missing))
+        index.images[source] = record
+    if work:
+        os.makedirs(os.path.join(cache_path, "images"), exist_ok = True)
+        if jobs > 1 and len(work) > 1:
+            with ProcessPoolExecutor(max_workers = jobs) as pool:
+                list(pool.map(make_variants, work))
+        else:
+            for job in work:
+                make_variants(job)
+    for cached, output in placements:
+        previous = old_variants.get(output)
+        if previous == None or previous["hash"] != variants[output]["hash"] or not os.path.isfile(output):
+            place_file(cached, output, mode)
+    # Variants of images that changed or went away.
+    kept = set(os.path.basename(cached) for cached, output in placements)
+    directory = os.path.join(cache_path, "images")
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name not in kept:
+                os.remove(os.path.join(directory, name))
+    index.save(index_path)
+    return index, variants, sum(len(missing) for source, missing in work)
@@ -0,0 +1,149 @@
+import json, os, posixpath
+from patterns import URL_SCHEME
+
+# Site-wide index of every internal link, image and heading anchor, keyed by
+# output page. It's filled in while pages render (from the HTMLNodes, or from
+# the block cache), saved between builds so that pages we skip still count,
+# and checked against the set of files we actually produced once the build
+# is done. Checking is one hashed lookup per link.
+
+class PageLinks():
+    __slots__ = ("links", "images", "anchors")
+
+    def __init__(self, links = None, images = None, anchors = None):
+        self.links = links if links != None else []
+        self.images = images if images != None else []
+        self.anchors = anchors if anchors != None else []
+
+    def add_refs(self, refs):
+        # refs are (kind, value) pairs, as stored in the block cache.
+        for kind, value in refs:
+            if kind == "link":
+                self.links.append(value)
+            elif kind == "image":
+                self.images.append(value)
+            elif kind == "anchor":
+                self.anchors.append(value)
+
+    def to_dict(self):
+        return {"links": self.links, "images": self.images, "anchors": self.anchors}
+
+def node_refs(node):
+    # Every link, image and heading anchor in an HTMLNode tree, as (kind, value)
+    # pairs. Walks the nodes we already built; no HTML gets parsed.
+    refs = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        props = current.properties
+        if props != None:
+            if current.tag == "a" and "href" in props:
+                refs.append(("link", props["href"]))
+            elif current.tag == "img" and "src" in props:
+                refs.append(("image", props["src"]))
+            elif "id" in props and current.tag in HEADING_TAGS:
+                refs.append(("anchor", props["id"]))
+        if current.children != None:
+            stack.extend(reversed(current.children))
+    return refs
+
+HEADING_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+
+class BrokenLink():
+    __slots__ = ("page", "kind", "url", "reason")
+
+    def __init__(self, page, kind, url, reason):
+        self.page = page
+        self.kind = kind
+        self.url = url
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.page}: broken {self.kind} {self.url} ({self.reason})"
+
+
+def is_external(url):
+    # Anything with a scheme (https:, mailto:, data:...) or a host isn't ours to check.
+    return url.startswith("//") or URL_SCHEME.match(url) != None
+
+class LinkIndex():
+    def __init__(self, pages = None):
+        # page (relative to the output directory, with "/"s) -> PageLinks
+        self.pages = pages if pages != None else {}
+        # page -> frozenset of its anchors, built the first time something links there.
+        self.anchor_sets = {}
+
+    def set_page(self, page, page_links):
+        self.pages[page] = page_links
+        self.anchor_sets.pop(page, None)
+
+    def retain(self, pages):
+        # Forget pages that aren't part of the site any more.
+        for page in list(self.pages):
+            if page not in pages:
+                del self.pages[page]
+
+    def resolve(self, page, url, basepath, files):
+        # Returns (target file or None, fragment, reason). target is relative
+        # to the output directory, like the keys of self.pages.
+        url, _, fragment = url.partition("#")
+        url = url.partition("?")[0]
+        if url == "":
+            return page, fragment, None
+        if url.startswith("/"):
+            if not url.startswith(basepath):
+                return None, fragment, f"outside of basepath {basepath}"
+            path = url[len(basepath):]
+        else:
+            path = posixpath.join(posixpath.dirname(page), url)
+        path = posixpath.normpath(path) if path else ""
+        if path == ".":
+            path = ""
+        if path.startswith(".."):
+            return None, fragment, "points outside the site"
+        # Directories serve their index.html, and most hosts will serve
+        # foo.html for foo.
+        for candidate in (path, posixpath.join(path, "index.html") if path else "index.html", path + ".html"):
+            if candidate in files:
+                return candidate, fragment, None
+        return None, fragment, "no such file"
+
+    def check(self, basepath, files):
+        # files is every output path (relative, with "/"s) the site contains.
+        broken = []
+        for page in sorted(self.pages):
+            page_links = self.pages[page]
+            for kind, urls in (("link", page_links.links), ("image", page_links.images)):
+                for url in urls:
+                    if is_external(url):
+                        continue
+                    target, fragment, reason = self.resolve(page, url, basepath, files)
+                    if target == None:
+                        broken.append(BrokenLink(page, kind, url, reason))
+                    elif fragment and kind == "link" and target in self.pages and fragment not in self.anchor_set(target):
+                        broken.append(BrokenLink(page, kind, url, f"no heading #{fragment} in {target}"))
+        return broken
+
+    def anchor_set(self, page):
+        anchors = self.anchor_sets.get(page)
+        if anchors == None:
+            anchors = self.anchor_sets[page] = frozenset(self.pages[page].anchors)
+        return anchors
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        return cls({page: PageLinks(value["links"], value["images"], value["anchors"]) for page, value in data.items()})
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({page: page_links.to_dict() for page, page_links in self.pages.items()}, f)
+        os.replace(temp_path, path)
@@ -0,0 +1,197 @@
+import os, posixpath
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from htmlnode import LeafNode, ParentNode, escape_text, escape_attribute
+from template import load_template
+from pipeline import write_atomic, make_directories
+from manifest import hash_bytes
+from patterns import SLUG_DROP, SLUG_SPACES
+
+# Pages made from the metadata index (metadata.py) rather than from markdown:
+# for every directory with dated pages in it (or below it), a paginated
+# archive and an Atom and an RSS feed, and for every tag, a paginated list
+# of the pages with that tag. Pages without a date in their front matter
+# aren't posts, and don't get listed.
+#
+#   blog/archive/index.html    the newest posts in blog/ (and below it)
+#   blog/archive/1.html ...    every post, LISTING_SIZE at a time
+#   blog/atom.xml, rss.xml     the newest FEED_SIZE posts
+#   tags/index.html            every tag
+#   tags/python/index.html ... the same as an archive, for one tag
+#
+# Archive pages are numbered from the oldest post, not the newest, so that a
+# new post only lands on the last page (and index.html) instead of pushing
+# one post along every page. Everything gets rendered every build (it's just
+# a few links per post), but a file is only written if it came out different
+# from last time, so adding a post rewrites its archive pages and feeds and
+# nothing else.
+
+LISTING_SIZE = 20
+FEED_SIZE = 20
+ARCHIVE_DIR = "archive"
+TAGS_DIR = "tags"
+ATOM_FEED = "atom.xml"
+RSS_FEED = "rss.xml"
+
+def slug(text):
+    # Made the same way as heading ids (see heading_slug), so letters in any
+    # script stay: "Static Sites" -> "static-sites", "Café" -> "café".
+    return SLUG_SPACES.sub("-", SLUG_DROP.sub("", text.strip().lower())) or "-"
+
+def dated_posts(pages):
+    # Every page with a date, oldest first (ties broken by url, so the order
+    # never depends on the order we found them in).
+    return sorted((entry for entry in pages.values() if entry["date"] != None), key = lambda entry : (entry["date"], entry["url"]))
+
+def sections(posts):
+    # directory ("" for the site root) -> the posts in it or below it, oldest first.
+    found = {}
+    for post in posts:
+        directory = posixpath.dirname(post["url"])
+        while True:
+            found.setdefault(directory, []).append(post)
+            if not directory:
+                break
+            directory = posixpath.dirname(directory)
+    return found
+
+def paginate(posts, directory, title, size):
+    # (url, title, posts, newer url, older url) for every page of a listing
+    # of posts in directory (a url, with a trailing "/"). The newest page is
+    # there twice, as its number and as index.html.
+    chunks = [posts[start:start + size] for start in range(0, len(posts), size)]
+    pages = []
+    for number, chunk in enumerate(chunks, 1):
+        newer = f"{directory}{number + 1}.html" if number < len(chunks) else None
+        older = f"{directory}{number - 1}.html" if number > 1 else None
+        page_title = title if number == 1 else f"{title} (page {number})"
+        pages.append((f"{directory}{number}.html", page_title, chunk, newer, older))
+    if pages:
+        url, page_title, chunk, newer, older = pages[-1]
+        pages.append((f"{directory}index.html", page_title, chunk, newer, older))
+    return pages
+
+def post_item(post, basepath):
+    children = [LeafNode("a", post["title"] or post["url"], {"href": basepath + post["url"]}), LeafNode(None, " "), LeafNode("time", post["date"][:10], {"datetime": post["date"]})]
+    if post["summary"]:
+        children.append(LeafNode("p", post["summary"]))
+    return ParentNode("li", children)
+
+def listing_node(title, posts, basepath, newer = None, older = None):
+    # Newest first, like you'd expect to read them.
+    children = [LeafNode("h1", title), ParentNode("ul", [post_item(post, basepath) for post in reversed(posts)], {"class": "listing"})]
+    links = []
+    if newer != None:
+        links.append(LeafNode("a", "Newer", {"href": basepath + newer, "rel": "prev"}))
+    if older != None:
+        links.append(LeafNode("a", "Older", {"href": basepath + older, "rel": "next"}))
+    if links:
+        children.append(ParentNode("nav", links))
+    return ParentNode("div", children)
+
+def tags_node(tags, basepath):
+    # tags: [(slug, name, posts)]
+    items = [ParentNode("li", [LeafNode("a", name, {"href": f"{basepath}{TAGS_DIR}/{tag}/index.html"}), LeafNode(None, f" ({len(posts)})")]) for tag, name, posts in tags]
+    return ParentNode("div", [LeafNode("h1", "Tags"), ParentNode("ul", items, {"class": "listing"})])
+
+def feed_time(date):
+    # Feeds want a timezone; posts that don't give one are taken to be in UTC.
+    moment = datetime.fromisoformat(date)
+    return moment if moment.tzinfo != None else moment.replace(tzinfo = timezone.utc)
+
+def atom_feed(title, url, posts, basepath, site_url = ""):
+    # posts oldest first, like everywhere else; the feed has them newest first.
+    base = site_url + basepath
+    lines = ["<?xml version=\"1.0\" encoding=\"utf-8\"?>", "<feed xmlns=\"http://www.w3.org/2005/Atom\">",
+             f"<title>{escape_text(title)}</title>",
+             f"<link href=\"{escape_attribute(base + url)}\" rel=\"self\"/>",
+             f"<link href=\"{escape_attribute(base + posixpath.dirname(url))}\"/>",
+             f"<id>{escape_text(base + url)}</id>",
+             f"<updated>{feed_time(posts[-1]['date']).isoformat()}</updated>"]
+    for post in reversed(posts):
+        lines.append("<entry>")
+        lines.append(f"<title>{escape_text(post['title'] or post['url'])}</title>")
+        lines.append(f"<link href=\"{escape_attribute(base + post['url'])}\"/>")
+        lines.append(f"<id>{escape_text(base + post['url'])}</id>")
+        lines.append(f"<updated>{feed_time(post['date']).isoformat()}</updated>")
+        if post["summary"]:
+            lines.append(f"<summary>{escape_text(post['summary'])}</summary>")
+        lines.append("</entry>")
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+def rss_feed(title, url, posts, basepath, site_url = ""):
+    base = site_url + basepath
+    lines = ["<?xml version=\"1.0\" encoding=\"utf-8\"?>", "<rss version=\"2.0\">", "<channel>",
+             f"<title>{escape_text(title)}</title>",
+             f"<link>{escape_text(base + posixpath.dirname(url))}</link>",
+             f"<description>{escape_text(title)}</description>",
+             f"<lastBuildDate>{format_datetime(feed_time(posts[-1]['date']))}</lastBuildDate>"]
+    for post in reversed(posts):
+        lines.append("<item>")
+        lines.append(f"<title>{escape_text(post['title'] or post['url'])}</title>")
+        lines.append(f"<link>{escape_text(base + post['url'])}</link>")
+        lines.append(f"<guid>{escape_text(base + post['url'])}</guid>")
+        lines.append(f"<pubDate>{format_datetime(feed_time(post['date']))}</pubDate>")
+        if post["summary"]:
+            lines.append(f"<description>{escape_text(post['summary'])}</description>")
+        lines.append("</item>")
+    lines.append("</channel>")
+    lines.append("</rss>")
+    return "\n".join(lines) + "\n"
+
+def section_titles(pages):
+    # directory -> the title of its index page, for naming its archive.
+    return {posixpath.dirname(entry["url"]): entry["title"] for entry in pages.values() if posixpath.basename(entry["url"]) == "index.html" and entry["title"]}
+
+def site_tags(posts):
+    # [(slug, name, posts)], by slug. Tags that only differ in case (or
+    # punctuation) are the same tag, named the way its oldest post has it.
+    tags = {}
+    for post in posts:
+        for name in post["tags"]:
+            tags.setdefault(slug(name), (name, []))[1].append(post)
+    return [(tag, name, tagged) for tag, (name, tagged) in sorted(tags.items())]
+
+def write_listings(pages, old_listings, dest_path, basepath, template_of, site_url = "", size = LISTING_SIZE):
+    # pages is a MetadataIndex's pages. template_of(directory) is the template
+    # path for a directory of the site. Writes whichever listings and feeds
+    # came out different from old_listings (output -> {"hash", "output"}, as
+    # returned last time) or are missing, and returns (listings, how many
+    # files were written).
+    page_urls = set(entry["url"] for entry in pages.values())
+    listings = {}
+    written = 0
+    def put(url, text):
+        nonlocal written
+        if url in page_urls:
+            raise Exception(f"{url} is both a page and a listing; move the page somewhere else")
+        output = os.path.join(dest_path, *url.split("/"))
+        digest = hash_bytes(text.encode())
+        listings[output] = {"hash": digest, "output": output}
+        old = old_listings.get(output)
+        if old == None or old["hash"] != digest or not os.path.isfile(output):
+            make_directories([output])
+            write_atomic(output, text)
+            written += 1
+    def put_listing(template, url, title, node):
+        put(url, template.render(Title = escape_attribute(title), Content = node.to_html()))
+    posts = dated_posts(pages)
+    titles = section_titles(pages)
+    for directory, section_posts in sorted(sections(posts).items()):
+        prefix = directory + "/" if directory else ""
+        name = titles.get(directory) or posixpath.basename(directory) or "Posts"
+        template = load_template(template_of(directory), basepath)
+        for url, title, chunk, newer, older in paginate(section_posts, f"{prefix}{ARCHIVE_DIR}/", f"{name}: archive", size):
+            put_listing(template, url, title, listing_node(title, chunk, basepath, newer, older))
+        newest = section_posts[-FEED_SIZE:]
+        put(prefix + ATOM_FEED, atom_feed(name, prefix + ATOM_FEED, newest, basepath, site_url))
+        put(prefix + RSS_FEED, rss_feed(name, prefix + RSS_FEED, newest, basepath, site_url))
+    tags = site_tags(posts)
+    if tags:
+        template = load_template(template_of(""), basepath)
+        put_listing(template, f"{TAGS_DIR}/index.html", "Tags", tags_node(tags, basepath))
+        for tag, name, tagged in tags:
+            for url, title, chunk, newer, older in paginate(tagged, f"{TAGS_DIR}/{tag}/", f"Posts tagged {name}", size):
+                put_listing(template, url, title, listing_node(title, chunk, basepath, newer, older))
+    return listings, written
@@ -1,78 +1,591 @@
 from textnode import TextNode, TextType
 from markdown_to_nodes import markdown_to_html_node
-import os, shutil, os.path, re
-import sys
+from manifest import Manifest, hash_file
+from template import load_template
+from htmlnode import escape_attribute
+from blockcache import BlockCache
+from profiler import Profiler, phase
+from staticsync import sync_static, MODES as STATIC_MODES
+from pipeline import run_pipeline, atomic_open, write_atomic, make_directories
+from compress import precompress
+from linkindex import LinkIndex, PageLinks, is_external
+from depgraph import DependencyGraph
+from shard import shard_pages, shard_paths, save_shard_info, load_costs, parse_shard, SHARD_DIR
+from search import PageText, PageTermStore, PageTextRecorder, SearchIndexer, tokenize
+from metadata import MetadataIndex, read_metadata, skip_front_matter
+from listings import write_listings, LISTING_SIZE
+from images import process_images
+import cProfile
+import os, shutil, os.path
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 from markdown_to_nodes import create_quote_parent_node
 
-def migrate(source, target):
-    # Migrates all contents from the source directory to the target directory.
-    # NB: This deletes everything in target! Be careful with it!
-    if os.path.exists(target):
-        shutil.rmtree(target)
-    os.mkdir(target)
-    for item in os.listdir(source):
-        if os.path.isdir(os.path.join(source, item)):
-            migrate(os.path.join(source, item), os.path.join(target, item))
-        elif os.path.isfile(os.path.join(source, item)):
-            shutil.copy(os.path.join(source, item), os.path.join(target, item))
-
 def extract_title(markdown):
-    # Pulls the (first) h1 header from markdown.
-    # Raises an exception if there's no h1 header.
-    lines = markdown.split("\n")
-    for line in lines:
-        if re.match(r"# ", line):
-            return line[2:]
-    raise Exception("No header found!")
-
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    # Pulls the title from markdown's front matter or else its (first) h1
+    # header. markdown can be a string or an open file. We stop reading as
+    # soon as we find it.
+    # Raises an exception if there's no title either way.
+    title = read_metadata(markdown)["title"]
+    if title == None:
+        raise Exception("No header found!")
+    return title
+
+def read_markdown(from_path):
+    with open_markdown(from_path) as f:
+        return f.read()
+
+def open_markdown(from_path):
     if not os.path.exists(from_path) or not os.path.isfile(from_path):
         raise Exception(f"No file exists at {from_path}")
-    if not os.path.exists(template_path) or not os.path.isfile(template_path):
-        raise Exception(f"No file exists at {template_path}")
-    with open(from_path, "r") as f:
-        md = f.read()
-    with open(template_path, "r") as f:
-        template = f.read()
-    html = markdown_to_html_node(md).to_html()
-    title = extract_title(md)
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", html)
-    template = template.replace("href=\"/", f"href=\"{basepath}")
-    template = template.replace("src=\"/", f"src=\"{basepath}")
-    # We need to do some funny nonsense with dest_path to make sure
-    # that all of the intermediate directories exist.
-    split_dest_path = dest_path.split("/")
-    partial_path = ""
-    for directory in split_dest_path[:-1]:
-        partial_path = os.path.join(partial_path, directory)
-        if not os.path.isdir(partial_path):
-            os.mkdir(partial_path)
-    with open(dest_path, "w") as f:
-        f.write(template)
-
-def generate_pages_recursive(from_path, template_path, dest_path, basepath):
-    if os.path.isfile(from_path) and from_path[-3:] == ".md":
-        if dest_path[-3:] == ".md":
-            dest_path = dest_path[:-3] + ".html"
-        generate_page(from_path, template_path, dest_path, basepath)
-        return
-    for item in os.listdir(from_path):
-        generate_pages_recursive(os.path.join(from_path, item), template_path, os.path.join(dest_path, item), basepath)
-    return
-
-
-
-def main(basepath):
-    migrate('static', 'docs')
-    generate_pages_recursive("content", "template.html", "docs", basepath)
+    return open(from_path, "r")
 
-if __name__ == "__main__":
-    args = sys.argv
-    if len(args) > 1:
-        basepath = args[1]
+# Sources bigger than this don't go through the pipeline (which would read
+# them whole, ahead of time); they get streamed from disk instead.
+STREAM_THRESHOLD = 8 << 20
+
+def page_node(md, title, basepath, cache = None, links = None, page_text = None, images = None):
+    # markdown_to_html_node (minus any front matter), plus filling in page_text
+    # (a search.PageText) if we were given one.
+    md = skip_front_matter(md)
+    if page_text == None:
+        return markdown_to_html_node(md, basepath, cache, links, images = images)
+    page_text.title = title
+    return markdown_to_html_node(md, basepath, cache, links, page_text.blocks, images)
+
+def write_page(from_path, template_path, dest_path, basepath, cache = None, links = None, page_text = None, images = None):
+    # Markdown file in, finished HTML page out, without ever holding either
+    # whole in memory: the markdown gets streamed from from_path a block at a
+    # time, and the HTML streamed into dest_path as each block is finished. So
+    # memory goes with the biggest block, not the biggest page. The title is
+    # plain text, so it gets escaped (for attributes, which covers both places
+    # a template might put it).
+    # dest_path's directory has to exist already.
+    template = load_template(template_path, basepath)
+    with open_markdown(from_path) as md:
+        title = extract_title(md)
+        md.seek(0)
+        node = page_node(md, title, basepath, cache, links, page_text, images)
+        with atomic_open(dest_path) as f:
+            template.write(f, Title = escape_attribute(title), Content = node)
+
+def write_page_profiled(from_path, template_path, dest_path, basepath, cache, profiler, links = None, page_text = None, images = None):
+    # Produces exactly what write_page does, but one phase at a time so that
+    # each can be timed on its own. That means building the whole tree and the
+    # whole page in memory rather than streaming, so it's only for --profile.
+    # Blocks that miss the block cache get serialized (and cached) under
+    # "serialize" along with everything else, not under "parse".
+    with profiler.phase("template", from_path):
+        template = load_template(template_path, basepath)
+    with profiler.phase("read", from_path):
+        md = read_markdown(from_path)
+    with profiler.phase("parse", from_path):
+        title = extract_title(md)
+        node = page_node(md, title, basepath, cache, links, page_text, images)
+        node.children = list(node.children)
+    with profiler.phase("serialize", from_path):
+        html = node.to_html()
+    with profiler.phase("substitute", from_path):
+        html = template.render(Title = escape_attribute(title), Content = html)
+    with profiler.phase("write", from_path):
+        write_atomic(dest_path, html)
+
+def announce_page(from_path, template_path, dest_path):
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+
+def generate_page(from_path, template_path, dest_path, basepath, cache = None, profiler = None, links = None, page_text = None, images = None):
+    announce_page(from_path, template_path, dest_path)
+    make_directories([dest_path])
+    if profiler == None:
+        write_page(from_path, template_path, dest_path, basepath, cache, links, page_text, images)
+    else:
+        write_page_profiled(from_path, template_path, dest_path, basepath, cache, profiler, links, page_text, images)
+
+# Each worker process gets its own copy of the block cache, seeded from the
+# parent's when the pool starts up, and its own profiler if we're profiling.
+worker_cache = None
+worker_profiler = None
+
+worker_search = None
+worker_images = None
+
+def init_worker(cache_max_bytes, cache_entries, profiling, search = None, images = None):
+    global worker_cache, worker_profiler, worker_search, worker_images
+    worker_search = search
+    worker_images = images
+    if cache_max_bytes != None:
+        worker_cache = BlockCache(cache_max_bytes)
+        worker_cache.update(cache_entries)
+        worker_cache.added = []
+    if profiling:
+        worker_profiler = Profiler()
+        worker_profiler.start()
+
+def generate_page_quietly(job):
+    # Worker side of generate_pages. Workers do their own writing so we don't
+    # ship whole pages back through a pipe, but they leave the printing to the
+    # parent so that the progress output comes out in order. They do send back
+    # their block cache activity (and profile) and the page's links, so the
+    # parent sees everything. The page's text goes to the search recorder
+    # right here instead.
+    from_path, template_path, dest_path, basepath = job
+    hits, misses = (worker_cache.hits, worker_cache.misses) if worker_cache != None else (0, 0)
+    links = PageLinks()
+    page_text = PageText() if worker_search != None else None
+    if worker_profiler == None:
+        write_page(from_path, template_path, dest_path, basepath, worker_cache, links, page_text, worker_images)
+        records = []
+    else:
+        write_page_profiled(from_path, template_path, dest_path, basepath, worker_cache, worker_profiler, links, page_text, worker_images)
+        records = worker_profiler.take_records()
+    if page_text != None:
+        worker_search.record(from_path, dest_path, page_text)
+    if worker_cache == None:
+        return job, 0, 0, [], records, links
+    return job, worker_cache.hits - hits, worker_cache.misses - misses, worker_cache.take_added(), records, links
+
+def generate_pages_pipelined(pages, basepath, cache = None, io_threads = 2, links = None, search = None, images = None):
+    # Reads and writes happen on I/O threads while this thread renders, so
+    # the disk and the CPU are both kept busy. pages are (source, destination,
+    # template) triples.
+    def read(page):
+        if os.path.getsize(page[0]) > STREAM_THRESHOLD:
+            return None
+        return read_markdown(page[0])
+    def render(page, md):
+        from_path, dest_path, template_path = page
+        announce_page(from_path, template_path, dest_path)
+        page_links, page_text = page_collectors(dest_path, links, search)
+        if md == None:
+            # Too big to hold onto; stream it through right here instead.
+            write_page(from_path, template_path, dest_path, basepath, cache, page_links, page_text, images)
+            html = None
+        else:
+            title = extract_title(md)
+            template = load_template(template_path, basepath)
+            html = template.render(Title = escape_attribute(title), Content = page_node(md, title, basepath, cache, page_links, page_text, images).to_html())
+        if page_text != None:
+            search.record(from_path, dest_path, page_text)
+        return html
+    def write(page, html):
+        if html != None:
+            write_atomic(page[1], html)
+    run_pipeline(pages, read, render, write, io_threads)
+
+def page_collectors(dest_path, links = None, search = None):
+    # A fresh PageLinks and PageText for dest_path, for whichever of the two
+    # we're collecting. The PageText is only the caller's to hand to search
+    # once the page is rendered; nothing else keeps it.
+    page_links = page_text = None
+    if links != None:
+        page_links = links[dest_path] = PageLinks()
+    if search != None:
+        page_text = PageText()
+    return page_links, page_text
+
+def generate_pages(pages, template_path, basepath, jobs = 1, cache = None, profiler = None, io_threads = 2, links = None, search = None, images = None):
+    # Renders a list of (source, destination) pairs, or (source, destination,
+    # template) triples for pages that don't use template_path: across a process pool
+    # if jobs > 1, otherwise through the read/render/write pipeline (or one
+    # page at a time, when profiling or with io_threads = 0). The output is
+    # the same every way. If links is a dict, it ends up mapping each
+    # destination to the PageLinks of that page. If search is a
+    # search.PageTextRecorder, every page's text goes to it as soon as the
+    # page is done. images (an images.ImageIndex) fills in the sizes of the
+    # images pages use.
+    # Every output directory gets made here, once, so nothing after this has to.
+    pages = [page if len(page) == 3 else (page[0], page[1], template_path) for page in pages]
+    make_directories([dest_path for (from_path, dest_path, page_template) in pages])
+    if jobs > 1 and len(pages) > 1:
+        generate_pages_parallel(pages, basepath, jobs, cache, profiler, links, search, images)
+    elif profiler != None or io_threads <= 0:
+        for from_path, dest_path, template_path in pages:
+            announce_page(from_path, template_path, dest_path)
+            page_links, page_text = page_collectors(dest_path, links, search)
+            if profiler == None:
+                write_page(from_path, template_path, dest_path, basepath, cache, page_links, page_text, images)
+            else:
+                write_page_profiled(from_path, template_path, dest_path, basepath, cache, profiler, page_links, page_text, images)
+            if page_text != None:
+                search.record(from_path, dest_path, page_text)
+    else:
+        generate_pages_pipelined(pages, basepath, cache, io_threads, links, search, images)
+
+def generate_pages_parallel(pages, basepath, jobs, cache = None, profiler = None, links = None, search = None, images = None):
+    work = [(from_path, template_path, dest_path, basepath) for (from_path, dest_path, template_path) in pages]
+    # Small chunks keep the progress output flowing; big ones cut down on IPC.
+    chunksize = max(1, min(32, len(work) // (jobs * 4)))
+    if cache == None:
+        initargs = (None, None, profiler != None, search, images)
+    else:
+        initargs = (cache.max_bytes, list(cache.entries.items()), profiler != None, search, images)
+    with ProcessPoolExecutor(max_workers = jobs, initializer = init_worker, initargs = initargs) as pool:
+        # map hands results back in submission order, so this prints in the
+        # same order a serial build would.
+        for job, hits, misses, added, records, page_links in pool.map(generate_page_quietly, work, chunksize = chunksize):
+            from_path, template_path, dest_path, basepath = job
+            announce_page(from_path, template_path, dest_path)
+            if links != None:
+                links[dest_path] = page_links
+            if cache != None:
+                cache.hits += hits
+                cache.misses += misses
+                cache.update(added)
+            if profiler != None:
+                profiler.add_records(records)
+
+def collect_pages(from_path, dest_path):
+    # Walks from_path for markdown files and hands back (source, destination)
+    # pairs, destinations ending in .html instead of .md.
+    pages = []
+    if os.path.isfile(from_path):
+        if from_path[-3:] == ".md":
+            pages.append((from_path, dest_path[:-3] + ".html"))
+        return pages
+    for item in sorted(os.listdir(from_path)):
+        pages.extend(collect_pages(os.path.join(from_path, item), os.path.join(dest_path, item)))
+    return pages
+
+SECTION_TEMPLATE = "_template.html"
+
+def section_template(directory, content_path, template_path, known = None):
+    # The nearest _template.html in directory or above it (but not above
+    # content_path), or else template_path. known memoises it per directory.
+    if known != None and directory in known:
+        return known[directory]
+    candidate = os.path.join(directory, SECTION_TEMPLATE)
+    parent = os.path.dirname(directory)
+    if os.path.isfile(candidate):
+        template = candidate
+    elif os.path.normpath(directory) == os.path.normpath(content_path) or parent == directory:
+        template = template_path
     else:
-        basepath = "/"
-    main(basepath)
\ No newline at end of file
+        template = section_template(parent, content_path, template_path, known)
+    if known != None:
+        known[directory] = template
+    return template
+
+def template_for(source, content_path, template_path, known = None):
+    return section_template(os.path.dirname(source), content_path, template_path, known)
+
+def remove_output(path, root):
+    # Deletes a stale output file, then tidies up any directories that
+    # it leaves empty (but never root itself).
+    if os.path.isfile(path):
+        os.remove(path)
+    directory = os.path.dirname(path)
+    root = os.path.normpath(root)
+    while directory and os.path.normpath(directory) != root and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+MANIFEST_PATH = os.path.join(".cache", "manifest.json")
+
+def deps_path_for(manifest_path):
+    return os.path.join(os.path.dirname(manifest_path), "deps.bin")
+
+def static_inputs(page, urls, basepath, static_files):
+    # The static sources behind whichever of urls (as they appear on page)
+    # point at our static files. static_files maps output (relative, with
+    # "/"s) -> source.
+    resolver = LinkIndex()
+    sources = []
+    for url in urls:
+        if is_external(url):
+            continue
+        target, fragment, reason = resolver.resolve(page, url, basepath, static_files)
+        if target != None and static_files[target] not in sources:
+            sources.append(static_files[target])
+    return sources
+
+def record_dependencies(graph, pages, templates, page_links, basepath, static_files, dest_path):
+    # pages are the (source, destination, template) triples we just rendered,
+    # page_links their PageLinks, and templates every template in use.
+    for source, target, template_path in pages:
+        found = page_links.get(target)
+        images = static_inputs(site_path(target, dest_path), found.images, basepath, static_files) if found != None else []
+        graph.set_inputs(target, [source, template_path] + images)
+    for template_path in templates:
+        # Assets in templates are written site-absolute, before rebasing.
+        for path, (includes, assets) in load_template(template_path, basepath).files.items():
+            graph.set_inputs(path, includes + static_inputs("", ["/" + asset for asset in assets], "/", static_files))
+
+def metadata_path_for(manifest_path):
+    return os.path.join(os.path.dirname(manifest_path), "metadata.json")
+
+def update_listings(manifest, old_listings, manifest_path, content_path, template_path, basepath, dest_path, site_url = "", listing_size = LISTING_SIZE, fresh = False):
+    # The metadata pre-pass over every page in manifest (only re-reading the
+    # ones whose source changed, unless fresh), then the listings and feeds
+    # made from it. Sets manifest.listings, and returns how many were written.
+    metadata_path = metadata_path_for(manifest_path)
+    metadata = MetadataIndex() if fresh else MetadataIndex.load(metadata_path)
+    metadata.update(manifest.pages, dest_path)
+    known = {}
+    def template_of(directory):
+        return section_template(os.path.join(content_path, *directory.split("/")) if directory else content_path, content_path, template_path, known)
+    manifest.listings, written = write_listings(metadata.pages, old_listings, dest_path, basepath, template_of, site_url, listing_size)
+    metadata.save(metadata_path)
+    return written
+
+def images_path_for(manifest_path):
+    return os.path.join(os.path.dirname(manifest_path), "images.json")
+
+def links_path_for(manifest_path):
+    # The link index lives next to the manifest, since it has to stay in
+    # step with it: pages the manifest calls fresh don't get re-rendered,
+    # so this is the only place their links are remembered.
+    return os.path.join(os.path.dirname(manifest_path), "links.json")
+
+def site_path(path, dest_path):
+    # docs/blog/post.html -> blog/post.html, which is what the link index uses.
+    return os.path.relpath(path, dest_path).replace(os.sep, "/")
+
+def update_link_index(link_index, page_links, manifest, dest_path):
+    # Folds freshly collected page links into the index and drops pages that are gone.
+    for target, found in page_links.items():
+        link_index.set_page(site_path(target, dest_path), found)
+    link_index.retain(set(site_path(entry["output"], dest_path) for entry in manifest.pages.values()))
+
+def check_links(link_index, page_links, manifest, basepath, dest_path):
+    # update_link_index, then returns every broken link on the site.
+    update_link_index(link_index, page_links, manifest, dest_path)
+    files = set(site_path(entry["output"], dest_path) for entries in (manifest.pages, manifest.static, manifest.listings, manifest.images) for entry in entries.values())
+    return link_index.check(basepath, files)
+
+def read_page_text(source, basepath, cache = None):
+    # The PageText of a page without writing the page anywhere.
+    md = read_markdown(source)
+    page_text = PageText()
+    for block in page_node(md, extract_title(md), basepath, cache, page_text = page_text).children:
+        pass
+    return page_text
+
+def term_store(cache_path):
+    # Where the search index's cache (in cache_path) keeps each page's terms.
+    return PageTermStore(os.path.join(cache_path, "pages"))
+
+def update_search_index(manifest, basepath, dest_path, cache_path, cache = None):
+    # Writes dest_path/search/ for every page in manifest, from the terms in
+    # the store. Pages we just rendered went in as they were rendered (see
+    # PageTextRecorder), and the rest on an earlier build.
+    store = term_store(cache_path)
+    indexer = SearchIndexer(os.path.join(cache_path, "runs"))
+    pages = []
+    # Sorted by output, so page ids don't depend on which pages were rebuilt.
+    for source, entry in sorted(manifest.pages.items(), key = lambda item : item[1]["output"]):
+        page = site_path(entry["output"], dest_path)
+        pages.append(page)
+        stored = store.get(page, entry["hash"])
+        if stored == None:
+            # Rendered on a build without --search, so we never saw its text.
+            page_text = read_page_text(source, basepath, cache)
+            title, terms = page_text.title, tokenize(page_text.blocks)
+            store.put(page, entry["hash"], title, terms)
+        else:
+            title, terms = stored
+        indexer.add_page(basepath + page, title, terms)
+    store.retain(pages)
+    return indexer.write(os.path.join(dest_path, "search"))
+
+def report_broken_links(broken):
+    for link in broken:
+        print(link)
+    if broken:
+        print(f"Found {len(broken)} broken link(s)")
+
+def build(basepath, static_path = "static", content_path = "content", template_path = "template.html", dest_path = "docs", manifest_path = MANIFEST_PATH, full = False, jobs = 1, cache = None, profiler = None, static_mode = "copy", io_threads = 2, gzip_min_bytes = None, search = False, shard = None, shard_costs = None, site_url = "", listing_size = LISTING_SIZE):
+    # Incremental build. We only re-render pages (and re-copy static files)
+    # whose contents changed since the last build, and we clean up outputs
+    # whose sources went away. Pages also get re-rendered when anything else
+    # they were built from changed: their template (the nearest _template.html
+    # in content_path, or else template_path), its partials, or a static file
+    # either of them uses. The dependency graph knows which pages those are.
+    # If basepath changed, every page is stale. If we know nothing about
+    # what's in dest_path (or --full), we wipe it and start over.
+    # With shard = (i, N), we only render slice i of N of the pages (see
+    # shard.py), split by hash or, given shard_costs, by earlier timings.
+    # Listings and feeds (see listings.py) come from the metadata index, and
+    # only the ones that changed get written. Images in static_path get sized
+    # (and resized) once per version, in images.py.
+    with phase(profiler, "manifest"):
+        old = Manifest.load(manifest_path)
+        new = Manifest(hash_file(template_path), basepath)
+        deps_path = deps_path_for(manifest_path)
+        search_path = os.path.join(os.path.dirname(manifest_path), "search")
+    if full or not os.path.isdir(dest_path) or old.template_hash == None:
+        with phase(profiler, "clean"):
+            if os.path.exists(dest_path):
+                shutil.rmtree(dest_path)
+            os.makedirs(dest_path)
+            old = Manifest()
+            graph = DependencyGraph()
+    else:
+        with phase(profiler, "manifest"):
+            graph = DependencyGraph.load(deps_path)
+    all_pages_stale = not old.is_compatible(new)
+    with phase(profiler, "static"):
+        new.static, placed = sync_static(static_path, dest_path, old.static, static_mode)
+        if placed:
+            print(f"Synced {placed} static file(s) from {static_path} to {dest_path}")
+    with phase(profiler, "images"):
+        images, new.images, made = process_images(new.static, old.images, dest_path, os.path.dirname(manifest_path), basepath, jobs, static_mode)
+        if made:
+            print(f"Made {made} resized image(s)")
+    stale_pages = []
+    page_links = {}
+    with phase(profiler, "scan"):
+        known_templates = {}
+        found = collect_pages(content_path, dest_path)
+        if shard != None:
+            found = shard_pages(found, shard[0], shard[1], shard_costs)
+            save_shard_info(manifest_path, shard[0], shard[1])
+        pages = [(source, target, template_for(source, content_path, template_path, known_templates)) for source, target in found]
+        # Everything we've already hashed this build, so nothing gets hashed twice.
+        hashes = {source: entry["hash"] for source, entry in new.static.items()}
+        for source, target, page_template in pages:
+            hashes[source] = hash_file(source)
+            new.pages[source] = {"hash": hashes[source], "output": target}
+        def current_hash(path):
+            if path not in hashes:
+                hashes[path] = hash_file(path) if os.path.isfile(path) else None
+            return hashes[path]
+        # Every output built from something that's changed since, however indirectly.
+        dirty = graph.dependents(graph.changed(current_hash))
+        for source, target, page_template in pages:
+            if all_pages_stale or not old.is_fresh(old.pages, source, hashes[source], target) or target in dirty or not graph.depends_on(target, page_template):
+                stale_pages.append((source, target, page_template))
+    recorder = None
+    if search:
+        # Just (source, hash) for the pages we're about to render; their text
+        # goes straight into the term store as each one is done.
+        recorder = PageTextRecorder(term_store(search_path), dest_path, {source: hashes[source] for source, target, page_template in stale_pages})
+    generate_pages(stale_pages, template_path, basepath, jobs, cache, profiler, io_threads, page_links, recorder, images)
+    with phase(profiler, "dependencies"):
+        static_files = {site_path(entry["output"], dest_path): source for source, entry in new.static.items()}
+        templates = sorted(set(page_template for source, target, page_template in pages))
+        record_dependencies(graph, stale_pages, templates, page_links, basepath, static_files, dest_path)
+        outputs = set(target for source, target, page_template in pages)
+        graph = graph.compacted(outputs)
+        for path in graph.paths:
+            if path not in outputs:
+                graph.set_hash(path, current_hash(path))
+        graph.save(deps_path)
+    if shard == None:
+        # A shard only knows about its own pages; merge.py does the listings.
+        with phase(profiler, "listings"):
+            written = update_listings(new, old.listings, manifest_path, content_path, template_path, basepath, dest_path, site_url, listing_size, fresh = full)
+            if written:
+                print(f"Wrote {written} listing page(s) and feed(s)")
+    with phase(profiler, "cleanup"):
+        # Anything the old manifest knew about that we didn't just produce is stale.
+        current_outputs = set(entry["output"] for entry in new.pages.values())
+        current_outputs.update(entry["output"] for entry in new.static.values())
+        current_outputs.update(new.listings)
+        current_outputs.update(new.images)
+        for entries in (old.pages, old.static, old.listings, old.images):
+            for entry in entries.values():
+                if entry["output"] not in current_outputs:
+                    remove_output(entry["output"], dest_path)
+    with phase(profiler, "links"):
+        links_path = links_path_for(manifest_path)
+        # After a wipe (or a template change) every page was just rendered, so
+        # there's nothing worth keeping from last time.
+        link_index = LinkIndex.load(links_path) if not all_pages_stale else LinkIndex()
+        if shard == None:
+            report_broken_links(check_links(link_index, page_links, new, basepath, dest_path))
+        else:
+            # Links to other shards' pages would all look broken; merge.py
+            # checks the whole site once it's back together.
+            update_link_index(link_index, page_links, new, dest_path)
+        link_index.save(links_path)
+    if search:
+        with phase(profiler, "search"):
+            shards = update_search_index(new, basepath, dest_path, search_path, cache)
+            print(f"Wrote search index for {len(new.pages)} page(s) in {shards} shard(s)")
+    if gzip_min_bytes != None:
+        with phase(profiler, "compress"):
+            report = precompress(dest_path, gzip_min_bytes, threads = jobs if jobs > 1 else None, ours = old.compressed, keep = [entry["output"] for entry in new.static.values()])
+            new.compressed = report.written
+            print(report)
+    else:
+        # Still ours to clean up, whenever --gzip is next used.
+        new.compressed = old.compressed
+    with phase(profiler, "manifest"):
+        new.save(manifest_path)
+    if cache != None:
+        print(cache.report())
+    return new
+
+BLOCK_CACHE_PATH = os.path.join(".cache", "blocks.json")
+
+def main(basepath, full = False, jobs = 1, block_cache_mb = 64, persist_block_cache = False, profile = False, profile_top = 10, profile_json = None, profile_pstats = None, static_mode = "copy", io_threads = 2, gzip_min_bytes = None, search = False, shard = None, shard_dir = SHARD_DIR, shard_costs = None, site_url = "", listing_size = LISTING_SIZE,
+         static_path = "static", content_path = "content", template_path = "template.html", dest_path = "docs", manifest_path = MANIFEST_PATH):
+    cache = None
+    if block_cache_mb > 0:
+        if persist_block_cache:
+            cache = BlockCache.load(BLOCK_CACHE_PATH, block_cache_mb << 20)
+        else:
+            cache = BlockCache(block_cache_mb << 20)
+    profiler = None
+    if profile or profile_json != None:
+        profiler = Profiler()
+        profiler.start()
+    # cProfile only sees this process, so with --jobs it won't include the
+    # page rendering itself. Use it with serial builds.
+    python_profile = cProfile.Profile() if profile_pstats != None else None
+    if python_profile != None:
+        python_profile.enable()
+    if shard != None:
+        dest_path, manifest_path = shard_paths(shard_dir, shard[0])
+        print(f"Building shard {shard[0]}/{shard[1]} into {dest_path}")
+    costs = load_costs(shard_costs) if shard_costs else None
+    build(basepath, static_path, content_path, template_path, dest_path, manifest_path, full = full, jobs = jobs, cache = cache, profiler = profiler, static_mode = static_mode,
+          io_threads = io_threads, gzip_min_bytes = gzip_min_bytes, search = search, shard = shard, shard_costs = costs,
+          site_url = site_url, listing_size = listing_size)
+    if cache != None and persist_block_cache:
+        with phase(profiler, "cache"):
+            cache.save(BLOCK_CACHE_PATH)
+    if python_profile != None:
+        python_profile.disable()
+        python_profile.dump_stats(profile_pstats)
+    if profiler != None:
+        profiler.stop()
+        if profile:
+            print(profiler.summary(profile_top))
+        if profile_json != None:
+            profiler.save_json(profile_json)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build the site in docs/ from content/ and static/.")
+    parser.add_argument("basepath", nargs = "?", default = "/")
+    parser.add_argument("--content", default = "content", metavar = "DIR", help = "where the markdown is")
+    parser.add_argument("--static", default = "static", metavar = "DIR", help = "where the static files are")
+    parser.add_argument("--template", default = "template.html", metavar = "PATH", help = "the site's template")
+    parser.add_argument("--dest", default = "docs", metavar = "DIR", help = "where the site goes")
+    parser.add_argument("--manifest", default = MANIFEST_PATH, metavar = "PATH", help = "where the build manifest (and the other caches, next to it) go")
+    parser.add_argument("--full", action = "store_true", help = "ignore the build manifest and rebuild everything")
+    parser.add_argument("--jobs", "-j", type = int, default = 1, metavar = "N", help = "render pages across N processes (0 means one per core)")
+    parser.add_argument("--io-threads", type = int, default = 2, metavar = "N", help = "threads for reading and writing pages alongside rendering (0 to do it all inline)")
+    parser.add_argument("--block-cache-mb", type = int, default = 64, metavar = "MB", help = "memory bound for the rendered block cache (0 turns it off)")
+    parser.add_argument("--persist-block-cache", action = "store_true", help = f"keep the block cache in {BLOCK_CACHE_PATH} between builds")
+    parser.add_argument("--static-mode", choices = STATIC_MODES, default = "copy", help = "how to put changed static files into docs/")
+    parser.add_argument("--gzip", action = "store_true", help = "write .gz siblings for HTML, CSS, JS and SVG files in docs/")
+    parser.add_argument("--gzip-min-bytes", type = int, default = 1024, metavar = "N", help = "don't bother compressing files smaller than this")
+    parser.add_argument("--search", action = "store_true", help = "write a client-side search index to docs/search/")
+    parser.add_argument("--site-url", default = "", metavar = "URL", help = "the site's scheme and host (like https://example.com), for the links in feeds")
+    parser.add_argument("--listing-size", type = int, default = LISTING_SIZE, metavar = "N", help = "posts per archive page")
+    parser.add_argument("--shard", type = parse_shard, metavar = "i/N", help = f"only render slice i of N of the pages, into {SHARD_DIR}/i (put them back together with merge.py)")
+    parser.add_argument("--shard-dir", default = SHARD_DIR, metavar = "DIR", help = "where --shard puts each shard's output")
+    parser.add_argument("--shard-costs", action = "append", metavar = "PATH", help = "balance shards using the page timings in a previous --profile-json (can be repeated)")
+    parser.add_argument("--profile", action = "store_true", help = "time each build phase and page, and print a summary")
+    parser.add_argument("--profile-top", type = int, default = 10, metavar = "N", help = "how many of the slowest pages to list")
+    parser.add_argument("--profile-json", metavar = "PATH", help = "write the profile as JSON to PATH")
+    parser.add_argument("--profile-pstats", metavar = "PATH", help = "run the build under cProfile and dump pstats to PATH")
+    args = parser.parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    main(args.basepath, full = args.full, jobs = jobs, block_cache_mb = args.block_cache_mb, persist_block_cache = args.persist_block_cache,
+         profile = args.profile, profile_top = args.profile_top, profile_json = args.profile_json, profile_pstats = args.profile_pstats,
+         static_mode = args.static_mode, io_threads = args.io_threads, gzip_min_bytes = args.gzip_min_bytes if args.gzip else None, search = args.search,
+         shard = args.shard, shard_dir = args.shard_dir, shard_costs = args.shard_costs, site_url = args.site_url, listing_size = args.listing_size,
+         static_path = args.static, content_path = args.content, template_path = args.template, dest_path = args.dest, manifest_path = args.manifest)
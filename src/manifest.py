@@ -0,0 +1,87 @@
+import hashlib, json, os
+from htmlnode import HTML_FORMAT
+
+# The manifest is what lets us skip work on rebuilds. It remembers, for every
+# source file we've built, a hash of its contents and where its output went,
+# along with the basepath that was used for the whole build and the version
+# of the HTML serialization (if either changes, every page is stale), and the
+# template hash. It also remembers the listing pages and feeds made from the
+# metadata index (see listings.py), by output, with a hash of what was written,
+# and the same for the resized copies of images (see images.py), and which
+# .gz files precompress wrote (see compress.py), so it only cleans up its own.
+# Which pages a template (or anything else besides their own source) went
+# into is the dependency graph's business; see depgraph.py.
+
+def hash_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+def hash_file(path):
+    # sha1 is plenty for change detection; we aren't defending against anyone.
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class Manifest():
+    def __init__(self, template_hash = None, basepath = None, pages = None, static = None, html_format = HTML_FORMAT, listings = None, images = None, compressed = None):
+        self.template_hash = template_hash
+        self.basepath = basepath
+        self.html_format = html_format
+        # Both of these map source path -> {"hash": ..., "output": ...}
+        self.pages = pages if pages != None else {}
+        self.static = static if static != None else {}
+        # output path -> {"hash": ..., "output": ...}
+        self.listings = listings if listings != None else {}
+        self.images = images if images != None else {}
+        # .gz paths
+        self.compressed = compressed if compressed != None else []
+
+    def is_compatible(self, other):
+        # Can a build described by other reuse outputs recorded in self?
+        return self.basepath == other.basepath and self.html_format == other.html_format
+
+    def is_fresh(self, entries, source, source_hash, output):
+        # True if source was last built from identical contents to the same
+        # output, and that output is still sitting on disk.
+        entry = entries.get(source)
+        if entry == None:
+            return False
+        return entry["hash"] == source_hash and entry["output"] == output and os.path.isfile(output)
+
+    def to_dict(self):
+        return {
+            "template_hash": self.template_hash,
+            "basepath": self.basepath,
+            "html_format": self.html_format,
+            "pages": self.pages,
+            "static": self.static,
+            "listings": self.listings,
+            "images": self.images,
+            "compressed": self.compressed,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("template_hash"), data.get("basepath"), data.get("pages"), data.get("static"), data.get("html_format"), data.get("listings"), data.get("images"), data.get("compressed"))
+
+    @classmethod
+    def load(cls, path):
+        # A missing or mangled manifest just means we don't know anything,
+        # which forces a full rebuild. That's always safe.
+        try:
+            with open(path, "r") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        # Write to the side and rename, so a crash mid-save can't leave us
+        # with half a manifest that claims pages are up to date.
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent = 1, sort_keys = True)
+        os.replace(temp_path, path)
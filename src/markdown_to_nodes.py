@@ -1,7 +1,10 @@
 from textnode import TextNode, TextType
-import re
+import codecs
 from enum import Enum
 from htmlnode import *
+from patterns import *
+from linkindex import node_refs
+from search import node_text
 from string import ascii_lowercase, ascii_uppercase
 
 class BlockType(Enum):
@@ -33,20 +36,20 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 def extract_markdown_images(text):
     # Markdown in, list of tuples out.
     # Each tuple contains alt text and URL for each image.
-    matches = re.findall(r"!\[(.*?)\]\((.*?)\)", text)
+    matches = IMAGE.findall(text)
     return matches
 
 def extract_markdown_links(text):
     # Markdown in, list of tuples out.
     # Each tuple contains anchor text and URL for each link.
-    matches = re.findall(r"(?<!!)\[(.*?)\]\((.*?)\)", text)
+    matches = LINK.findall(text)
     return matches
 
 def split_nodes_image(old_nodes):
     """list of nodes in, new list where we've separated images out"""
     new_nodes = []
     for node in old_nodes:
-        images = list(re.finditer(r"!\[(.*?)\]\((.*?)\)", node.text))
+        images = list(IMAGE.finditer(node.text))
         idx = 0
         starting_idx = 0
         while idx < len(images):
@@ -66,7 +69,7 @@ def split_nodes_link(old_nodes):
     """list of nodes in, new list where we've separated links out"""
     new_nodes = []
     for node in old_nodes:
-        links = list(re.finditer(r"(?<!!)\[(.*?)\]\((.*?)\)", node.text))
+        links = list(LINK.finditer(node.text))
         idx = 0
         starting_idx = 0
         while idx < len(links):
@@ -82,19 +85,209 @@ def split_nodes_link(old_nodes):
             new_nodes.append(TextNode(text_piece, node.text_types, node.url))
     return new_nodes
 
+INLINE_DELIMITERS = {
+    "**": TextType.BOLD,
+    "~~": TextType.STRIKETHROUGH,
+    "*": TextType.ITALIC,
+    "_": TextType.ITALIC,
+}
+
 def text_to_textnodes(text):
-    nodes = [TextNode(text, [], None)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "~~", TextType.STRIKETHROUGH)
-    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    """markdown text in, list of TextNodes out, in a single left-to-right scan"""
+    # We keep a stack of the emphasis delimiters that are currently open.
+    # Seeing a delimiter that's already open closes it (wherever it is in the
+    # stack), otherwise it opens a new one. Like the old split-based version,
+    # a delimiter that never gets closed applies to the rest of the text.
+    # Code spans, images and links are atomic: we don't look inside them.
+    nodes = []
+    open_delimiters = []
+    types = []
+    # Start of the plain text we haven't emitted yet, and where to look next.
+    position = 0
+    search_from = 0
+    while True:
+        match = INLINE_TOKEN.search(text, search_from)
+        if match == None:
+            break
+        token = match.group()
+        start = match.start()
+        if token == "`":
+            end = text.find("`", start + 1)
+            if end == -1:
+                end = len(text)
+            if start > position:
+                nodes.append(TextNode(text[position:start], types))
+            if end > start + 1:
+                nodes.append(TextNode(text[start + 1:end], types + [TextType.CODE]))
+            position = search_from = end + 1
+        elif token[-1] == "[":
+            if token == "![":
+                found = IMAGE_AT.match(text, start)
+                text_type = TextType.IMAGE
+            else:
+                # Links can't come right after a "!" (that'd be a broken image).
+                found = None if start > 0 and text[start - 1] == "!" else LINK_AT.match(text, start)
+                text_type = TextType.LINK
+            if found == None:
+                search_from = match.end()
+                continue
+            if start > position:
+                nodes.append(TextNode(text[position:start], types))
+            nodes.append(TextNode(found.group(1), types + [text_type], found.group(2)))
+            position = search_from = found.end()
+        else:
+            if start > position:
+                nodes.append(TextNode(text[position:start], types))
+            if token in open_delimiters:
+                open_delimiters.remove(token)
+            else:
+                open_delimiters.append(token)
+            # Fresh list every time the stack changes, so nodes can share them.
+            types = [INLINE_DELIMITERS[delimiter] for delimiter in open_delimiters]
+            position = search_from = match.end()
+    if position < len(text):
+        nodes.append(TextNode(text[position:], types))
     return nodes
 
+class Block():
+    # One block of markdown, as found by scan_blocks. start and end are line
+    # offsets into the document (end is one past the last line).
+    __slots__ = ("block_type", "lines", "start", "end")
+
+    def __init__(self, block_type, lines, start, end):
+        self.block_type = block_type
+        self.lines = lines
+        self.start = start
+        self.end = end
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+    def __eq__(self, other):
+        return (self.block_type, self.lines, self.start, self.end) == (other.block_type, other.lines, other.start, other.end)
+
+    def __repr__(self):
+        return f"Block({self.block_type}, {repr(self.lines)}, {self.start}, {self.end})"
+
+CODE_FENCE = "```"
+
+def iter_lines(source, chunk_size = 1 << 16):
+    """markdown (a string, a file or mmap to read it from, or an iterator of
+    lines) in, generator of its lines out"""
+    # Gives exactly the lines source.split("\n") would, but one at a time, so
+    # a huge document never has to be in memory as a list of lines (or, when
+    # it's a file, in memory at all). Files and mmaps get read chunk_size at a
+    # time; bytes are decoded as UTF-8.
+    if isinstance(source, str):
+        start = 0
+        while True:
+            end = source.find("\n", start)
+            if end == -1:
+                yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+    if not hasattr(source, "read"):
+        # Already lines (like another iter_lines), so just pass them along.
+        yield from source
+        return
+    decoder = None
+    pending = []
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if not isinstance(chunk, str):
+            if decoder == None:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = decoder.decode(chunk)
+        if "\n" not in chunk:
+            # One long line across several chunks: don't keep re-joining it.
+            pending.append(chunk)
+            continue
+        pending.append(chunk)
+        lines = "".join(pending).split("\n")
+        pending = [lines.pop()]
+        for line in lines:
+            yield line
+    if decoder != None:
+        pending.append(decoder.decode(b"", final = True))
+    yield "".join(pending)
+
+def scan_blocks(source):
+    """markdown (anything iter_lines takes) in, generator of typed Blocks out,
+    in a single pass over the lines"""
+    # Blank lines separate blocks, except inside a code fence. We work out
+    # each block's type as its lines come in, so nothing gets re-split later,
+    # and only the block we're in the middle of is ever held onto.
+    lines = []
+    start = 0
+    in_fence = False
+    all_quote = all_list = True
+    for number, line in enumerate(iter_lines(source)):
+        if in_fence:
+            lines.append(line)
+            if line.rstrip().endswith(CODE_FENCE):
+                lines[-1] = line.rstrip()
+                yield Block(BlockType.CODE, lines, start, number + 1)
+                lines = []
+                in_fence = False
+            continue
+        if not line.strip():
+            if lines:
+                yield finish_block(lines, start, number, all_quote, all_list)
+                lines = []
+            continue
+        if not lines:
+            # First line of a new block. Like the old split-and-strip version,
+            # we drop whitespace from the outside edges of the block.
+            line = line.lstrip()
+            start = number
+            all_quote = all_list = True
+            if line.startswith(CODE_FENCE):
+                stripped = line.rstrip()
+                if len(stripped) >= 2 * len(CODE_FENCE) and stripped.endswith(CODE_FENCE):
+                    yield Block(BlockType.CODE, [stripped], start, number + 1)
+                else:
+                    lines.append(line)
+                    in_fence = True
+                continue
+        lines.append(line)
+        if not (all_quote or all_list):
+            # Already a paragraph, whatever comes next.
+            continue
+        # One match per line tells us whether it's a quote line, a list line, or neither.
+        kind = BLOCK_LINE.match(line)
+        if kind == None:
+            all_quote = all_list = False
+        elif kind.lastindex == QUOTE_KIND:
+            all_list = False
+        else:
+            all_quote = False
+            if kind.lastindex == HEADING_KIND:
+                all_list = False
+    if lines:
+        # An unclosed code fence just runs to the end of the document.
+        if in_fence:
+            yield Block(BlockType.CODE, lines, start, start + len(lines))
+        else:
+            yield finish_block(lines, start, start + len(lines), all_quote, all_list)
+
+def finish_block(lines, start, end, all_quote, all_list):
+    lines[-1] = lines[-1].rstrip()
+    if len(lines) == 1 and HEADING_LINE.match(lines[0]):
+        block_type = BlockType.HEADING
+    elif all_quote:
+        block_type = BlockType.QUOTE
+    elif all_list:
+        block_type = BlockType.LIST
+    else:
+        block_type = BlockType.PARAGRAPH
+    return Block(block_type, lines, start, end)
+
 def markdown_to_blocks(text):
-    return list(filter(lambda s : len(s) > 0, map(lambda s : s.strip(), text.split("\n\n"))))
+    return [block.text for block in scan_blocks(text)]
 
 def block_to_block_type(text):
     if is_code(text):
@@ -114,62 +307,188 @@ def is_heading(text):
     lines = text.split("\n")
     if len(lines) > 1:
         return False
-    return bool(re.match(r"#{1,6} ", lines[0]))
+    return bool(HEADING_LINE.match(lines[0]))
 
 def is_quote(text):
     lines = text.split("\n")
-    return re.match(r">", lines[0]) and all(map(lambda s : re.match(r"\s*>", s), lines))
+    return lines[0].startswith(">") and all(map(QUOTE_LINE.match, lines))
 
 def is_list(text):
     lines = text.split("\n")
-    return all(map(lambda s : re.match(r"([\s]*[-*] )|([\s]*[0-9a-zA-Z]*[.)] )", s), lines))
+    return all(map(LIST_LINE.match, lines))
+
+def text_to_html_nodes(text, basepath = "/"):
+    return [node.to_html_node(basepath) for node in text_to_textnodes(text)]
 
-def markdown_to_html_node(text):
-    md_blocks = markdown_to_blocks(text)
+def markdown_to_html_node(text, basepath = "/", cache = None, links = None, texts = None, images = None):
+    # text can be a string, or an open file (or mmap) to stream the markdown
+    # from; blocks are read, built and serialized one after another.
+    # If links is a PageLinks (from linkindex), every link, image and heading
+    # anchor on the page gets added to it as the blocks are built. If texts is
+    # a list, each block's plain text gets appended to it (for search.py).
+    # Like the rest of this, that happens lazily, so they're only complete
+    # once the node has been serialized. If images is an images.ImageIndex,
+    # images it knows about get their sizes (and srcset) filled in.
+    md_blocks = scan_blocks(text)
     # Each block becomes a parent node
-    nodes = map(block_to_parent_node, md_blocks)
+    if cache != None:
+        nodes = map(lambda block : cached_block_node(block, basepath, cache, links, texts, images), md_blocks)
+    elif links != None or texts != None or images != None:
+        nodes = map(lambda block : collected_block_node(block, basepath, links, texts, images), md_blocks)
+    else:
+        nodes = map(lambda block : create_block_node(block, basepath), md_blocks)
     # And then we do a single uber-parent
     return ParentNode("div", nodes)
 
-def block_to_parent_node(block):
+def collected_block_node(block, basepath, links = None, texts = None, images = None):
+    node = create_block_node(block, basepath)
+    if images != None and any("![" in line for line in block.lines):
+        images.annotate(node)
+    if links != None:
+        links.add_refs(node_refs(node))
+    if texts != None:
+        texts.append(node_text(node))
+    return node
+
+class UncachedBlockNode(HTMLNode):
+    # A block that wasn't in the cache: its node, plus where to put its HTML
+    # once that gets made. That happens when the page is serialized, like for
+    # every other block, so serializing still counts as serializing (which
+    # --profile times on its own) rather than as part of building the tree.
+    __slots__ = ("cache", "key", "refs", "text")
+
+    def __init__(self, node, cache, key, refs, text):
+        super().__init__(None, node, None, None)
+        self.cache = cache
+        self.key = key
+        self.refs = refs
+        self.text = text
+
+    def to_html(self):
+        html = self.value.to_html()
+        self.cache.put(self.key, html, self.refs, self.text)
+        return html
+
+    def iter_html(self):
+        yield self.to_html()
+
+    def __repr__(self):
+        return f"UncachedBlockNode({repr(self.value)})"
+
+def cached_block_node(block, basepath, cache, links = None, texts = None, images = None):
+    # Same as create_block_node, except that blocks we've rendered before
+    # (anywhere on the site) come straight out of the cache, skipping the
+    # inline parsing entirely. The rest go in the cache as they're serialized.
+    text = block.text
+    has_images = images != None and "![" in text
+    key = cache.key(block.block_type, text, basepath, images.stamp(text) if has_images else "")
+    entry = cache.get(key)
+    if entry == None:
+        node = create_block_node(block, basepath)
+        if has_images:
+            images.annotate(node)
+        refs, block_text = tuple(node_refs(node)), node_text(node)
+        if links != None:
+            links.add_refs(refs)
+        if texts != None:
+            texts.append(block_text)
+        return UncachedBlockNode(node, cache, key, refs, block_text)
+    if links != None:
+        links.add_refs(entry[1])
+    if texts != None:
+        texts.append(entry[2])
+    return RawNode(entry[0])
+
+def create_block_node(block, basepath = "/"):
+    # Block (from scan_blocks) in, HTMLNode out. The builders all work on the
+    # block's lines, which the scanner already split for us.
+    block_type = block.block_type
+    if block_type == BlockType.PARAGRAPH:
+        return create_para_from_lines(block.lines, basepath)
+    if block_type == BlockType.HEADING:
+        return create_header_from_lines(block.lines, basepath)
+    if block_type == BlockType.QUOTE:
+        return create_quote_from_lines(block.lines, basepath)
+    if block_type == BlockType.CODE:
+        return create_code_from_lines(block.lines)
+    if block_type == BlockType.LIST:
+        return create_list_from_lines(block.lines, basepath = basepath)
+
+def block_to_parent_node(block, basepath = "/"):
     # Each block is a wall of text right now.
     block_type = block_to_block_type(block)
-    return create_typed_parent_node(block, block_type)
+    return create_typed_parent_node(block, block_type, basepath)
 
-def create_typed_parent_node(block, block_type):
+def create_typed_parent_node(block, block_type, basepath = "/"):
+    # basepath is threaded down to wherever links and images get built, so
+    # site-absolute URLs come out pointing at the right place.
     if block_type == BlockType.PARAGRAPH:
-        return create_para_parent_node(block)
+        return create_para_parent_node(block, basepath)
     if block_type == BlockType.HEADING:
-        return create_header_parent_node(block)
+        return create_header_parent_node(block, basepath)
     if block_type == BlockType.QUOTE:
-        return create_quote_parent_node(block)
+        return create_quote_parent_node(block, basepath)
     if block_type == BlockType.CODE:
         return create_code_parent_node(block)
     if block_type == BlockType.LIST:
-        return create_list_parent_node(block)
-    
-def create_para_parent_node(block):
-    block = block.replace("\n", " ")
-    return ParentNode("p", list(map(lambda n : n.to_html_node(), text_to_textnodes(block))))
-
-def create_header_parent_node(block):
-    header_depth = block.find(" ")
-    return ParentNode("h" + str(header_depth), list(map(lambda n : n.to_html_node(), text_to_textnodes(block[header_depth + 1:]))))
-
-def create_quote_parent_node(block):
-    block = block.replace("\n> ", "\n")
-    block = block.replace("\n>", "\n")
-    block = block[1:]
+        return create_list_parent_node(block, basepath)
+
+# The create_*_parent_node functions take a block as a string; the
+# create_*_from_lines versions take it already split into lines.
+
+def create_para_parent_node(block, basepath = "/"):
+    return create_para_from_lines(block.split("\n"), basepath)
+
+def create_para_from_lines(lines, basepath = "/"):
+    return ParentNode("p", text_to_html_nodes(" ".join(lines), basepath))
+
+def create_header_parent_node(block, basepath = "/"):
+    return create_header_from_lines([block], basepath)
+
+def create_header_from_lines(lines, basepath = "/"):
+    line = lines[0]
+    header_depth = line.find(" ")
+    text_nodes = text_to_textnodes(line[header_depth + 1:])
+    # The id makes every heading something you can link to (page.html#some-heading).
+    props = {"id": heading_slug("".join(node.text for node in text_nodes))}
+    return ParentNode("h" + str(header_depth), [node.to_html_node(basepath) for node in text_nodes], props)
+
+def heading_slug(text):
+    # Same idea as GitHub's: lowercase, punctuation gone, spaces become dashes.
+    # "Hello, World!" -> "hello-world". Headings with the same text get the
+    # same id; the first one wins, which keeps each block's HTML independent
+    # of the rest of the page (and so cacheable).
+    return SLUG_SPACES.sub("-", SLUG_DROP.sub("", text.strip().lower()))
+
+def create_quote_parent_node(block, basepath = "/"):
+    return create_quote_from_lines(block.split("\n"), basepath)
+
+def create_quote_from_lines(lines, basepath = "/"):
     children = []
-    for line in block.split("\n"):
-        subchildren = list(map(lambda n : n.to_html_node(), text_to_textnodes(line + "\n")))
-        children.append(ParentNode("p", subchildren))
+    for idx, line in enumerate(lines):
+        # The first line loses just its ">", the rest lose "> " (or ">").
+        if idx == 0:
+            line = line[1:]
+        elif line.startswith("> "):
+            line = line[2:]
+        elif line.startswith(">"):
+            line = line[1:]
+        children.append(ParentNode("p", text_to_html_nodes(line + "\n", basepath)))
     return ParentNode("blockquote", children)
 
 def create_code_parent_node(block):
     return ParentNode("pre", [LeafNode("code", block[4:-3])])
 
-def create_list_parent_node(block):
+def create_code_from_lines(lines):
+    # First line is the opening fence, and the last line ends with the closing one.
+    if len(lines) == 1 and len(lines[0]) >= 2 * len(CODE_FENCE) and lines[0].endswith(CODE_FENCE):
+        return ParentNode("pre", [LeafNode("code", lines[0][len(CODE_FENCE):-len(CODE_FENCE)])])
+    body = lines[1:]
+    if body and body[-1].endswith(CODE_FENCE):
+        body = body[:-1] + [body[-1][:-len(CODE_FENCE)]]
+    return ParentNode("pre", [LeafNode("code", "\n".join(body))])
+
+def create_list_parent_node(block, basepath = "/"):
     # I have decided that it's worth dealing with nested list nonsense,
     # which means this becomes much more complicated than the original version.
     # In particular, we need to deal with stuff based on the starting whitespace,
@@ -178,81 +497,98 @@ def create_list_parent_node(block):
     # So, complicated.
     lines = block.split("\n")
     # We're just shoving this to a helper function.
-    return create_list_from_lines(lines)
-
-def create_list_from_lines(lines, depth = 0):
-    # Indentation makes things *weird*. I don't *want* to allow sublists before
-    # the first list item, because I think it's useless, but... Who knows.
-    # I'm going to do something that feels kinda hacky, but it should work.
-    # Step 1: Find the longest common prefix of all the lines.
-    base_prefix = re.match(r"\s*", lines[0]).group()
+    return create_list_from_lines(lines, basepath = basepath)
+
+# Bullets get a different marker at each of the first three levels, then stay squares.
+BULLET_PROPS = [shared_props(style = "list-style-type:" + style) for style in ("disc", "circle", "square")]
+
+def alpha_value(letters, digits):
+    # "a" -> 1, "z" -> 26, "aa" -> 27, like spreadsheet columns.
+    value = 0
+    for letter in letters:
+        value = value * 26 + digits[letter]
+    return value
+
+LOWERCASE_DIGITS = {letter: idx + 1 for idx, letter in enumerate(ascii_lowercase)}
+UPPERCASE_DIGITS = {letter: idx + 1 for idx, letter in enumerate(ascii_uppercase)}
+
+# How to read an ordered item's marker, by its first character: the
+# list-style-type it gets, and how to get its value out of it.
+ORDERED_MARKERS = {}
+for letter in ascii_lowercase:
+    ORDERED_MARKERS[letter] = ("list-style-type:lower-alpha", lambda marker : alpha_value(LOWERCASE_RUN.match(marker).group(), LOWERCASE_DIGITS))
+for letter in ascii_uppercase:
+    ORDERED_MARKERS[letter] = ("list-style-type:upper-alpha", lambda marker : alpha_value(UPPERCASE_RUN.match(marker).group(), UPPERCASE_DIGITS))
+for digit in "0123456789":
+    ORDERED_MARKERS[digit] = ("list-style-type:decimal", lambda marker : int(DIGIT_RUN.match(marker).group()))
+
+def ordered_item_props(marker):
+    # marker is whatever came before the "." or ")". A bare "." gets no
+    # value, so the browser just carries on counting from the item before.
+    # Item numbers repeat from list to list, so these are shared too.
+    if not marker:
+        return shared_props(style = "list-style-type:decimal")
+    style, value = ORDERED_MARKERS[marker[0]]
+    return shared_props(style = style, value = value(marker))
+
+def create_list_from_lines(lines, depth = 0, basepath = "/"):
+    # One pass over the lines, keeping a stack of the lists we're inside of.
+    # Each of those is a frame: [indentation of its items, its ol node, its
+    # bulleted li nodes, the frames of its sublists].
+    # A line indented more than the innermost list starts a sublist, and one
+    # indented less closes lists until we're back at its level. If it's less
+    # indented than the innermost list but more than the list around that
+    # (or there's no list around it), it's that list's items that are too deep,
+    # so everything in it so far becomes a sublist of a new list at this
+    # line's level.
+    # The bullets' styles depend on how deep they ended up, which we only know
+    # for sure at the end, so they get filled in then.
+    root = None
+    stack = []
     for line in lines:
-        if not line.startswith(base_prefix):
-            new_base_prefix_candidate = re.match(r"\s*", line).group()
-            if base_prefix.startswith(new_base_prefix_candidate):
-                base_prefix = new_base_prefix_candidate
+        item = LIST_ITEM.match(line)
+        if item == None:
+            raise Exception(f"Not a list item: {line}")
+        indent = item.end(1)
+        while stack and indent < stack[-1][0]:
+            if len(stack) > 1 and indent <= stack[-2][0]:
+                stack.pop()
+                continue
+            inner = stack.pop()
+            frame = [indent, ParentNode("ol", [inner[1]]), [], [inner]]
+            if stack:
+                stack[-1][1].children[-1] = frame[1]
+                stack[-1][3][-1] = frame
             else:
-                base_prefix = longest_common_prefix(base_prefix, new_base_prefix_candidate)
-    # Step 2: Tidy all of the lines.
-    for idx, line in enumerate(lines):
-        lines[idx] = line.removeprefix(base_prefix)
-    # Step 3: Make a child node for each main list line, and for each sublist.
-    children = []
-    idx = 0
-    while idx < len(lines):
-        current_line = lines[idx]
-        prefix = re.match(r"\s*", current_line).group()
-        if prefix:
-            # Uh-oh, we have a sublist!
-            sublist = [current_line]
-            idx += 1
-            while idx < len(lines) and re.match(r"\s+", lines[idx]):
-                sublist.append(lines[idx])
-                idx += 1
-            children.append(create_list_from_lines(sublist, depth = depth + 1))
-        else:
-            # Yay, we're in the main list!
-            text_start = re.match(r"([0-9a-zA-Z]*[.)] )|([-*] )", current_line).end()
-            subchildren = list(map(lambda n : n.to_html_node(), text_to_textnodes(current_line[text_start:])))
-            if is_unordered_list_item(current_line):
-                children.append(ParentNode("li", subchildren, {"style": "list-style-type:" + ("disc" if depth == 0 else "circle" if depth == 1 else "square")}))
+                root = frame
+            stack.append(frame)
+        if not stack or indent > stack[-1][0]:
+            frame = [indent, ParentNode("ol", []), [], []]
+            if stack:
+                stack[-1][1].children.append(frame[1])
+                stack[-1][3].append(frame)
             else:
-                # Step 1: Figure out style. We only need decimal, lower-alpha, or upper-alpha.
-                if current_line[0].islower():
-                    style = "lower-alpha"
-                elif current_line[0].isupper():
-                    style = "upper-alpha"
-                else:
-                    style = "decimal"
-                # Step 2: Figure out value. This is a pain in the butt for either alpha.
-                if style == "lower-alpha":
-                    value = 0
-                    value_string = re.match(r"[a-z]*", current_line).group()
-                    for sub_idx, let in enumerate(reversed(value_string)):
-                        value += (ascii_lowercase.find(let) + 1) * 26 ** sub_idx
-                    print(value_string, value)
-                elif style == "lower-alpha":
-                    value = 0
-                    value_string = re.match(r"[A-Z]*", current_line).group()
-                    for sub_idx, let in enumerate(reversed(value_string)):
-                        value += (ascii_uppercase.find(let) + 1) * 26 ** sub_idx
-                else:
-                    value = int(re.match(r"[0-9]*", current_line).group())
-                children.append(ParentNode("li", subchildren, {"style": "list-style-type:" + style, "value": value}))
-            idx += 1
-    return ParentNode("ol", children)
+                root = frame
+            stack.append(frame)
+        frame = stack[-1]
+        text = text_to_html_nodes(line[item.end():], basepath)
+        if item.group(2) != None:
+            li = ParentNode("li", text)
+            frame[2].append(li)
+        else:
+            li = ParentNode("li", text, ordered_item_props(item.group(3)))
+        frame[1].children.append(li)
+    frames = [(root, depth)]
+    while frames:
+        frame, frame_depth = frames.pop()
+        props = BULLET_PROPS[min(frame_depth, 2)]
+        for li in frame[2]:
+            li.properties = props
+        frames.extend((sublist, frame_depth + 1) for sublist in frame[3])
+    return root[1]
 
 def is_unordered_list_item(string):
-    return bool(re.match(r"[\s]*[*-] ", string))
+    return bool(UNORDERED_ITEM.match(string))
 
 def is_ordered_list_item(string):
-    return bool(re.match(r"[\s]*[0-9a-zA-Z] ", string))
-
-def longest_common_prefix(string1, string2):
-    p = ''
-    for idx, let in enumerate(string1):
-        if string2[idx] == let:
-            p += let
-        else:
-            break
-    return p
+    return bool(ORDERED_ITEM.match(string))
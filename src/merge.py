@@ -0,0 +1,136 @@
+from main import collect_pages, site_path, check_links, report_broken_links, links_path_for, deps_path_for, update_search_index, update_listings, MANIFEST_PATH
+from listings import LISTING_SIZE
+from manifest import Manifest
+from linkindex import LinkIndex
+from staticsync import place_file, MODES as STATIC_MODES
+from compress import precompress
+from shard import shard_paths, load_shard_info, shard_key, SHARD_DIR
+import os, shutil, argparse
+
+# Puts the output of a sharded build (main.py --shard i/N on each machine,
+# with each SHARD_DIR/i copied back here) together into docs/. Before we
+# touch docs/ we make sure the shards add up to exactly the site in content/:
+# every shard there, every page built by exactly one of them, and nothing
+# built that isn't in content/ any more. Then we make the listings and feeds
+# (which need every page's metadata, so shards skip them), check the links
+# across the whole site (which no single shard could do either), and write a
+# manifest for docs/ as if it had been built in one go. There's no dependency graph for
+# docs/ after a merge, so the first ordinary build there re-renders every page.
+
+def load_shards(shard_dir):
+    # [(index, count, dest_path, manifest_path, Manifest)], sorted by index.
+    shards = []
+    for name in sorted(os.listdir(shard_dir)):
+        dest_path, manifest_path = shard_paths(shard_dir, name)
+        info = load_shard_info(manifest_path)
+        if info == None:
+            continue
+        index, count = info
+        if name != str(index):
+            raise Exception(f"{os.path.join(shard_dir, name)} says it's shard {index}")
+        shards.append((index, count, dest_path, manifest_path, Manifest.load(manifest_path)))
+    return sorted(shards, key = lambda shard : shard[0])
+
+def verify_shards(shards, sources):
+    # Everything wrong with putting shards together into the site whose page
+    # sources are sources, as a list of messages. Empty means go ahead.
+    if not shards:
+        return ["No shards found"]
+    problems = []
+    counts = set(count for index, count, dest_path, manifest_path, manifest in shards)
+    if len(counts) > 1:
+        problems.append(f"Shards disagree on how many shards there are: {sorted(counts)}")
+    for index in range(1, max(counts) + 1):
+        if index not in set(shard[0] for shard in shards):
+            problems.append(f"Shard {index}/{max(counts)} is missing")
+    for field in ("basepath", "template_hash", "html_format"):
+        values = set(getattr(manifest, field) for index, count, dest_path, manifest_path, manifest in shards)
+        if len(values) > 1:
+            problems.append(f"Shards were built with different {field}s: {sorted(map(str, values))}")
+    built = {}
+    static = {}
+    for index, count, dest_path, manifest_path, manifest in shards:
+        for source, entry in manifest.pages.items():
+            built.setdefault(shard_key(source), []).append(index)
+            if not os.path.isfile(entry["output"]):
+                problems.append(f"Shard {index} lost its output for {source}")
+        for source, entry in manifest.static.items():
+            if static.setdefault(source, entry["hash"]) != entry["hash"]:
+                problems.append(f"Shards have different versions of {source}")
+    expected = set(shard_key(source) for source in sources)
+    for source in sorted(expected - built.keys()):
+        problems.append(f"No shard built {source}")
+    for source in sorted(built.keys() - expected):
+        problems.append(f"Shard {built[source][0]} built {source}, which isn't in the content any more")
+    for source, indexes in sorted(built.items()):
+        if len(indexes) > 1:
+            problems.append(f"{source} was built by more than one shard: {indexes}")
+    return problems
+
+def merge(shard_dir = SHARD_DIR, content_path = "content", dest_path = "docs", manifest_path = MANIFEST_PATH, mode = "copy", search = False, gzip_min_bytes = None, template_path = "template.html", site_url = "", listing_size = LISTING_SIZE):
+    shards = load_shards(shard_dir)
+    problems = verify_shards(shards, [source for source, target in collect_pages(content_path, dest_path)])
+    if problems:
+        raise Exception("Can't merge shards:\n" + "\n".join(problems))
+    first = shards[0][4]
+    merged = Manifest(first.template_hash, first.basepath)
+    link_index = LinkIndex()
+    # Like a --full build, docs/ only holds what we put there.
+    if os.path.exists(dest_path):
+        shutil.rmtree(dest_path)
+    os.makedirs(dest_path)
+    for index, count, shard_dest, shard_manifest, manifest in shards:
+        for source, entry in manifest.pages.items():
+            target = os.path.join(dest_path, site_path(entry["output"], shard_dest))
+            place_file(entry["output"], target, mode)
+            merged.pages[source] = dict(entry, output = target)
+        for source, entry in manifest.static.items():
+            # Every shard synced the same static files; the first one's will do.
+            if source not in merged.static:
+                target = os.path.join(dest_path, site_path(entry["output"], shard_dest))
+                place_file(entry["output"], target, mode)
+                merged.static[source] = dict(entry, output = target)
+        for output, entry in manifest.images.items():
+            # And the same resized images.
+            target = os.path.join(dest_path, site_path(output, shard_dest))
+            if target not in merged.images:
+                place_file(output, target, mode)
+                merged.images[target] = dict(entry, output = target)
+        link_index.pages.update(LinkIndex.load(links_path_for(shard_manifest)).pages)
+        if search:
+            # The shards' tokenized pages, so the index doesn't need to re-parse anything.
+            terms = os.path.join(os.path.dirname(shard_manifest), "search", "pages")
+            if os.path.isdir(terms):
+                shutil.copytree(terms, os.path.join(os.path.dirname(manifest_path), "search", "pages"), dirs_exist_ok = True)
+    print(f"Merged {len(merged.pages)} page(s) and {len(merged.static)} static file(s) from {len(shards)} shard(s) into {dest_path}")
+    written = update_listings(merged, {}, manifest_path, content_path, template_path, merged.basepath, dest_path, site_url, listing_size)
+    if written:
+        print(f"Wrote {written} listing page(s) and feed(s)")
+    if os.path.exists(deps_path_for(manifest_path)):
+        os.remove(deps_path_for(manifest_path))
+    report_broken_links(check_links(link_index, {}, merged, merged.basepath, dest_path))
+    link_index.save(links_path_for(manifest_path))
+    if search:
+        shards_written = update_search_index(merged, merged.basepath, dest_path, os.path.join(os.path.dirname(manifest_path), "search"))
+        print(f"Wrote search index for {len(merged.pages)} page(s) in {shards_written} shard(s)")
+    if gzip_min_bytes != None:
+        # docs/ was wiped above, so there's nothing of ours to clean up yet.
+        report = precompress(dest_path, gzip_min_bytes, keep = [entry["output"] for entry in merged.static.values()])
+        merged.compressed = report.written
+        print(report)
+    merged.save(manifest_path)
+    return merged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Put the shards of a sharded build (main.py --shard i/N) together into docs/.")
+    parser.add_argument("--shard-dir", default = SHARD_DIR, metavar = "DIR", help = "where the shards are")
+    parser.add_argument("--template", default = "template.html", metavar = "PATH", help = "the site's template, for listing pages")
+    parser.add_argument("--site-url", default = "", metavar = "URL", help = "the site's scheme and host (like https://example.com), for the links in feeds")
+    parser.add_argument("--listing-size", type = int, default = LISTING_SIZE, metavar = "N", help = "posts per archive page")
+    parser.add_argument("--mode", choices = STATIC_MODES, default = "copy", help = "how to put shard outputs into docs/")
+    parser.add_argument("--search", action = "store_true", help = "write a client-side search index to docs/search/")
+    parser.add_argument("--gzip", action = "store_true", help = "write .gz siblings for HTML, CSS, JS and SVG files in docs/")
+    parser.add_argument("--gzip-min-bytes", type = int, default = 1024, metavar = "N", help = "don't bother compressing files smaller than this")
+    args = parser.parse_args()
+    merge(args.shard_dir, mode = args.mode, search = args.search, gzip_min_bytes = args.gzip_min_bytes if args.gzip else None,
+          template_path = args.template, site_url = args.site_url, listing_size = args.listing_size)
@@ -0,0 +1,153 @@
+import json, os
+from datetime import datetime
+from markdown_to_nodes import iter_lines
+
+# What we know about every page without rendering it: its title, and whatever
+# it says about itself in its front matter, which is an optional block of
+# "key: value" lines between two "---" lines at the very top of the file:
+#
+#   ---
+#   title: Hello again
+#   date: 2024-03-01
+#   tags: python, web
+#   summary: One line for the listings and feeds.
+#   ---
+#
+# Reading that (or failing that, just as far as the first h1) is the metadata
+# pre-pass. Its results are kept in .cache/metadata.json, keyed by source and
+# the hash of the source they came from, so a build only re-reads pages whose
+# markdown changed. Listings and feeds (listings.py) are made from the index.
+
+FRONT_MATTER = "---"
+METADATA_VERSION = 1
+
+def parse_date(text):
+    # "2024-03-01" or a full ISO datetime -> the same, normalised so that
+    # dates sort as strings.
+    try:
+        return datetime.fromisoformat(text).isoformat()
+    except ValueError:
+        raise Exception(f"Date should look like YYYY-MM-DD (or an ISO datetime), not {text}")
+
+def parse_tags(text):
+    # "a, b" or "[a, b]" -> ["a", "b"]
+    return [tag.strip() for tag in text.strip().strip("[]").split(",") if tag.strip()]
+
+def front_matter_field(metadata, line):
+    key, sep, value = line.partition(":")
+    key, value = key.strip().lower(), value.strip()
+    if not sep or not key:
+        return
+    if key == "date":
+        metadata["date"] = parse_date(value)
+    elif key == "tags":
+        metadata["tags"] = parse_tags(value)
+    elif key in ("title", "summary"):
+        metadata[key] = value
+
+def read_metadata(markdown):
+    # markdown (a string or an open file) -> {"title": ..., "date": ...,
+    # "tags": [...], "summary": ...}. The title is the front matter's, or else
+    # the first h1's, or None. We stop reading as soon as we have it.
+    metadata = {"title": None, "date": None, "tags": [], "summary": None}
+    lines = iter_lines(markdown)
+    first = next(lines, None)
+    if first != None and first.rstrip() == FRONT_MATTER:
+        fields = []
+        heading = None
+        for line in lines:
+            if line.rstrip() == FRONT_MATTER:
+                for field in fields:
+                    front_matter_field(metadata, field)
+                break
+            if heading == None and line.startswith("# "):
+                heading = line[2:]
+            fields.append(line)
+        else:
+            # Never closed, so that wasn't front matter after all (and the
+            # page gets rendered with it), just a page starting with "---".
+            metadata["title"] = heading
+            return metadata
+        first = None
+    if metadata["title"] != None:
+        return metadata
+    if first != None and first.startswith("# "):
+        metadata["title"] = first[2:]
+        return metadata
+    for line in lines:
+        if line.startswith("# "):
+            metadata["title"] = line[2:]
+            break
+    return metadata
+
+def skip_front_matter(markdown):
+    # The markdown after its front matter (if it has any), to render. Files
+    # (and mmaps, which read bytes) are left positioned just after it.
+    if isinstance(markdown, str):
+        if not markdown.startswith(FRONT_MATTER):
+            return markdown
+        start = markdown.find("\n") + 1
+        if start == 0 or markdown[:start].rstrip() != FRONT_MATTER:
+            return markdown
+        while start < len(markdown):
+            end = markdown.find("\n", start)
+            if end == -1:
+                end = len(markdown)
+            if markdown[start:end].rstrip() == FRONT_MATTER:
+                return markdown[end + 1:]
+            start = end + 1
+        return markdown
+    position = markdown.tell()
+    line = markdown.readline()
+    marker = FRONT_MATTER if isinstance(line, str) else FRONT_MATTER.encode()
+    if line.rstrip() == marker:
+        # line[:0] is "" or b"", whichever readline gives at the end.
+        for line in iter(markdown.readline, line[:0]):
+            if line.rstrip() == marker:
+                return markdown
+    markdown.seek(position)
+    return markdown
+
+class MetadataIndex():
+    def __init__(self, pages = None):
+        # source -> {"hash", "url", "title", "date", "tags", "summary"}, where
+        # url is the page's output relative to the site root, with "/"s.
+        self.pages = pages if pages != None else {}
+
+    def update(self, pages, dest_path):
+        # pages maps source -> {"hash": ..., "output": ...}, like a manifest's.
+        # Pages whose source hash is what we saw last time keep their
+        # metadata; the rest get read. Returns how many were read.
+        read = 0
+        updated = {}
+        for source, page in pages.items():
+            entry = self.pages.get(source)
+            if entry == None or entry["hash"] != page["hash"]:
+                with open(source, "r") as f:
+                    entry = read_metadata(f)
+                entry["hash"] = page["hash"]
+                read += 1
+            entry["url"] = os.path.relpath(page["output"], dest_path).replace(os.sep, "/")
+            updated[source] = entry
+        self.pages = updated
+        return read
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != METADATA_VERSION:
+            return cls()
+        return cls(data["pages"])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"version": METADATA_VERSION, "pages": self.pages}, f)
+        os.replace(temp_path, path)
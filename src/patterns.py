@@ -0,0 +1,55 @@
+import re
+
+# Every regular expression the generator uses, compiled once, here. Calling
+# re.match(r"...", s) looks the pattern up in re's internal cache on every
+# call, and that cache only holds a few hundred patterns, so anything else
+# in the process that uses a lot of them (plugins, say) can push ours out
+# and make us recompile in the middle of a build. Compiled objects can't be
+# evicted, and skip the lookup too.
+#
+# Where a classifier used to try several patterns one after another, they're
+# merged into one, so each line gets looked at once.
+
+# Inline markdown. Everything that could start some inline markup, in one
+# alternation ("**" has to win over "*").
+INLINE_TOKEN = re.compile(r"\*\*|~~|[*_`]|!?\[")
+IMAGE_AT = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_AT = re.compile(r"\[(.*?)\]\((.*?)\)")
+# For the split_nodes_* helpers: links anywhere that aren't images.
+LINK = re.compile(r"(?<!!)\[(.*?)\]\((.*?)\)")
+IMAGE = IMAGE_AT
+
+# Block lines. One match says what kind of line it is: group 1 matching means
+# a heading, group 2 a quote, and a match with neither is a list item. They
+# can't overlap (the first character that isn't a space decides), so the
+# combined pattern accepts exactly the lines the separate ones did.
+BLOCK_LINE = re.compile(r"(#{1,6} )|\s*(?:(>)|[-*] |[0-9a-zA-Z]*[.)] )")
+HEADING_KIND = 1
+QUOTE_KIND = 2
+HEADING_LINE = re.compile(r"#{1,6} ")
+QUOTE_LINE = re.compile(r"\s*>")
+LIST_LINE = re.compile(r"([\s]*[-*] )|([\s]*[0-9a-zA-Z]*[.)] )")
+
+# List items. LIST_ITEM splits one into its indentation (group 1), and its
+# bullet (group 2) or the bit before the "." or ")" of an ordered marker (group 3).
+LIST_ITEM = re.compile(r"(\s*)(?:([-*]) |([0-9a-zA-Z]*)[.)] )")
+UNORDERED_ITEM = re.compile(r"[\s]*[*-] ")
+ORDERED_ITEM = re.compile(r"[\s]*[0-9a-zA-Z] ")
+LOWERCASE_RUN = re.compile(r"[a-z]*")
+UPPERCASE_RUN = re.compile(r"[A-Z]*")
+DIGIT_RUN = re.compile(r"[0-9]*")
+
+# Heading ids.
+SLUG_DROP = re.compile(r"[^\w\- ]")
+SLUG_SPACES = re.compile(r" +")
+
+# Templates.
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+SITE_ABSOLUTE_ATTRIBUTE = re.compile(r"((?:href|src)=\")/(?!/)")
+PARTIAL = re.compile(r"\{\{>\s*([\w\-./]+)\s*\}\}")
+# Site-absolute src= in a template (before rebasing): the static assets it uses.
+TEMPLATE_ASSET = re.compile(r"src=\"/(?!/)([^\"]*)\"")
+
+# Links and search.
+URL_SCHEME = re.compile(r"[A-Za-z][A-Za-z0-9+.\-]*:")
+SEARCH_TOKEN = re.compile(r"\w+")
@@ -0,0 +1,70 @@
+import os, itertools, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Build plumbing for getting pages on and off disk.
+#
+# run_pipeline splits a build into three stages: reading sources and writing
+# outputs happen on a pool of I/O threads, while rendering happens on the
+# calling thread, in order. The stages are joined by bounded queues (of
+# futures), so reads run ahead of rendering and writes trail behind it,
+# but never by more than queue_size pages.
+
+_temp_counter = itertools.count()
+
+@contextmanager
+def atomic_open(path, mode = "w"):
+    # Writes go to a temporary file next to path, which gets renamed over path
+    # once it's complete. Anyone reading path (like the dev server) sees either
+    # the old file or the new one, never half of one.
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.{next(_temp_counter)}.tmp")
+    try:
+        with open(temp_path, mode) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_atomic(path, text):
+    with atomic_open(path) as f:
+        f.write(text)
+
+def make_directories(paths):
+    # Creates the parent directory of every path, visiting each distinct
+    # directory once instead of once per file.
+    directories = set(os.path.dirname(path) for path in paths)
+    directories.discard("")
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok = True)
+
+def run_pipeline(items, read, render, write, io_threads = 2, queue_size = 16):
+    # read(item) -> data runs on the I/O threads, render(item, data) -> output
+    # on this thread in the same order as items, and write(item, output) back
+    # on the I/O threads. Any exception from any stage comes out of here.
+    items = iter(items)
+    with ThreadPoolExecutor(io_threads, thread_name_prefix = "read") as readers, ThreadPoolExecutor(io_threads, thread_name_prefix = "write") as writers:
+        reads = deque()
+        writes = deque()
+        def fill_reads():
+            while len(reads) < queue_size:
+                item = next(items, _done)
+                if item is _done:
+                    return
+                reads.append((item, readers.submit(read, item)))
+        fill_reads()
+        while reads:
+            item, future = reads.popleft()
+            data = future.result()
+            fill_reads()
+            output = render(item, data)
+            writes.append(writers.submit(write, item, output))
+            while len(writes) >= queue_size:
+                writes.popleft().result()
+        while writes:
+            writes.popleft().result()
+
+_done = object()
@@ -0,0 +1,110 @@
+import json, time, tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Build profiling. Every timed chunk of work is a "phase" (reading a file,
+# parsing markdown, writing a page...), optionally tied to the page it was for.
+# We keep one record per (page, phase) so that we can report both where the
+# time goes overall and which pages are the slow ones.
+
+class Profiler():
+    def __init__(self, trace_allocations = True):
+        self.trace_allocations = trace_allocations
+        # (page or None, phase, seconds, bytes allocated at peak)
+        self.records = []
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+        if self.trace_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name, page = None):
+        # Phases aren't meant to nest: allocation tracking resets tracemalloc's
+        # peak at the start of each one.
+        tracing = self.trace_allocations and tracemalloc.is_tracing()
+        if tracing:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            allocated = tracemalloc.get_traced_memory()[1] - baseline if tracing else 0
+            self.records.append((page, name, elapsed, allocated))
+
+    def take_records(self):
+        records = self.records
+        self.records = []
+        return records
+
+    def add_records(self, records):
+        self.records.extend(records)
+
+    def phase_totals(self):
+        # phase -> [seconds, peak bytes allocated (max over calls), calls]
+        totals = {}
+        for page, name, elapsed, allocated in self.records:
+            total = totals.setdefault(name, [0.0, 0, 0])
+            total[0] += elapsed
+            total[1] = max(total[1], allocated)
+            total[2] += 1
+        return totals
+
+    def page_totals(self):
+        # page -> {phase: seconds}, only for records tied to a page.
+        pages = {}
+        for page, name, elapsed, allocated in self.records:
+            if page != None:
+                phases = pages.setdefault(page, {})
+                phases[name] = phases.get(name, 0.0) + elapsed
+        return pages
+
+    def slowest_pages(self, count = 10):
+        pages = self.page_totals()
+        return sorted(pages.items(), key = lambda item : sum(item[1].values()), reverse = True)[:count]
+
+    def wall_time(self):
+        if self.started == None or self.finished == None:
+            return None
+        return self.finished - self.started
+
+    def summary(self, top = 10):
+        lines = []
+        wall_time = self.wall_time()
+        if wall_time != None:
+            lines.append(f"Build took {wall_time * 1000:.1f} ms")
+        lines.append(f"{'phase':<12} {'total ms':>10} {'calls':>7} {'peak alloc KiB':>15}")
+        for name, (elapsed, allocated, calls) in sorted(self.phase_totals().items(), key = lambda item : -item[1][0]):
+            lines.append(f"{name:<12} {elapsed * 1000:>10.1f} {calls:>7} {allocated / 1024:>15.1f}")
+        slowest = self.slowest_pages(top)
+        if slowest:
+            lines.append(f"Slowest {len(slowest)} pages:")
+            for page, phases in slowest:
+                breakdown = ", ".join(f"{name} {elapsed * 1000:.1f}" for name, elapsed in phases.items())
+                lines.append(f"{sum(phases.values()) * 1000:>10.1f} ms  {page}  ({breakdown})")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "wall_time": self.wall_time(),
+            "phases": {name: {"seconds": elapsed, "peak_alloc_bytes": allocated, "calls": calls} for name, (elapsed, allocated, calls) in self.phase_totals().items()},
+            "pages": self.page_totals(),
+        }
+
+    def save_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent = 1, sort_keys = True)
+
+def phase(profiler, name, page = None):
+    # So callers can write `with phase(profiler, ...)` whether or not they're profiling.
+    if profiler == None:
+        return nullcontext()
+    return profiler.phase(name, page)
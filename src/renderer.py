@@ -0,0 +1,145 @@
+from main import build, extract_title, page_node, template_for, write_page, make_directories, images_path_for, MANIFEST_PATH
+from markdown_to_nodes import markdown_to_html_node
+from template import load_template
+from htmlnode import escape_attribute
+from metadata import skip_front_matter
+from images import ImageIndex
+from blockcache import BlockCache
+from linkindex import PageLinks
+import os, sys, json, argparse
+
+# The generator as a library, for when something wants to render a lot of
+# markdown without starting a new Python every time (previews in a CMS, say).
+# A Renderer holds the config (paths, basepath) and everything worth keeping
+# warm between renders: the block cache, the compiled templates (which
+# load_template keeps, and only re-reads if a template file changes), and
+# the sizes of the site's images from the last build (likewise).
+#
+# Run this file with --batch for the same thing over stdin/stdout: one JSON
+# request per line in, one JSON response per line out, in the same order.
+
+class Renderer():
+    def __init__(self, basepath = "/", template_path = "template.html", content_path = "content", static_path = "static", dest_path = "docs", manifest_path = MANIFEST_PATH, block_cache_mb = 64):
+        self.basepath = basepath
+        self.template_path = template_path
+        self.content_path = content_path
+        self.static_path = static_path
+        self.dest_path = dest_path
+        self.manifest_path = manifest_path
+        self.cache = BlockCache(block_cache_mb << 20) if block_cache_mb > 0 else None
+        self.image_index = ImageIndex(basepath = basepath)
+        self.images_stamp = None
+
+    def template(self, template_path = None):
+        return load_template(template_path or self.template_path, self.basepath)
+
+    def images(self):
+        path = images_path_for(self.manifest_path)
+        try:
+            stamp = os.stat(path).st_mtime_ns
+        except OSError:
+            stamp = None
+        if stamp != self.images_stamp:
+            self.image_index = ImageIndex.load(path, self.basepath)
+            self.images_stamp = stamp
+        return self.image_index
+
+    def render_markdown(self, markdown):
+        # Just the content, as an HTML string: no template, no title needed.
+        return markdown_to_html_node(skip_front_matter(markdown), self.basepath, self.cache, images = self.images()).to_html()
+
+    def render_page(self, markdown, title = None, template_path = None):
+        # A whole page, in the template. The title comes from the markdown's
+        # h1 unless it's given.
+        template = self.template(template_path)
+        if title == None:
+            title = extract_title(markdown)
+        return template.render(Title = escape_attribute(title), Content = page_node(markdown, title, self.basepath, self.cache, images = self.images()).to_html())
+
+    def render_file(self, from_path, dest_path = None, links = None):
+        # Renders a markdown file with the template it would get in a build
+        # (its section's _template.html, if it has one). Returns the page, or
+        # if dest_path is given, writes it there (streaming, like a build
+        # does) and returns None. links (a PageLinks) collects its links.
+        template_path = template_for(from_path, self.content_path, self.template_path)
+        if dest_path != None:
+            make_directories([dest_path])
+            write_page(from_path, template_path, dest_path, self.basepath, self.cache, links, images = self.images())
+            return None
+        with open(from_path, "r") as f:
+            markdown = f.read()
+        template = self.template(template_path)
+        title = extract_title(markdown)
+        return template.render(Title = escape_attribute(title), Content = page_node(markdown, title, self.basepath, self.cache, links, images = self.images()).to_html())
+
+    def build(self, **options):
+        # An incremental build of the whole site (see main.build for options).
+        return build(self.basepath, self.static_path, self.content_path, self.template_path, self.dest_path, self.manifest_path, cache = self.cache, **options)
+
+    def handle(self, request):
+        # One batch request (a dict) -> its response (a dict). Requests are
+        #   {"markdown": "..."}                          just the content
+        #   {"page": "...", "title": ..., "template": ...} a whole page
+        #   {"file": "content/x.md", "output": ...}      a file, like a build would
+        #   {"build": {options}}                         the whole site
+        # and anything in "id" is handed back as it came.
+        response = {"id": request.get("id")}
+        try:
+            if "markdown" in request:
+                response["html"] = self.render_markdown(request["markdown"])
+            elif "page" in request:
+                response["html"] = self.render_page(request["page"], request.get("title"), request.get("template"))
+            elif "file" in request:
+                links = PageLinks()
+                html = self.render_file(request["file"], request.get("output"), links)
+                if html != None:
+                    response["html"] = html
+                response["links"] = links.to_dict()
+            elif "build" in request:
+                manifest = self.build(**(request["build"] or {}))
+                response["pages"] = len(manifest.pages)
+            else:
+                raise Exception("Request needs one of markdown, page, file or build")
+        except Exception as e:
+            response["error"] = str(e)
+        return response
+
+    def serve_batch(self, requests = None, responses = None):
+        # The --batch loop, over stdin and stdout unless we're given other
+        # files. Build output (the "Generating page" lines and so on) would
+        # get mixed into our responses, so it goes to stderr.
+        stdout = sys.stdout
+        requests = requests if requests != None else sys.stdin
+        responses = responses if responses != None else stdout
+        sys.stdout = sys.stderr
+        try:
+            for line in requests:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    request = e
+                if isinstance(request, dict):
+                    response = self.handle(request)
+                else:
+                    response = {"id": None, "error": f"Bad request: {request if isinstance(request, ValueError) else 'not a JSON object'}"}
+                responses.write(json.dumps(response) + "\n")
+                responses.flush()
+        finally:
+            sys.stdout = stdout
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Render markdown with the site's templates, one JSON request per line on stdin.")
+    parser.add_argument("basepath", nargs = "?", default = "/")
+    parser.add_argument("--batch", action = "store_true", help = "read JSON-lines requests from stdin and write responses to stdout")
+    parser.add_argument("--template", default = "template.html", metavar = "PATH", help = "the site's template")
+    parser.add_argument("--content", default = "content", metavar = "DIR", help = "where the markdown is (for section templates and builds)")
+    parser.add_argument("--static", default = "static", metavar = "DIR", help = "where the static files are (for builds)")
+    parser.add_argument("--dest", default = "docs", metavar = "DIR", help = "where builds put the site")
+    parser.add_argument("--block-cache-mb", type = int, default = 64, metavar = "MB", help = "memory bound for the rendered block cache (0 turns it off)")
+    args = parser.parse_args()
+    renderer = Renderer(args.basepath, args.template, args.content, args.static, args.dest, block_cache_mb = args.block_cache_mb)
+    if not args.batch:
+        parser.error("nothing to do without --batch")
+    renderer.serve_batch()
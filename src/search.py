@@ -0,0 +1,201 @@
+import hashlib, heapq, json, os, shutil
+from pipeline import write_atomic
+from patterns import SEARCH_TOKEN
+
+# Client-side search. While pages render we keep the plain text of every
+# block (the text of the TextNodes, straight off the node tree, so nothing
+# gets re-parsed), tokenize it, and build an inverted index: term -> the pages
+# it's on, and where. That gets cut into shards of roughly shard_bytes each,
+# in term order, so the browser only has to fetch index.json plus the one
+# shard a term lives in.
+#
+# docs/search/index.json looks like
+#     {"pages": [[url, title], ...], "shards": [[first term, file], ...]}
+# and each shard is {term: [[page id, position, gap, gap, ...], ...]}, with
+# page ids indexing "pages" and positions counted in words from the top of
+# the page. Positions after the first are stored as gaps from the one
+# before, which keeps the numbers (and the files) small.
+#
+# Memory stays bounded however big the site gets. A page's text only lives as
+# long as it takes to render the page: then it's tokenized straight into the
+# PageTermStore (see PageTextRecorder), and the index is built from there.
+# And once the postings we're holding pass max_postings, they're written out
+# as a sorted run under the work directory, and the runs get merged as the
+# shards are written.
+
+
+def node_text(node):
+    # The text of every leaf under node, in document order.
+    values = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.children != None:
+            stack.extend(reversed(current.children))
+        elif current.value:
+            values.append(current.value)
+        elif current.tag == "img" and current.properties.get("alt"):
+            values.append(current.properties["alt"])
+    return " ".join(values)
+
+class PageText():
+    # What the renderer hands us for one page.
+    __slots__ = ("title", "blocks")
+
+    def __init__(self, title = None, blocks = None):
+        self.title = title
+        self.blocks = blocks if blocks != None else []
+
+def tokenize(blocks):
+    # Plain text blocks in, term -> [first position, gap, gap, ...] out.
+    terms = {}
+    last = {}
+    position = 0
+    for block in blocks:
+        for term in SEARCH_TOKEN.findall(block.lower()):
+            positions = terms.get(term)
+            if positions == None:
+                terms[term] = [position]
+            else:
+                positions.append(position - last[term])
+            last[term] = position
+            position += 1
+    return terms
+
+class PageTermStore():
+    # The tokenized terms of every page, one file per page under directory,
+    # so an incremental build only has to tokenize the pages it re-rendered
+    # and can still write a complete index.
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, page):
+        return os.path.join(self.directory, hashlib.sha1(page.encode()).hexdigest() + ".json")
+
+    def get(self, page, source_hash):
+        # (title, terms), or None if we haven't seen this version of the page.
+        try:
+            with open(self.path(page), "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("page") != page or data.get("hash") != source_hash:
+            return None
+        return data["title"], data["terms"]
+
+    def put(self, page, source_hash, title, terms):
+        os.makedirs(self.directory, exist_ok = True)
+        write_atomic(self.path(page), json.dumps({"page": page, "hash": source_hash, "title": title, "terms": terms}))
+
+    def retain(self, pages):
+        # Deletes the files of pages that aren't part of the site any more.
+        if not os.path.isdir(self.directory):
+            return
+        keep = set(os.path.basename(self.path(page)) for page in pages)
+        for name in os.listdir(self.directory):
+            if name not in keep:
+                os.remove(os.path.join(self.directory, name))
+
+class PageTextRecorder():
+    # Takes each page's PageText as soon as the page is rendered, and puts
+    # its terms in store under the page's url (relative to dest_path) and
+    # source hash (from hashes, source -> hash), so the build can drop it.
+    # Worker processes get their own copy, and write to the same store.
+    def __init__(self, store, dest_path, hashes):
+        self.store = store
+        self.dest_path = dest_path
+        self.hashes = hashes
+
+    def record(self, source, target, page_text):
+        page = os.path.relpath(target, self.dest_path).replace(os.sep, "/")
+        self.store.put(page, self.hashes[source], page_text.title, tokenize(page_text.blocks))
+
+def read_run(path):
+    with open(path, "r") as f:
+        for line in f:
+            yield json.loads(line)
+
+class SearchIndexer():
+    def __init__(self, work_directory, max_postings = 1 << 20):
+        self.work_directory = work_directory
+        self.max_postings = max_postings
+        self.pages = []
+        # term -> postings, for pages since the last spill.
+        self.postings = {}
+        self.buffered = 0
+        self.runs = []
+
+    def add_page(self, url, title, terms):
+        # Pages have to come in the order their ids should be in; the merge
+        # relies on every run's page ids being higher than the last one's.
+        page_id = len(self.pages)
+        self.pages.append([url, title])
+        for term, positions in terms.items():
+            posting = [page_id]
+            posting.extend(positions)
+            self.postings.setdefault(term, []).append(posting)
+            self.buffered += len(posting)
+        if self.buffered >= self.max_postings:
+            self.spill()
+
+    def spill(self):
+        os.makedirs(self.work_directory, exist_ok = True)
+        path = os.path.join(self.work_directory, f"run{len(self.runs)}.jsonl")
+        with open(path, "w") as f:
+            for term in sorted(self.postings):
+                f.write(json.dumps([term, self.postings[term]]))
+                f.write("\n")
+        self.runs.append(path)
+        self.postings = {}
+        self.buffered = 0
+
+    def merged(self):
+        # (term, postings) for every term, in order, with the postings from
+        # every run put back together.
+        in_memory = ([term, self.postings[term]] for term in sorted(self.postings))
+        sources = [read_run(path) for path in self.runs] + [in_memory]
+        current_term = None
+        current = None
+        # merge is stable, so for a term in several runs, the earlier run
+        # (the lower page ids) comes out first.
+        for term, postings in heapq.merge(*sources, key = lambda item : item[0]):
+            if term == current_term:
+                current.extend(postings)
+                continue
+            if current_term != None:
+                yield current_term, current
+            current_term = term
+            current = postings
+        if current_term != None:
+            yield current_term, current
+
+    def write(self, output_directory, shard_bytes = 1 << 16):
+        # Writes the shards and index.json into output_directory, removes any
+        # shards left over from a bigger index, and returns the shard count.
+        os.makedirs(output_directory, exist_ok = True)
+        shards = []
+        shard = {}
+        size = 0
+        def flush():
+            name = f"shard{len(shards):04}.json"
+            write_atomic(os.path.join(output_directory, name), json.dumps(shard, separators = (",", ":")))
+            shards.append([next(iter(shard)), name])
+        for term, postings in self.merged():
+            encoded = len(term) + len(json.dumps(postings, separators = (",", ":"))) + 4
+            if shard and size + encoded > shard_bytes:
+                flush()
+                shard = {}
+                size = 0
+            shard[term] = postings
+            size += encoded
+        if shard:
+            flush()
+        names = set(name for (first, name) in shards)
+        for name in os.listdir(output_directory):
+            if name.startswith("shard") and name not in names:
+                os.remove(os.path.join(output_directory, name))
+        # index.json goes last, so it never points at a shard that isn't there yet.
+        write_atomic(os.path.join(output_directory, "index.json"), json.dumps({"pages": self.pages, "shards": shards}, separators = (",", ":")))
+        if os.path.isdir(self.work_directory):
+            shutil.rmtree(self.work_directory)
+        return len(shards)
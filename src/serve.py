@@ -0,0 +1,314 @@
+from main import build, generate_page, collect_pages, remove_output, check_links, report_broken_links, links_path_for, MANIFEST_PATH
+from main import template_for, record_dependencies, deps_path_for, site_path, update_listings, images_path_for, SECTION_TEMPLATE
+from images import ImageIndex, process_images
+from listings import LISTING_SIZE
+from depgraph import DependencyGraph
+from manifest import hash_file
+from staticsync import sync_file, scan_tree
+from blockcache import BlockCache
+from linkindex import LinkIndex, PageLinks
+import os, sys, time, argparse, select, struct, threading
+import ctypes, ctypes.util
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# Dev server. We build the site once, serve docs/ from a background thread,
+# and then sit and watch content/, static/, the template and partials/. When
+# something changes we redo only what it affects: one page for a markdown file,
+# one copy for a static file. When a template or partial changes (or a static
+# file that pages use), we hand over to an incremental build, and the
+# dependency graph picks out the pages that used it. Listings and feeds are
+# redone from the metadata index after every change, which only rewrites the
+# ones it affects. The compiled templates and the block cache stay warm
+# between rebuilds.
+
+class PollingWatcher():
+    # Works anywhere: stat everything every interval and diff the snapshots.
+    def __init__(self, directories, files, interval = 0.25):
+        self.directories = directories
+        self.files = files
+        self.interval = interval
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        snapshot = {}
+        stack = list(self.directories)
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                else:
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        for path in self.files:
+            try:
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+        return snapshot
+
+    def wait(self, timeout = None):
+        # Set of paths that changed, or an empty set if timeout ran out first.
+        deadline = None if timeout == None else time.monotonic() + timeout
+        while True:
+            time.sleep(self.interval if deadline == None else max(0, min(self.interval, deadline - time.monotonic())))
+            snapshot = self.take_snapshot()
+            changed = set(path for path in snapshot.keys() | self.snapshot.keys() if snapshot.get(path) != self.snapshot.get(path))
+            self.snapshot = snapshot
+            if changed or (deadline != None and time.monotonic() >= deadline):
+                return changed
+
+class InotifyWatcher():
+    # Linux only, via libc. The kernel tells us exactly what changed, so
+    # there's no polling delay and no stat storm on big trees.
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, directories, files):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno = True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # watch descriptor -> directory
+        self.watches = {}
+        # Descriptors for the watched trees, where every event counts.
+        self.tree_watches = set()
+        # Loose files are watched through their directory (so editors that
+        # save by renaming still get noticed), and filtered by name.
+        self.files = set(os.path.normpath(path) for path in files)
+        for directory in directories:
+            self.watch_tree(directory)
+        for path in self.files:
+            self.add_watch(os.path.dirname(path) or ".")
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+        return wd
+
+    def watch_tree(self, directory):
+        self.tree_watches.add(self.add_watch(directory))
+        for root, dirs, files in os.walk(directory):
+            for name in dirs:
+                self.tree_watches.add(self.add_watch(os.path.join(root, name)))
+
+    def wait(self, timeout = None):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 1 << 16)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode()
+            offset += length
+            directory = self.watches.get(wd)
+            if directory == None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if wd not in self.tree_watches and os.path.normpath(path) not in self.files:
+                continue
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                self.watch_tree(path)
+            changed.add(path)
+        return changed
+
+def make_watcher(directories, files, poll = False):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories, files)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directories, files)
+
+class Site():
+    def __init__(self, basepath = "/", static_path = "static", content_path = "content", template_path = "template.html", dest_path = "docs", manifest_path = MANIFEST_PATH, site_url = "", listing_size = LISTING_SIZE):
+        self.basepath = basepath
+        self.static_path = static_path
+        self.content_path = content_path
+        self.template_path = template_path
+        self.dest_path = dest_path
+        self.manifest_path = manifest_path
+        self.site_url = site_url
+        self.listing_size = listing_size
+        self.cache = BlockCache()
+        self.manifest = None
+
+    def build(self, full = False):
+        self.manifest = build(self.basepath, self.static_path, self.content_path, self.template_path, self.dest_path, self.manifest_path, full = full, cache = self.cache,
+                              site_url = self.site_url, listing_size = self.listing_size)
+
+    def inside(self, path, directory):
+        return os.path.normpath(path).startswith(os.path.normpath(directory) + os.sep)
+
+    def output_for(self, path, directory):
+        return os.path.join(self.dest_path, os.path.relpath(path, directory))
+
+    def forget(self, entries, path):
+        # Drops (and deletes the outputs of) every entry at or under path,
+        # which covers both deleted files and deleted directories.
+        prefix = os.path.normpath(path)
+        for source in list(entries):
+            normalized = os.path.normpath(source)
+            if normalized == prefix or normalized.startswith(prefix + os.sep):
+                remove_output(entries.pop(source)["output"], self.dest_path)
+
+    def is_template_file(self, path):
+        # The site template, a section's _template.html, or any partial.
+        path = os.path.normpath(path)
+        if path == os.path.normpath(self.template_path):
+            return True
+        if self.inside(path, self.content_path) and os.path.basename(path) == SECTION_TEMPLATE:
+            return True
+        return path.endswith(".html") and "partials" in path.split(os.sep)
+
+    def update_page(self, source, target, page_links, updated, images = None):
+        source_hash = hash_file(source)
+        if self.manifest.is_fresh(self.manifest.pages, source, source_hash, target):
+            return 0
+        links = page_links[target] = PageLinks()
+        template_path = template_for(source, self.content_path, self.template_path)
+        generate_page(source, template_path, target, self.basepath, self.cache, links = links, images = images)
+        self.manifest.pages[source] = {"hash": source_hash, "output": target}
+        updated.append((source, target, template_path))
+        return 1
+
+    def update_static(self, source, target):
+        entry, placed = sync_file(source, target, self.manifest.static.get(source))
+        self.manifest.static[source] = entry
+        return int(placed)
+
+    def rebuild(self, changed):
+        # Redoes whatever the changed paths affect, and returns how many files
+        # were rewritten.
+        deps_path = deps_path_for(self.manifest_path)
+        graph = DependencyGraph.load(deps_path)
+        outputs = set(entry["output"] for entry in self.manifest.pages.values())
+        if any(self.is_template_file(path) for path in changed) or graph.dependents(path for path in changed if self.inside(path, self.static_path)) & outputs:
+            # Let the build work out (from the dependency graph) which pages
+            # that touches.
+            self.build()
+            return len(self.manifest.pages)
+        count = 0
+        page_links = {}
+        updated = []
+        # Static files first, so pages see the images as they are now.
+        static_changed = False
+        for path in sorted(changed):
+            if self.inside(path, self.static_path):
+                static_changed = True
+                if os.path.isdir(path):
+                    for source, target, stat in scan_tree(path, self.output_for(path, self.static_path)):
+                        count += self.update_static(source, target)
+                elif os.path.isfile(path):
+                    count += self.update_static(path, self.output_for(path, self.static_path))
+                else:
+                    self.forget(self.manifest.static, path)
+        if static_changed:
+            old_images = self.manifest.images
+            images, self.manifest.images, made = process_images(self.manifest.static, old_images, self.dest_path, os.path.dirname(self.manifest_path), self.basepath)
+            for output in old_images.keys() - self.manifest.images.keys():
+                remove_output(output, self.dest_path)
+        else:
+            images = ImageIndex.load(images_path_for(self.manifest_path), self.basepath)
+        for path in sorted(changed):
+            if self.inside(path, self.content_path):
+                if os.path.isdir(path):
+                    for source, target in collect_pages(path, self.output_for(path, self.content_path)):
+                        count += self.update_page(source, target, page_links, updated, images)
+                elif os.path.isfile(path):
+                    if path[-3:] == ".md":
+                        count += self.update_page(path, self.output_for(path, self.content_path)[:-3] + ".html", page_links, updated, images)
+                else:
+                    self.forget(self.manifest.pages, path)
+        old_listings = self.manifest.listings
+        count += update_listings(self.manifest, old_listings, self.manifest_path, self.content_path, self.template_path, self.basepath, self.dest_path, self.site_url, self.listing_size)
+        for output in old_listings.keys() - self.manifest.listings.keys():
+            remove_output(output, self.dest_path)
+        self.manifest.save(self.manifest_path)
+        if updated:
+            # So the next build (or static edit) knows what these pages use now.
+            static_files = {site_path(entry["output"], self.dest_path): source for source, entry in self.manifest.static.items()}
+            record_dependencies(graph, updated, [], page_links, self.basepath, static_files, self.dest_path)
+            for source, target, template_path in updated:
+                for path in graph.inputs_of(target):
+                    entry = self.manifest.pages.get(path) or self.manifest.static.get(path)
+                    graph.set_hash(path, entry["hash"] if entry != None else hash_file(path))
+            graph.save(deps_path)
+        # Any edit can break (or fix) links on other pages, so recheck the
+        # whole site. That's just lookups; nothing gets re-rendered.
+        links_path = links_path_for(self.manifest_path)
+        link_index = LinkIndex.load(links_path)
+        report_broken_links(check_links(link_index, page_links, self.manifest, self.basepath, self.dest_path))
+        link_index.save(links_path)
+        return count
+
+def serve_forever(site, port):
+    handler = partial(SimpleHTTPRequestHandler, directory = site.dest_path)
+    server = ThreadingHTTPServer(("", port), handler)
+    thread = threading.Thread(target = server.serve_forever, daemon = True)
+    thread.start()
+    print(f"Serving {site.dest_path} at http://localhost:{port}/")
+    return server
+
+def watch(site, watcher, debounce = 0.05):
+    while True:
+        changed = watcher.wait()
+        # Editors (and git checkouts) tend to touch a bunch of files at once.
+        # Keep collecting until things go quiet, then do one rebuild.
+        while True:
+            more = watcher.wait(debounce)
+            if not more:
+                break
+            changed |= more
+        start = time.perf_counter()
+        try:
+            count = site.rebuild(changed)
+        except Exception as e:
+            # A half-written markdown file shouldn't take the server down.
+            print(f"Rebuild failed: {e}")
+            continue
+        print(f"Rebuilt {count} file(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Build the site, serve docs/, and optionally rebuild on changes.")
+    parser.add_argument("basepath", nargs = "?", default = "/")
+    parser.add_argument("--port", type = int, default = 8888)
+    parser.add_argument("--watch", action = "store_true", help = "rebuild whatever changes in content/, static/, the template or partials/")
+    parser.add_argument("--poll", action = "store_true", help = "poll for changes instead of using inotify")
+    parser.add_argument("--debounce-ms", type = int, default = 50, help = "how long things have to be quiet before we rebuild")
+    args = parser.parse_args()
+    site = Site(args.basepath)
+    site.build()
+    server = serve_forever(site, args.port)
+    try:
+        if args.watch:
+            partials = os.path.join(os.path.dirname(site.template_path), "partials")
+            directories = [site.content_path, site.static_path] + ([partials] if os.path.isdir(partials) else [])
+            watcher = make_watcher(directories, [site.template_path], poll = args.poll)
+            print(f"Watching for changes ({type(watcher).__name__})")
+            watch(site, watcher, args.debounce_ms / 1000)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
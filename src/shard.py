@@ -0,0 +1,90 @@
+import argparse, hashlib, heapq, json, os
+
+# Splitting one build across machines. Every machine runs the same build with
+# --shard i/N, and renders only the pages that fall in slice i of N, into its
+# own directory (SHARD_DIR/i/docs, with its manifest and caches next to it in
+# SHARD_DIR/i). merge.py then puts the slices back together into docs/.
+#
+# The split has to come out the same on every machine without them talking to
+# each other, so it only depends on things they all have: the list of sources,
+# and (optionally) the per-page timings from an earlier --profile-json, which
+# let us balance slices by how long their pages take rather than by count.
+
+SHARD_DIR = "shards"
+
+def parse_shard(text):
+    # "2/4" -> (2, 4). Shards are numbered from 1. This is --shard's argparse
+    # type, so a bad one comes out as a usage error rather than a traceback.
+    index, _, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard should look like i/N, not {text}")
+    if count < 1 or index < 1 or index > count:
+        raise argparse.ArgumentTypeError(f"Shard {text} doesn't exist; it should be between 1/{count} and {count}/{count}")
+    return index, count
+
+def shard_paths(shard_dir, index):
+    # (output directory, manifest path) for shard index.
+    root = os.path.join(shard_dir, str(index))
+    return os.path.join(root, "docs"), os.path.join(root, "manifest.json")
+
+def shard_info_path(manifest_path):
+    return os.path.join(os.path.dirname(manifest_path), "shard.json")
+
+def stable_hash(key):
+    # Python's hash() is salted per process, so that won't do.
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big")
+
+def shard_key(source):
+    return source.replace(os.sep, "/")
+
+def partition(keys, count, costs = None):
+    # key -> shard (from 0). Without costs, that's just the key's hash, so a
+    # page stays on the same shard as pages come and go. With costs (key ->
+    # seconds), the most expensive pages get handed out first, each to the
+    # shard with the least work so far. Pages we have no timing for are
+    # assumed to cost the average.
+    if costs == None:
+        return {key: stable_hash(key) % count for key in keys}
+    known = [costs[key] for key in keys if key in costs]
+    default = sum(known) / len(known) if known else 1.0
+    loads = [(0.0, shard) for shard in range(count)]
+    assignment = {}
+    for key in sorted(keys, key = lambda key : (-costs.get(key, default), key)):
+        load, shard = heapq.heappop(loads)
+        assignment[key] = shard
+        heapq.heappush(loads, (load + costs.get(key, default), shard))
+    return assignment
+
+def shard_pages(pages, index, count, costs = None):
+    # The (source, destination) pairs in pages that belong to shard index of count.
+    assignment = partition([shard_key(source) for source, target in pages], count, costs)
+    return [(source, target) for source, target in pages if assignment[shard_key(source)] == index - 1]
+
+def load_costs(paths):
+    # source -> seconds, from one or more --profile-json files (a sharded
+    # build only has timings for its own pages, so pass every shard's).
+    costs = {}
+    for path in paths:
+        with open(path, "r") as f:
+            pages = json.load(f).get("pages", {})
+        for source, phases in pages.items():
+            costs[shard_key(source)] = costs.get(shard_key(source), 0.0) + sum(phases.values())
+    return costs
+
+def save_shard_info(manifest_path, index, count):
+    directory = os.path.dirname(manifest_path)
+    if directory:
+        os.makedirs(directory, exist_ok = True)
+    with open(shard_info_path(manifest_path), "w") as f:
+        json.dump({"shard": index, "count": count}, f)
+
+def load_shard_info(manifest_path):
+    # (index, count), or None if there's no shard here.
+    try:
+        with open(shard_info_path(manifest_path), "r") as f:
+            data = json.load(f)
+        return data["shard"], data["count"]
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,98 @@
+import os, shutil
+from manifest import hash_file
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Keeps the static half of docs/ in step with static/ without copying the
+# whole tree every build. A file whose size and mtime match what we recorded
+# last time is trusted as-is; otherwise we hash it, and only put a new copy in
+# place if the contents really changed (or the output went missing).
+#
+# Files can be put in place by copying, hardlinking (no extra disk space, but
+# docs/ and static/ then share the same file) or reflinking (copy-on-write
+# clones, on filesystems that support them: btrfs, xfs, ...).
+
+MODES = ("copy", "hardlink", "reflink")
+
+# From linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+def scan_tree(source, target):
+    # (source, target, stat) for every file under source. os.scandir hands us
+    # the file type for free and caches the one stat we need per file.
+    files = []
+    stack = [(source, target)]
+    while stack:
+        source_directory, target_directory = stack.pop()
+        with os.scandir(source_directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append((entry.path, os.path.join(target_directory, entry.name)))
+                elif entry.is_file():
+                    files.append((entry.path, os.path.join(target_directory, entry.name), entry.stat()))
+    files.sort()
+    return files
+
+def reflink(source, target):
+    if fcntl == None:
+        raise OSError("reflinks aren't supported here")
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def place_file(source, target, mode = "copy"):
+    # We always unlink first: if target is a hardlink to source, writing
+    # through it would scribble on the source.
+    if os.path.lexists(target):
+        os.remove(target)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok = True)
+    if mode == "hardlink":
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            # Probably a different filesystem. Copying still works.
+            pass
+    elif mode == "reflink":
+        try:
+            reflink(source, target)
+            return
+        except OSError:
+            if os.path.lexists(target):
+                os.remove(target)
+    shutil.copy(source, target)
+
+def sync_file(source, target, old_entry = None, mode = "copy", stat = None):
+    # Makes sure target is up to date with source. Returns the manifest entry
+    # for source and whether we had to put a new file in place.
+    if stat == None:
+        stat = os.stat(source)
+    output_exists = os.path.isfile(target)
+    if old_entry != None and old_entry["output"] == target and output_exists \
+            and old_entry.get("size") == stat.st_size and old_entry.get("mtime_ns") == stat.st_mtime_ns:
+        return old_entry, False
+    source_hash = hash_file(source)
+    entry = {"hash": source_hash, "output": target, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if old_entry != None and old_entry["output"] == target and output_exists and old_entry["hash"] == source_hash:
+        # Touched, but not changed.
+        return entry, False
+    place_file(source, target, mode)
+    return entry, True
+
+def sync_static(source, target, old_entries, mode = "copy"):
+    # Syncs every file under source into target. Returns the new manifest
+    # entries and how many files were actually put in place. Cleaning up
+    # files that disappeared from source is left to the caller, since it
+    # knows about every other output in target too.
+    if mode not in MODES:
+        raise Exception(f"Unknown static mode {mode}")
+    entries = {}
+    placed = 0
+    for source_path, target_path, stat in scan_tree(source, target):
+        entry, changed = sync_file(source_path, target_path, old_entries.get(source_path), mode, stat)
+        entries[source_path] = entry
+        placed += changed
+    return entries, placed
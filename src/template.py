@@ -0,0 +1,116 @@
+import os
+from patterns import PLACEHOLDER, SITE_ABSOLUTE_ATTRIBUTE, PARTIAL, TEMPLATE_ASSET
+
+# A tiny template engine. We compile template.html once into a list of parts,
+# alternating between literal text and placeholder slots, so rendering a page
+# is just dropping the values into their slots and doing one join.
+#
+# Templates can pull in partials with {{> name }}, which is replaced by the
+# contents of partials/name.html (which can have partials of its own). That
+# gets looked for next to the including file first, then in each directory
+# above it, so a section can override a site-wide partial.
+
+def rebase_template_text(text, basepath):
+    # Points href="/..." and src="/..." in the template's own markup at basepath.
+    # Content gets rebased separately when its nodes are built, so we never
+    # have to scan a finished page for this.
+    if basepath == "/":
+        return text
+    return SITE_ABSOLUTE_ATTRIBUTE.sub(lambda m : m.group(1) + basepath, text)
+
+def find_partial(name, including_path):
+    directory = os.path.dirname(including_path)
+    while True:
+        path = os.path.join(directory, "partials", name + ".html")
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            raise Exception(f"No partial {name} found for {including_path}")
+        directory = parent
+
+def expand_partials(path, text, files, including = ()):
+    # text (the contents of path) with every partial pasted in. Fills in files
+    # with path -> (partials it includes directly, static assets it uses)
+    # for path and every partial under it.
+    includes = []
+    def include(match):
+        partial_path = find_partial(match.group(1), path)
+        if partial_path == path or partial_path in including:
+            raise Exception(f"Partial {partial_path} includes itself (through {path})")
+        includes.append(partial_path)
+        with open(partial_path, "r") as f:
+            partial_text = f.read()
+        return expand_partials(partial_path, partial_text, files, including + (path,))
+    expanded = PARTIAL.sub(include, text)
+    files[path] = (includes, TEMPLATE_ASSET.findall(text))
+    return expanded
+
+class Template():
+    def __init__(self, text, basepath = "/"):
+        # file -> (partials, static assets), for load_template's templates
+        self.files = {}
+        self.parts = []
+        # (index into parts, placeholder name) for every slot
+        self.slots = []
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self.parts.append(rebase_template_text(text[position:match.start()], basepath))
+            self.slots.append((len(self.parts), match.group(1)))
+            self.parts.append(None)
+            position = match.end()
+        self.parts.append(rebase_template_text(text[position:], basepath))
+
+    def check_values(self, values):
+        for idx, name in self.slots:
+            if name not in values:
+                raise Exception(f"No value given for template placeholder {name}")
+
+    def render(self, **values):
+        self.check_values(values)
+        parts = self.parts.copy()
+        for idx, name in self.slots:
+            parts[idx] = values[name]
+        return "".join(parts)
+
+    def write(self, stream, **values):
+        # Like render, but straight to a file-like object. Values that know how
+        # to stream themselves (HTMLNodes) are streamed rather than stringified.
+        self.check_values(values)
+        slot_names = dict(self.slots)
+        for idx, part in enumerate(self.parts):
+            if part != None:
+                stream.write(part)
+                continue
+            value = values[slot_names[idx]]
+            if hasattr(value, "write_html"):
+                value.write_html(stream)
+            else:
+                stream.write(value)
+
+# Compiled templates, keyed by (path, basepath). We hang on to the stat info
+# of every file that went into them (the template and all its partials) so
+# that editing any of them gets the template picked up again.
+_template_cache = {}
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_template(path, basepath = "/"):
+    if not os.path.exists(path) or not os.path.isfile(path):
+        raise Exception(f"No file exists at {path}")
+    cached = _template_cache.get((path, basepath))
+    if cached != None and all(file_stamp(file) == stamp for file, stamp in cached[0].items()):
+        return cached[1]
+    files = {}
+    with open(path, "r") as f:
+        text = expand_partials(path, f.read(), files)
+    stamps = {file: file_stamp(file) for file in files}
+    template = Template(text, basepath)
+    template.files = files
+    _template_cache[(path, basepath)] = (stamps, template)
+    return template
@@ -0,0 +1,49 @@
+import unittest
+import contextlib, importlib, io, json, sys
+
+from markdown_to_nodes import markdown_to_html_node
+from benchmarks.corpus import synthetic_markdown
+from benchmarks.escape import unescaped_html
+from benchmarks.memory import measure
+
+# Every benchmark, run on a small corpus, so that a change to the nodes or the
+# parser can't quietly leave one of them broken.
+
+MODULES = ["benchmarks.classify", "benchmarks.escape", "benchmarks.inline", "benchmarks.lists", "benchmarks.memory"]
+
+def run_main(module, args):
+    # module's main() with args as its command line; returns what it printed.
+    argv = sys.argv
+    sys.argv = [module] + args
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            importlib.import_module(module).main()
+    finally:
+        sys.argv = argv
+    return output.getvalue()
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_modules(self):
+        for module in MODULES:
+            size = "80" if module == "benchmarks.lists" else "20000"
+            assert run_main(module, [size]) != "", module
+
+    def test_suite(self):
+        output = run_main("benchmarks.__main__", ["--size", "20000", "--pages", "5", "--page-size", "500", "--list-items", "80", "--repeat", "1"])
+        results = json.loads(output)["results"]
+        assert sorted(results) == sorted(importlib.import_module("benchmarks.__main__").BENCHMARKS)
+
+    def test_unescaped_images(self):
+        node = markdown_to_html_node("a ![pic](/images/a.png) b")
+        node.children = list(node.children)
+        assert unescaped_html(node) == node.to_html()
+        node = markdown_to_html_node(synthetic_markdown(20000))
+        node.children = list(node.children)
+        assert "<img" in unescaped_html(node)
+
+    def test_slot_nodes_are_smaller(self):
+        result = measure(synthetic_markdown(20000))
+        assert result["slot_nodes"] == result["nodes"] < result["dict_nodes"]
+        assert result["slot_node_bytes"] < result["dict_node_bytes"]
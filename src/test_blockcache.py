@@ -0,0 +1,63 @@
+import unittest
+import os, tempfile, shutil
+
+from blockcache import BlockCache
+from markdown_to_nodes import markdown_to_html_node, BlockType
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = BlockCache()
+        key = cache.key(BlockType.PARAGRAPH, "text", "/")
+        assert cache.get(key) == None
+        cache.put(key, "<p>text</p>", (("link", "/x/"),), "text")
+        assert cache.get(key) == ("<p>text</p>", (("link", "/x/"),), "text")
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_key_depends_on_type_and_basepath(self):
+        cache = BlockCache()
+        keys = {cache.key(BlockType.PARAGRAPH, "x", "/"), cache.key(BlockType.HEADING, "x", "/"), cache.key(BlockType.PARAGRAPH, "x", "/site/")}
+        assert len(keys) == 3
+
+    def test_eviction(self):
+        cache = BlockCache(max_bytes = 10)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+        cache.put("c", "cccc")
+        # b was the least recently used, so it's the one that goes.
+        assert list(cache.entries) == ["a", "c"]
+        assert cache.size == 8
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "blocks.json")
+            cache = BlockCache()
+            cache.put("a", "<p>a</p>")
+            cache.put("b", "<p>b</p>")
+            cache.save(path)
+            loaded = BlockCache.load(path)
+            assert list(loaded.entries.items()) == [("a", ("<p>a</p>", (), "")), ("b", ("<p>b</p>", (), ""))]
+            assert BlockCache.load(os.path.join(directory, "missing.json")).entries == {}
+        finally:
+            shutil.rmtree(directory)
+
+    def test_cached_render_matches(self):
+        md = "# Title\n\nSome **bold** [text](/x/)\n\n- a\n- b\n\nSome **bold** [text](/x/)"
+        cache = BlockCache()
+        expected = markdown_to_html_node(md, "/site/").to_html()
+        assert markdown_to_html_node(md, "/site/", cache).to_html() == expected
+        assert (cache.hits, cache.misses) == (1, 3)
+        assert markdown_to_html_node(md, "/site/", cache).to_html() == expected
+        assert (cache.hits, cache.misses) == (5, 3)
+
+    def test_blocks_are_cached_as_they_are_serialized(self):
+        # Not while the tree is built, so --profile counts it as serializing.
+        cache = BlockCache()
+        node = markdown_to_html_node("# Title\n\n[text](/x/)", "/", cache)
+        node.children = list(node.children)
+        assert len(cache.entries) == 0
+        html = node.to_html()
+        assert [entry[0] for entry in cache.entries.values()] == ["<h1 id=\"title\">Title</h1>", "<p><a href=\"/x/\">text</a></p>"]
+        assert node.to_html() == html
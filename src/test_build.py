@@ -0,0 +1,189 @@
+import unittest
+import os, io, contextlib
+
+from main import build
+from blockcache import BlockCache
+from profiler import Profiler
+from test_support import TempDir
+
+
+class TestIncrementalBuild(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.root, "static")
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        self.docs = os.path.join(self.root, "docs")
+        self.manifest = os.path.join(self.root, ".cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, "<title>{{ Title }}</title><body>{{ Content }}</body>")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nWords")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+
+    def build(self, basepath = "/", jobs = 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return build(basepath, self.static, self.content, self.template, self.docs, self.manifest, jobs = jobs)
+
+    def test_first_build(self):
+        self.build()
+        assert self.read(os.path.join(self.docs, "index.html")) == "<title>Home</title><body><div><h1 id=\"home\">Home</h1><p>Hello</p></div></body>"
+        assert os.path.isfile(os.path.join(self.docs, "blog", "post.html"))
+        assert os.path.isfile(os.path.join(self.docs, "index.css"))
+
+    def test_unchanged_pages_are_skipped(self):
+        self.build()
+        page = os.path.join(self.docs, "blog", "post.html")
+        self.write(page, "sentinel")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello again")
+        self.build()
+        assert self.read(page) == "sentinel"
+        assert "Hello again" in self.read(os.path.join(self.docs, "index.html"))
+
+    def test_removed_sources_are_cleaned_up(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        os.remove(os.path.join(self.static, "index.css"))
+        self.build()
+        assert not os.path.exists(os.path.join(self.docs, "blog"))
+        assert not os.path.exists(os.path.join(self.docs, "index.css"))
+        assert os.path.isfile(os.path.join(self.docs, "index.html"))
+
+    def test_gzip_keeps_gz_files_from_static(self):
+        with open(os.path.join(self.static, "app.js.gz"), "wb") as f:
+            f.write(b"not ours")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n" + "Hello " * 500)
+        for _ in range(2):
+            with contextlib.redirect_stdout(io.StringIO()):
+                manifest = build("/", self.static, self.content, self.template, self.docs, self.manifest, gzip_min_bytes = 1024)
+        assert os.path.isfile(os.path.join(self.docs, "app.js.gz"))
+        assert manifest.compressed == [os.path.join(self.docs, "index.html.gz")]
+        os.remove(os.path.join(self.content, "index.md"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.static, self.content, self.template, self.docs, self.manifest, gzip_min_bytes = 1024)
+        assert not os.path.exists(os.path.join(self.docs, "index.html.gz"))
+        assert os.path.isfile(os.path.join(self.docs, "app.js.gz"))
+
+    def test_basepath_change_rebuilds_everything(self):
+        self.build()
+        page = os.path.join(self.docs, "blog", "post.html")
+        self.write(page, "sentinel")
+        self.build("/site/")
+        assert self.read(page) != "sentinel"
+
+    def test_basepath_change_keeps_static_files(self):
+        self.build()
+        css = os.path.join(self.docs, "index.css")
+        self.write(css, "sentinel")
+        self.build("/site/")
+        assert self.read(css) == "sentinel"
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        page = os.path.join(self.docs, "blog", "post.html")
+        os.remove(page)
+        self.build()
+        assert os.path.isfile(page)
+
+    def test_parallel_build_matches_serial(self):
+        for idx in range(8):
+            self.write(os.path.join(self.content, "blog", f"post{idx}.md"), f"# Post {idx}\n\n- item **{idx}**\n- [link](/blog/)")
+        self.build()
+        pages = [os.path.join(self.docs, "blog", f"post{idx}.html") for idx in range(8)]
+        serial = [self.read(page) for page in pages]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            build("/", self.static, self.content, self.template, self.docs, self.manifest, full = True, jobs = 3)
+        assert [self.read(page) for page in pages] == serial
+        # Progress lines still come out in the same order as a serial build.
+        lines = output.getvalue().splitlines()
+        announced = [line.split(" ")[3] for line in lines if line.startswith("Generating page")]
+        assert announced == sorted(announced)
+
+    def test_parallel_build_shares_block_cache(self):
+        for idx in range(6):
+            self.write(os.path.join(self.content, "blog", f"post{idx}.md"), f"# Post {idx}\n\nShared footer")
+        cache = BlockCache()
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.static, self.content, self.template, self.docs, self.manifest, jobs = 2, cache = cache)
+        # 8 pages, 2 blocks each, 11 of them distinct. At most one
+        # "Shared footer" lookup per worker should miss.
+        assert cache.hits + cache.misses == 16
+        assert cache.misses <= 10 + 2
+        assert len(cache.entries) == 11
+        assert self.read(os.path.join(self.docs, "blog", "post3.html")) == "<title>Post 3</title><body><div><h1 id=\"post-3\">Post 3</h1><p>Shared footer</p></div></body>"
+
+    def test_profiled_build_matches(self):
+        self.build()
+        expected = self.read(os.path.join(self.docs, "blog", "post.html"))
+        profiler = Profiler()
+        profiler.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.static, self.content, self.template, self.docs, self.manifest, full = True, profiler = profiler)
+        profiler.stop()
+        assert self.read(os.path.join(self.docs, "blog", "post.html")) == expected
+        assert {"static", "read", "parse", "serialize", "substitute", "write"} <= set(profiler.phase_totals())
+        assert len(profiler.page_totals()) == 2
+
+    def test_pipelined_build_matches_inline(self):
+        for idx in range(20):
+            self.write(os.path.join(self.content, "blog", f"post{idx}.md"), f"# Post {idx}\n\nText *{idx}*")
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.static, self.content, self.template, self.docs, self.manifest, io_threads = 0)
+        pages = [os.path.join(self.docs, "blog", f"post{idx}.html") for idx in range(20)]
+        inline = [self.read(page) for page in pages]
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.static, self.content, self.template, self.docs, self.manifest, full = True, io_threads = 4)
+        assert [self.read(page) for page in pages] == inline
+
+    def test_template_change_rebuilds_everything(self):
+        self.build()
+        page = os.path.join(self.docs, "blog", "post.html")
+        self.write(page, "sentinel")
+        self.write(self.template, "<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.build()
+        assert self.read(page).endswith("</main>")
+
+    def test_section_template(self):
+        self.write(os.path.join(self.content, "blog", "_template.html"), "<article>{{ Content }}</article>")
+        self.build()
+        assert self.read(os.path.join(self.docs, "blog", "post.html")).startswith("<article>")
+        assert self.read(os.path.join(self.docs, "index.html")).startswith("<title>")
+        assert not os.path.exists(os.path.join(self.docs, "blog", "_template.html"))
+        # Taking it away puts the blog back on the site template.
+        os.remove(os.path.join(self.content, "blog", "_template.html"))
+        self.build()
+        assert self.read(os.path.join(self.docs, "blog", "post.html")).startswith("<title>")
+
+    def test_partial_change_rebuilds_only_its_dependents(self):
+        os.makedirs(os.path.join(self.content, "blog", "partials"))
+        self.write(os.path.join(self.content, "blog", "_template.html"), "<article>{{ Content }}{{> footer }}</article>")
+        self.write(os.path.join(self.content, "blog", "partials", "footer.html"), "<footer>old</footer>")
+        self.build()
+        home = os.path.join(self.docs, "index.html")
+        self.write(home, "sentinel")
+        self.write(os.path.join(self.content, "blog", "partials", "footer.html"), "<footer>newer</footer>")
+        self.build()
+        assert self.read(os.path.join(self.docs, "blog", "post.html")).endswith("<footer>newer</footer></article>")
+        assert self.read(home) == "sentinel"
+
+    def test_static_asset_change_rebuilds_pages_using_it(self):
+        self.write(os.path.join(self.static, "logo.png"), "one")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n![logo](/logo.png)")
+        self.build()
+        post = os.path.join(self.docs, "blog", "post.html")
+        home = os.path.join(self.docs, "index.html")
+        self.write(post, "sentinel")
+        self.write(home, "sentinel")
+        self.write(os.path.join(self.static, "logo.png"), "two")
+        self.build()
+        assert self.read(post) != "sentinel"
+        assert self.read(home) == "sentinel"
+        # And the same for assets the template uses.
+        self.write(self.template, "<img src=\"/logo.png\"><title>{{ Title }}</title><body>{{ Content }}</body>")
+        self.build()
+        self.write(home, "sentinel")
+        self.write(os.path.join(self.static, "logo.png"), "three")
+        self.build()
+        assert self.read(home) != "sentinel"
@@ -0,0 +1,58 @@
+import unittest
+import os, gzip
+
+from compress import precompress
+from test_support import TempDir
+
+
+class TestPrecompress(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.root, "blog"))
+        self.write("index.html", "<p>hello</p>" * 500)
+        self.write(os.path.join("blog", "post.html"), "<p>post</p>" * 500)
+        self.write("tiny.css", "body {}")
+        self.write("image.png", "not really a png" * 500)
+
+    def test_compresses_big_text_files(self):
+        report = precompress(self.root, min_size = 1024, threads = 2)
+        assert report.compressed == 2
+        assert report.saved() > 0
+        with gzip.open(os.path.join(self.root, "index.html.gz"), "rt") as f:
+            assert f.read() == "<p>hello</p>" * 500
+        assert not os.path.exists(os.path.join(self.root, "tiny.css.gz"))
+        assert not os.path.exists(os.path.join(self.root, "image.png.gz"))
+
+    def test_skips_up_to_date(self):
+        precompress(self.root)
+        report = precompress(self.root)
+        assert (report.compressed, report.skipped) == (0, 2)
+        # Make the page newer than its .gz.
+        gz_mtime = os.stat(os.path.join(self.root, "index.html.gz")).st_mtime_ns
+        os.utime(os.path.join(self.root, "index.html"), ns = (gz_mtime + 10 ** 9, gz_mtime + 10 ** 9))
+        report = precompress(self.root)
+        assert (report.compressed, report.skipped) == (1, 1)
+
+    def test_removes_orphans(self):
+        first = precompress(self.root)
+        assert first.written == sorted([os.path.join(self.root, "index.html.gz"), os.path.join(self.root, "blog", "post.html.gz")])
+        os.remove(os.path.join(self.root, "blog", "post.html"))
+        report = precompress(self.root, ours = first.written)
+        assert report.removed == 1
+        assert not os.path.exists(os.path.join(self.root, "blog", "post.html.gz"))
+        assert report.written == [os.path.join(self.root, "index.html.gz")]
+
+    def test_leaves_other_gz_files_alone(self):
+        # Put there on purpose, with no uncompressed sibling, or alongside one.
+        with open(os.path.join(self.root, "vendor.js.gz"), "wb") as f:
+            f.write(gzip.compress(b"vendor"))
+        with open(os.path.join(self.root, "index.html.gz"), "wb") as f:
+            f.write(b"mine")
+        keep = [os.path.join(self.root, "vendor.js.gz"), os.path.join(self.root, "index.html.gz")]
+        for _ in range(2):
+            report = precompress(self.root, ours = keep, keep = keep)
+        assert report.removed == 0
+        assert os.path.exists(os.path.join(self.root, "vendor.js.gz"))
+        with open(os.path.join(self.root, "index.html.gz"), "rb") as f:
+            assert f.read() == b"mine"
+        assert report.written == [os.path.join(self.root, "blog", "post.html.gz")]
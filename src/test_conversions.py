@@ -1,4 +1,5 @@
 import unittest
+import io, mmap, tempfile, os
 
 from markdown_to_nodes import *
 from textnode import TextNode, TextType
@@ -91,6 +92,30 @@ And, of course, `there's a bit of code`."""
             ]
         )
 
+    def test_links_are_atomic(self):
+        md = "See [snake_case_names](https://example.com/a_b_c) and `code with *stars*`"
+        self.assertListEqual(
+            text_to_textnodes(md),
+            [
+                TextNode("See ", []),
+                TextNode("snake_case_names", [TextType.LINK], "https://example.com/a_b_c"),
+                TextNode(" and ", []),
+                TextNode("code with *stars*", [TextType.CODE]),
+            ]
+        )
+
+    def test_nested_emphasis(self):
+        md = "*italic **bold italic** italic* plain"
+        self.assertListEqual(
+            text_to_textnodes(md),
+            [
+                TextNode("italic ", [TextType.ITALIC]),
+                TextNode("bold italic", [TextType.ITALIC, TextType.BOLD]),
+                TextNode(" italic", [TextType.ITALIC]),
+                TextNode(" plain", []),
+            ]
+        )
+
     def test_markdown_to_blocks(self):
         md = """
 This is **bolded** paragraph
@@ -111,6 +136,30 @@ This is the same paragraph on a new line
             ],
         )
 
+    def test_scan_blocks(self):
+        md = """# Title
+
+> A quote
+> continues
+
+```
+code with
+
+a blank line
+```
+- list
+  - nested
+Just a paragraph"""
+        self.assertListEqual(
+            list(scan_blocks(md)),
+            [
+                Block(BlockType.HEADING, ["# Title"], 0, 1),
+                Block(BlockType.QUOTE, ["> A quote", "> continues"], 2, 4),
+                Block(BlockType.CODE, ["```", "code with", "", "a blank line", "```"], 5, 10),
+                Block(BlockType.PARAGRAPH, ["- list", "  - nested", "Just a paragraph"], 10, 13),
+            ]
+        )
+
     def test_block_to_block_type(self):
         blocks = [
             "# Heading!",
@@ -203,3 +252,70 @@ the **same** even with inline stuff
             html,
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
+
+    def test_codeblock_with_blank_lines(self):
+        md = "```\nfirst\n\nsecond\n```\n\nAfter"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(html, "<div><pre><code>first\n\nsecond\n</code></pre><p>After</p></div>")
+
+    def test_nested_lists(self):
+        md = "- top\n  - nested **bold**\n    - deeper\n      - deepest\n- back\n1. one\n   b) two\n   C. three"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><ol><li style=\"list-style-type:disc\">top</li><ol><li style=\"list-style-type:circle\">nested <b>bold</b></li>"
+            "<ol><li style=\"list-style-type:square\">deeper</li><ol><li style=\"list-style-type:square\">deepest</li></ol></ol></ol>"
+            "<li style=\"list-style-type:disc\">back</li><li style=\"list-style-type:decimal\" value=\"1\">one</li>"
+            "<ol><li style=\"list-style-type:lower-alpha\" value=\"2\">two</li><li style=\"list-style-type:upper-alpha\" value=\"3\">three</li></ol></ol></div>",
+        )
+
+    def test_list_markers(self):
+        html = create_list_from_lines(["z. a", "aa. b", "AB) c", "10. d", ". e"]).to_html()
+        assert html == ("<ol><li style=\"list-style-type:lower-alpha\" value=\"26\">a</li><li style=\"list-style-type:lower-alpha\" value=\"27\">b</li>"
+                        "<li style=\"list-style-type:upper-alpha\" value=\"28\">c</li><li style=\"list-style-type:decimal\" value=\"10\">d</li>"
+                        "<li style=\"list-style-type:decimal\">e</li></ol>")
+
+    def test_list_dedent_between_levels(self):
+        # "b" is less indented than "a" but more than "top": so "a" was really
+        # a level deeper, in a sublist of the list "b" is in.
+        html = create_list_from_lines(["- top", "    - a", "  - b", "- end"]).to_html()
+        assert html == ("<ol><li style=\"list-style-type:disc\">top</li><ol><ol><li style=\"list-style-type:square\">a</li></ol>"
+                        "<li style=\"list-style-type:circle\">b</li></ol><li style=\"list-style-type:disc\">end</li></ol>")
+        # Same when the first line is the odd one out.
+        html = create_list_from_lines(["  - a", "- b"]).to_html()
+        assert html == "<ol><ol><li style=\"list-style-type:circle\">a</li></ol><li style=\"list-style-type:disc\">b</li></ol>"
+
+    def test_long_deep_list(self):
+        lines = [" " * (2 * idx) + f"- item {idx}" for idx in range(2000)]
+        node = create_list_from_lines(lines)
+        depth = 0
+        while node.children[-1].tag == "ol":
+            node = node.children[-1]
+            depth += 1
+        assert depth == 1999
+
+class Test_streaming(unittest.TestCase):
+    md = "# Title\n\nSome *text* that\ngoes on\n\n```\ncode\n\nmore \u00e9 code\n```\n\n- a\n- b\n"
+
+    def test_iter_lines_matches_split(self):
+        for md in (self.md, "", "\n", "no newline", "a\n\n\nb\n"):
+            expected = md.split("\n")
+            assert list(iter_lines(md)) == expected
+            # Tiny chunks, so lines (and the two bytes of the \u00e9) get cut up.
+            assert list(iter_lines(io.StringIO(md), chunk_size = 3)) == expected
+            assert list(iter_lines(io.BytesIO(md.encode()), chunk_size = 3)) == expected
+
+    def test_markdown_from_file_and_mmap(self):
+        expected = markdown_to_html_node(self.md).to_html()
+        assert markdown_to_html_node(io.StringIO(self.md)).to_html() == expected
+        with tempfile.TemporaryFile() as f:
+            f.write(self.md.encode())
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mapped:
+                assert markdown_to_html_node(mapped).to_html() == expected
+
+    def test_blocks_are_read_lazily(self):
+        source = io.StringIO("First block\n\n" + "x" * 100000)
+        blocks = scan_blocks(iter_lines(source, chunk_size = 64))
+        assert next(blocks).lines == ["First block"]
+        assert source.tell() < 1000
+
@@ -0,0 +1,29 @@
+import unittest
+import os, tempfile, shutil
+
+from benchmarks.corpus import CorpusGenerator, synthetic_markdown, page_paths, write_site
+from markdown_to_nodes import markdown_to_html_node
+
+
+class TestCorpus(unittest.TestCase):
+    def test_deterministic(self):
+        assert synthetic_markdown(20000, seed = 1) == synthetic_markdown(20000, seed = 1)
+        assert synthetic_markdown(20000, seed = 1) != synthetic_markdown(20000, seed = 2)
+
+    def test_mix(self):
+        md = CorpusGenerator(mix = {"code": 1}).page(2000)
+        assert all(block.startswith("```") for block in md.split("\n\n")[1:])
+
+    def test_renders(self):
+        markdown_to_html_node(synthetic_markdown(50000)).to_html()
+
+    def test_site(self):
+        root = tempfile.mkdtemp()
+        try:
+            write_site(root, pages = 10, page_size = 500, depth = 3, fanout = 2)
+            assert len(set(page_paths(10, 3, 2))) == 10
+            for path in page_paths(10, 3, 2):
+                assert os.path.isfile(os.path.join(root, "content", path))
+            assert os.path.isfile(os.path.join(root, "template.html"))
+        finally:
+            shutil.rmtree(root)
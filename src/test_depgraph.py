@@ -0,0 +1,56 @@
+import unittest
+import os
+
+from depgraph import DependencyGraph
+from test_support import TempDir
+
+
+class TestDependencyGraph(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.deps_path = os.path.join(self.root, "deps.bin")
+        self.graph = DependencyGraph()
+        self.graph.set_inputs("docs/a.html", ["content/a.md", "template.html"])
+        self.graph.set_inputs("docs/b.html", ["content/b.md", "blog.html", "static/logo.png"])
+        self.graph.set_inputs("template.html", ["partials/nav.html"])
+        self.graph.set_inputs("blog.html", ["partials/nav.html", "partials/footer.html"])
+        for path in ["content/a.md", "content/b.md", "template.html", "blog.html", "static/logo.png", "partials/nav.html", "partials/footer.html"]:
+            self.graph.set_hash(path, "hash of " + path)
+
+    def test_dependents_are_transitive(self):
+        assert self.graph.dependents(["partials/footer.html"]) == {"partials/footer.html", "blog.html", "docs/b.html"}
+        assert self.graph.dependents(["partials/nav.html"]) >= {"docs/a.html", "docs/b.html"}
+        assert self.graph.dependents(["static/logo.png"]) == {"static/logo.png", "docs/b.html"}
+        assert self.graph.dependents(["unknown"]) == set()
+
+    def test_changed(self):
+        hashes = {path: "hash of " + path for path in self.graph.paths}
+        hashes["blog.html"] = "edited"
+        del hashes["content/a.md"]
+        assert sorted(self.graph.changed(hashes.get)) == ["blog.html", "content/a.md"]
+
+    def test_round_trip(self):
+        self.graph.save(self.deps_path)
+        loaded = DependencyGraph.load(self.deps_path)
+        assert loaded.paths == self.graph.paths
+        assert loaded.hashes == self.graph.hashes
+        for path in self.graph.paths:
+            assert loaded.inputs_of(path) == self.graph.inputs_of(path)
+        assert loaded.dependents(["partials/footer.html"]) == {"partials/footer.html", "blog.html", "docs/b.html"}
+        assert loaded.depends_on("docs/b.html", "blog.html")
+        assert not loaded.depends_on("docs/b.html", "template.html")
+        # Edges changed after loading count too.
+        loaded.set_inputs("docs/a.html", ["content/a.md", "blog.html"])
+        assert "docs/a.html" in loaded.dependents(["partials/footer.html"])
+
+    def test_compacted(self):
+        compact = self.graph.compacted(["docs/a.html"])
+        assert sorted(compact.paths) == ["content/a.md", "docs/a.html", "partials/nav.html", "template.html"]
+        assert compact.inputs_of("template.html") == ["partials/nav.html"]
+        assert compact.hashes[compact.ids["template.html"]] == "hash of template.html"
+
+    def test_unreadable_graph_is_empty(self):
+        with open(self.deps_path, "wb") as f:
+            f.write(b"not a graph")
+        assert DependencyGraph.load(self.deps_path).paths == []
+        assert DependencyGraph.load(os.path.join(self.root, "missing.bin")).paths == []
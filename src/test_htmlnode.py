@@ -1,6 +1,8 @@
 import unittest
+import io
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, RawNode, VoidNode, shared_props, escape_text, escape_attribute, _serialized_props
+from markdown_to_nodes import markdown_to_html_node
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -8,10 +10,39 @@ class TestHTMLNode(unittest.TestCase):
         node = HTMLNode(tag = "tag", value = "val", children = ["kids"], props = {"p1": "prop 1", "p2": "prop 2"})
         assert repr(node) == "HTMLNode(tag = \'tag\', value = \'val\', children = [\'kids\'], props = {\'p1\': \'prop 1\', \'p2\': \'prop 2\'})"
 
+    def test_no_instance_dict(self):
+        node = LeafNode("p", "text")
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
+    def test_shared_props(self):
+        props = shared_props(style = "list-style-type:disc")
+        assert props is shared_props(style = "list-style-type:disc")
+        assert LeafNode("li", "x", props).to_html() == "<li style=\"list-style-type:disc\">x</li>"
+        with self.assertRaises(TypeError):
+            props["style"] = "oops"
+
     def test_props_to_html(self):
         node = HTMLNode(props = {"href": "https://www.google.com", "target": "_blank"})
         assert node.props_to_html() == "href=\"https://www.google.com\" target=\"_blank\""
 
+    def test_props_are_escaped(self):
+        node = HTMLNode(props = {"title": "say \"hi\" & <wave>", "value": 3})
+        assert node.props_to_html() == "title=\"say &quot;hi&quot; &amp; &lt;wave&gt;\" value=\"3\""
+
+    def test_shared_props_serialized_once(self):
+        props = shared_props(alt = "a \"quoted\" alt")
+        assert _serialized_props[id(props)] == "alt=\"a &quot;quoted&quot; alt\""
+        assert HTMLNode("img", props = props).props_to_html() is _serialized_props[id(props)]
+
+    def test_escape(self):
+        assert escape_text("a < b && c > d \"e\"") == "a &lt; b &amp;&amp; c &gt; d \"e\""
+        assert escape_attribute("\"&lt;\"") == "&quot;&amp;lt;&quot;"
+        # Nothing to escape: the same string back, not a copy.
+        text = "nothing to see here"
+        assert escape_text(text) is text
+        assert escape_attribute(text) is text
+
 class TestLeafNode(unittest.TestCase):
     def test_repr(self):
         node = LeafNode(tag = "tag", value = "val", props = {"p1": "prop 1", "p2": "prop 2"})
@@ -24,6 +55,22 @@ class TestLeafNode(unittest.TestCase):
     def test_to_html_with_props(self):
         node = LeafNode(tag = "a", value = "Click me!", props = {"href": "https://www.google.com"})
         assert node.to_html() == "<a href=\"https://www.google.com\">Click me!</a>"
+
+    def test_to_html_escapes_value(self):
+        assert LeafNode(None, "1 < 2 & 3 > 2").to_html() == "1 &lt; 2 &amp; 3 &gt; 2"
+        assert LeafNode("code", "<script>alert(1)</script>").to_html() == "<code>&lt;script&gt;alert(1)&lt;/script&gt;</code>"
+
+    def test_void_node(self):
+        node = ParentNode("p", [VoidNode("img", {"src": "/a.png", "alt": "An \"A\""}), VoidNode("br")])
+        assert node.to_html() == "<p><img src=\"/a.png\" alt=\"An &quot;A&quot;\"><br></p>"
+
+    def test_raw_node_is_not_escaped(self):
+        assert RawNode("<p>a &amp; b</p>").to_html() == "<p>a &amp; b</p>"
+
+    def test_markdown_is_escaped(self):
+        html = markdown_to_html_node("```\nif a < b && c:\n```\n\nFish & <chips>").to_html()
+        assert "if a &lt; b &amp;&amp; c:" in html
+        assert "Fish &amp; &lt;chips&gt;" in html
     
 class TestParentNode(unittest.TestCase):
     def test_repr(self):
@@ -47,3 +94,25 @@ class TestParentNode(unittest.TestCase):
         parent1 = ParentNode("i", [leaf])
         parent2 = ParentNode("u", [parent1])
         assert parent2.to_html() == "<u><i><b>Bold text</b></i></u>"
+
+    def test_iter_html_matches_to_html(self):
+        node = ParentNode("ol", [ParentNode("li", [LeafNode(None, "one")]), ParentNode("ol", [ParentNode("li", [LeafNode("b", "two")])], {"style": "x"})])
+        assert "".join(node.iter_html()) == "<ol><li>one</li><ol style=\"x\"><li><b>two</b></li></ol></ol>"
+
+    def test_lazy_children(self):
+        node = ParentNode("div", map(lambda s : LeafNode("p", s), ["a", "b"]))
+        assert node.to_html() == "<div><p>a</p><p>b</p></div>"
+
+    def test_write_html(self):
+        node = ParentNode("div", [LeafNode("p", str(idx)) for idx in range(100)])
+        stream = io.StringIO()
+        node.write_html(stream, buffer_size = 64)
+        assert stream.getvalue() == node.to_html()
+
+    def test_deep_nesting(self):
+        # Way past the recursion limit.
+        node = LeafNode(None, "deep")
+        for _ in range(5000):
+            node = ParentNode("b", [node])
+        html = node.to_html()
+        assert html == "<b>" * 5000 + "deep" + "</b>" * 5000
@@ -0,0 +1,112 @@
+import unittest
+import os, io, contextlib, struct
+
+from images import ImageIndex, image_size, process_images, Image
+from htmlnode import ParentNode, VoidNode
+from markdown_to_nodes import markdown_to_html_node
+from blockcache import BlockCache
+from main import build
+from test_support import TempDir
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0) + b"\0" * 4
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + b"\0" * 9
+    frame = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + frame + b"\xff\xd9"
+
+def gif(width, height):
+    return b"GIF89a" + struct.pack("<HH", width, height) + b"\0" * 8
+
+def webp(width, height):
+    chunk = b"VP8X" + struct.pack("<I", 10) + b"\0" * 4 + (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little")
+    return b"RIFF" + struct.pack("<I", 4 + len(chunk)) + b"WEBP" + chunk
+
+
+class TestImageSize(TempDir, unittest.TestCase):
+    def size_of(self, name, data):
+        path = self.path(name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return image_size(path)
+
+    def test_headers(self):
+        assert self.size_of("a.png", png(640, 480)) == (640, 480)
+        assert self.size_of("a.jpg", jpeg(1024, 768)) == (1024, 768)
+        assert self.size_of("a.gif", gif(16, 9)) == (16, 9)
+        assert self.size_of("a.webp", webp(3000, 2000)) == (3000, 2000)
+        assert self.size_of("a.txt", b"not an image at all") == None
+        assert self.size_of("b.jpg", b"\xff\xd8\xff\xe0\x00") == None
+
+
+class TestImageIndex(unittest.TestCase):
+    def setUp(self):
+        record = {"hash": "h", "url": "images/logo.png", "width": 1200, "height": 600, "variants": [[480, "images/logo-480w.png"]]}
+        self.index = ImageIndex({"static/images/logo.png": record}, "/site/")
+
+    def test_annotate(self):
+        node = ParentNode("p", [VoidNode("img", {"src": "/site/images/logo.png", "alt": "Logo"}), VoidNode("img", {"src": "https://example.com/x.png", "alt": ""})])
+        self.index.annotate(node)
+        assert node.to_html() == ('<p><img src="/site/images/logo.png" alt="Logo" width="1200" height="600" '
+                                  'srcset="/site/images/logo-480w.png 480w, /site/images/logo.png 1200w" sizes="(max-width: 1200px) 100vw, 1200px" loading="lazy">'
+                                  '<img src="https://example.com/x.png" alt=""></p>')
+
+    def test_cached_blocks_follow_the_images(self):
+        md = "A ![Logo](/images/logo.png) here"
+        cache = BlockCache()
+        first = markdown_to_html_node(md, "/site/", cache, images = self.index).to_html()
+        assert 'width="1200"' in first
+        assert markdown_to_html_node(md, "/site/", cache, images = self.index).to_html() == first
+        self.index = ImageIndex({"static/images/logo.png": {"hash": "i", "url": "images/logo.png", "width": 10, "height": 5, "variants": []}}, "/site/")
+        assert 'width="10" height="5" loading="lazy"' in markdown_to_html_node(md, "/site/", cache, images = self.index).to_html()
+        assert cache.hits == 1
+
+
+class TestImageBuild(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.path("content"))
+        os.makedirs(self.path("static", "images"))
+        self.write("template.html", "{{ Title }}|{{ Content }}")
+        self.write(self.path("content", "index.md"), "# Home\n\n![A \"logo\"](/images/logo.png)")
+        self.write_image(png(2000, 1000))
+
+    def write_image(self, data):
+        with open(self.path("static", "images", "logo.png"), "wb") as f:
+            f.write(data)
+
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return build("/", self.path("static"), self.path("content"), self.path("template.html"), self.path("docs"), self.path(".cache", "manifest.json"))
+
+    @unittest.skipIf(Image != None, "this is what happens without Pillow")
+    def test_sizes_without_pillow(self):
+        self.build()
+        assert self.read("docs", "index.html") == 'Home|<div><h1 id="home">Home</h1><p><img src="/images/logo.png" alt="A &quot;logo&quot;" width="2000" height="1000" loading="lazy"></p></div>'
+        # A new version of the image means new sizes on the pages that use it.
+        self.write_image(png(300, 200))
+        self.build()
+        assert 'width="300" height="200"' in self.read("docs", "index.html")
+
+    @unittest.skipIf(Image == None, "needs Pillow")
+    def test_variants(self):
+        Image.new("RGB", (2000, 1000)).save(self.path("static", "images", "logo.png"))
+        manifest = self.build()
+        with Image.open(self.path("docs", "images", "logo-960w.png")) as variant:
+            assert variant.size == (960, 480)
+        assert 'srcset="/images/logo-480w.png 480w, /images/logo-960w.png 960w, /images/logo-1440w.png 1440w, /images/logo.png 2000w"' in self.read("docs", "index.html")
+        assert len(manifest.images) == 3
+        # Unchanged images come out of the cache rather than being resized again.
+        os.remove(self.path("docs", "images", "logo-480w.png"))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            build("/", self.path("static"), self.path("content"), self.path("template.html"), self.path("docs"), self.path(".cache", "manifest.json"))
+        assert "resized" not in output.getvalue()
+        assert os.path.isfile(self.path("docs", "images", "logo-480w.png"))
+        # And variants of images that are gone go too.
+        os.remove(self.path("static", "images", "logo.png"))
+        manifest = self.build()
+        assert manifest.images == {}
+        assert not os.path.exists(self.path("docs", "images"))
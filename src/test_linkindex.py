@@ -0,0 +1,104 @@
+import unittest
+import os, tempfile, shutil, io, contextlib
+
+from linkindex import LinkIndex, PageLinks, node_refs, is_external
+from markdown_to_nodes import markdown_to_html_node
+from blockcache import BlockCache
+from main import build, links_path_for
+from test_support import TempDir
+
+
+class TestLinkIndex(unittest.TestCase):
+    def test_collects_links_images_and_anchors(self):
+        links = PageLinks()
+        md = "# Hello, World!\n\nSee [the post](/blog/post.html#intro) and ![a cat](/cat.png)"
+        markdown_to_html_node(md, "/site/", links = links).to_html()
+        assert links.links == ["/site/blog/post.html#intro"]
+        assert links.images == ["/site/cat.png"]
+        assert links.anchors == ["hello-world"]
+
+    def test_cache_hits_still_collect(self):
+        md = "## Intro\n\n[home](/)"
+        cache = BlockCache()
+        first, second = PageLinks(), PageLinks()
+        markdown_to_html_node(md, "/", cache, first).to_html()
+        markdown_to_html_node(md, "/", cache, second).to_html()
+        assert cache.hits == 2
+        assert first.to_dict() == second.to_dict() == {"links": ["/"], "images": [], "anchors": ["intro"]}
+
+    def test_node_refs(self):
+        node = markdown_to_html_node("- [a](a.html)\n- ![b](b.png)")
+        node.children = list(node.children)
+        assert node_refs(node) == [("link", "a.html"), ("image", "b.png")]
+
+    def test_is_external(self):
+        assert is_external("https://example.com/")
+        assert is_external("mailto:someone@example.com")
+        assert is_external("//cdn.example.com/x.js")
+        assert not is_external("/blog/")
+        assert not is_external("post.html#a:b")
+
+    def test_check(self):
+        index = LinkIndex()
+        index.set_page("index.html", PageLinks(["/site/blog/", "/site/blog/post#intro", "/site/missing.html", "https://example.com/"], ["/site/cat.png"], []))
+        index.set_page("blog/index.html", PageLinks(["post.html#nope", "../index.html", "#top", "../../escape.html", "/elsewhere/"], [], ["top"]))
+        index.set_page("blog/post.html", PageLinks([], ["../dog.png"], ["intro"]))
+        files = {"index.html", "blog/index.html", "blog/post.html", "cat.png"}
+        broken = [(link.page, link.kind, link.url) for link in index.check("/site/", files)]
+        assert broken == [
+            ("blog/index.html", "link", "post.html#nope"),
+            ("blog/index.html", "link", "../../escape.html"),
+            ("blog/index.html", "link", "/elsewhere/"),
+            ("blog/post.html", "image", "../dog.png"),
+            ("index.html", "link", "/site/missing.html"),
+        ]
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "links.json")
+            index = LinkIndex()
+            index.set_page("index.html", PageLinks(["/a/"], ["/b.png"], ["c"]))
+            index.save(path)
+            assert LinkIndex.load(path).pages["index.html"].to_dict() == {"links": ["/a/"], "images": ["/b.png"], "anchors": ["c"]}
+            assert LinkIndex.load(os.path.join(directory, "missing.json")).pages == {}
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestBuildLinkCheck(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = os.path.join(self.root, "template.html")
+        self.docs = os.path.join(self.root, "docs")
+        self.manifest = os.path.join(self.root, ".cache", "manifest.json")
+        os.makedirs(self.content)
+        os.makedirs(self.static)
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/post.html#details) ![logo](/logo.png)")
+        self.write(os.path.join(self.content, "post.md"), "# Post\n\n## Details")
+        self.write(os.path.join(self.static, "logo.png"), "png")
+
+    def build(self, jobs = 1):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            build("/", self.static, self.content, self.template, self.docs, self.manifest, jobs = jobs, cache = BlockCache())
+        return [line for line in output.getvalue().split("\n") if "broken" in line]
+
+    def test_clean_site(self):
+        assert self.build() == []
+        assert os.path.isfile(links_path_for(self.manifest))
+
+    def test_skipped_pages_are_still_checked(self):
+        self.build()
+        # index.md doesn't get re-rendered, but its link to #details breaks.
+        self.write(os.path.join(self.content, "post.md"), "# Post\n\n## Summary")
+        assert self.build() == ["index.html: broken link /post.html#details (no heading #details in post.html)", "Found 1 broken link(s)"]
+        os.remove(os.path.join(self.static, "logo.png"))
+        assert len(self.build()) == 3
+
+    def test_parallel_build_collects_links(self):
+        os.remove(os.path.join(self.content, "post.md"))
+        assert self.build(jobs = 2)[0] == "index.html: broken link /post.html#details (no such file)"
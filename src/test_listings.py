@@ -0,0 +1,114 @@
+import unittest
+import os, io, contextlib, time
+
+from main import build
+from listings import paginate, sections, slug
+from test_support import TempDir
+
+
+def post(url, date):
+    return {"url": url, "date": date, "title": url, "tags": [], "summary": None}
+
+class TestPagination(unittest.TestCase):
+    def test_pages_are_numbered_from_the_oldest(self):
+        posts = [post(f"blog/{idx}.html", f"2024-01-{idx + 1:02d}") for idx in range(5)]
+        pages = paginate(posts, "blog/archive/", "Blog", 2)
+        assert [(url, [entry["url"] for entry in chunk], newer, older) for url, title, chunk, newer, older in pages] == [
+            ("blog/archive/1.html", ["blog/0.html", "blog/1.html"], "blog/archive/2.html", None),
+            ("blog/archive/2.html", ["blog/2.html", "blog/3.html"], "blog/archive/3.html", "blog/archive/1.html"),
+            ("blog/archive/3.html", ["blog/4.html"], None, "blog/archive/2.html"),
+            ("blog/archive/index.html", ["blog/4.html"], None, "blog/archive/2.html"),
+        ]
+        # Another post only changes the last page.
+        more = paginate(posts + [post("blog/5.html", "2024-01-09")], "blog/archive/", "Blog", 2)
+        assert more[:2] == pages[:2]
+
+    def test_sections(self):
+        posts = [post("index.html", "2024-01-01"), post("blog/a.html", "2024-01-02"), post("blog/2024/b.html", "2024-01-03")]
+        found = sections(posts)
+        assert {directory: len(entries) for directory, entries in found.items()} == {"": 3, "blog": 2, "blog/2024": 1}
+
+    def test_slug(self):
+        assert slug("Static Sites") == "static-sites"
+        assert slug("C++") == "c"
+        assert slug("Café") == "café"
+        assert len(set([slug("日本語"), slug("中文"), slug("Ελληνικά")])) == 3
+
+
+class TestListingBuild(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.docs = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest = os.path.join(self.root, ".cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(os.path.join(self.root, "static"))
+        self.write(self.template, "<title>{{ Title }}</title><body>{{ Content }}</body>")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nPosts")
+        for idx in range(5):
+            self.add_post(idx)
+
+    def add_post(self, idx, tags = "notes"):
+        self.write(os.path.join(self.content, "blog", f"post{idx}.md"), f"---\ntitle: Post & {idx}\ndate: 2024-01-{idx + 1:02d}\ntags: {tags}\n---\n# Post {idx}\n\nText")
+
+    def build(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return build("/", os.path.join(self.root, "static"), self.content, self.template, self.docs, self.manifest, listing_size = 2, **options)
+
+    def outputs(self):
+        found = {}
+        for directory, dirs, files in os.walk(self.docs):
+            for name in files:
+                path = os.path.join(directory, name)
+                found[os.path.relpath(path, self.docs)] = os.stat(path).st_mtime_ns
+        return found
+
+    def test_listings_and_feeds(self):
+        manifest = self.build()
+        archive = self.read(os.path.join(self.docs, "blog", "archive", "index.html"))
+        assert archive.startswith("<title>Blog: archive (page 3)</title>")
+        assert "<a href=\"/blog/post4.html\">Post &amp; 4</a>" in archive
+        assert "<a href=\"/blog/archive/2.html\" rel=\"next\">Older</a>" in archive
+        assert os.path.isfile(os.path.join(self.docs, "archive", "1.html"))
+        assert os.path.isfile(os.path.join(self.docs, "tags", "notes", "index.html"))
+        assert "<title>Post &amp; 4</title>" in self.read(os.path.join(self.docs, "blog", "atom.xml"))
+        assert "<pubDate>Fri, 05 Jan 2024 00:00:00 +0000</pubDate>" in self.read(os.path.join(self.docs, "blog", "rss.xml"))
+        # The page itself doesn't show its front matter, and has its title.
+        page = self.read(os.path.join(self.docs, "blog", "post4.html"))
+        assert page == "<title>Post &amp; 4</title><body><div><h1 id=\"post-4\">Post 4</h1><p>Text</p></div></body>"
+        assert os.path.join(self.docs, "blog", "rss.xml") in manifest.listings
+
+    def test_new_post_only_rewrites_affected_listings(self):
+        self.build()
+        before = self.outputs()
+        time.sleep(0.01)
+        self.add_post(5, "other")
+        self.build()
+        after = self.outputs()
+        changed = set(path for path in after if before.get(path) != after[path])
+        expected = {"blog/post5.html", "blog/archive/3.html", "blog/archive/index.html", "blog/atom.xml", "blog/rss.xml",
+                    "archive/3.html", "archive/index.html", "atom.xml", "rss.xml",
+                    "tags/index.html", "tags/other/1.html", "tags/other/index.html"}
+        assert changed == set(os.path.join(*path.split("/")) for path in expected)
+
+    def test_non_ascii_tags_get_their_own_pages(self):
+        self.add_post(0, "日本語")
+        self.add_post(1, "Ελληνικά")
+        self.build()
+        japanese = self.read(os.path.join(self.docs, "tags", "日本語", "index.html"))
+        greek = self.read(os.path.join(self.docs, "tags", "ελληνικά", "index.html"))
+        assert "/blog/post0.html" in japanese and "/blog/post1.html" not in japanese
+        assert "/blog/post1.html" in greek and "/blog/post0.html" not in greek
+        assert not os.path.exists(os.path.join(self.docs, "tags", "-"))
+
+    def test_removed_posts_take_their_listings_with_them(self):
+        self.build()
+        for idx in range(5):
+            os.remove(os.path.join(self.content, "blog", f"post{idx}.md"))
+        manifest = self.build()
+        assert manifest.listings == {}
+        assert not os.path.exists(os.path.join(self.docs, "blog", "archive"))
+        assert not os.path.exists(os.path.join(self.docs, "tags"))
+        assert not os.path.exists(os.path.join(self.docs, "atom.xml"))
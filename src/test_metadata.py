@@ -0,0 +1,69 @@
+import unittest
+import io, mmap, os, tempfile
+
+from metadata import MetadataIndex, read_metadata, skip_front_matter
+from main import extract_title
+from test_support import TempDir
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_read_metadata(self):
+        md = "---\ntitle: Hello\ndate: 2024-03-01\ntags: [python, Web ]\nsummary: Short: and sweet\n---\n# Heading\n\nText"
+        assert read_metadata(md) == {"title": "Hello", "date": "2024-03-01T00:00:00", "tags": ["python", "Web"], "summary": "Short: and sweet"}
+        assert read_metadata(io.StringIO(md)) == read_metadata(md)
+        assert extract_title(md) == "Hello"
+
+    def test_title_falls_back_to_h1(self):
+        assert read_metadata("---\ndate: 2024-03-01\n---\n\n# Heading\n\nText")["title"] == "Heading"
+        assert read_metadata("# Just a page\n\nText") == {"title": "Just a page", "date": None, "tags": [], "summary": None}
+        assert read_metadata("No title here")["title"] == None
+
+    def test_unclosed_front_matter_is_just_markdown(self):
+        md = "---\n# Heading\n\nText"
+        assert read_metadata(md)["title"] == "Heading"
+        assert skip_front_matter(md) == md
+
+    def test_bad_date(self):
+        with self.assertRaises(Exception):
+            read_metadata("---\ndate: last tuesday\n---\n# Heading")
+
+    def test_skip_front_matter(self):
+        md = "---\ntitle: Hello\n---\n# Heading\n\nText"
+        assert skip_front_matter(md) == "# Heading\n\nText"
+        f = io.StringIO(md)
+        assert skip_front_matter(f).read() == "# Heading\n\nText"
+        f = io.StringIO("# Heading\n\nText")
+        assert skip_front_matter(f).read() == "# Heading\n\nText"
+
+    def test_skip_front_matter_in_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b"---\ntitle: Hello\n---\n# Heading\n\nText")
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mapped:
+                assert skip_front_matter(mapped).read() == b"# Heading\n\nText"
+                mapped.seek(0)
+                assert read_metadata(mapped)["title"] == "Hello"
+        f = io.BytesIO(b"# Heading\n\nText")
+        assert skip_front_matter(f).read() == b"# Heading\n\nText"
+
+
+class TestMetadataIndex(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.root, "post.md")
+        with open(self.source, "w") as f:
+            f.write("---\ndate: 2024-03-01\n---\n# Post")
+
+    def test_only_changed_sources_are_read(self):
+        index = MetadataIndex()
+        pages = {self.source: {"hash": "one", "output": os.path.join(self.root, "docs", "post.html")}}
+        assert index.update(pages, os.path.join(self.root, "docs")) == 1
+        assert index.pages[self.source]["url"] == "post.html"
+        path = os.path.join(self.root, "metadata.json")
+        index.save(path)
+        index = MetadataIndex.load(path)
+        assert index.update(pages, os.path.join(self.root, "docs")) == 0
+        pages[self.source]["hash"] = "two"
+        assert index.update(pages, os.path.join(self.root, "docs")) == 1
+        assert index.update({}, os.path.join(self.root, "docs")) == 0
+        assert index.pages == {}
@@ -0,0 +1,18 @@
+import unittest
+
+from patterns import BLOCK_LINE, HEADING_LINE, QUOTE_LINE, LIST_LINE, HEADING_KIND, QUOTE_KIND
+
+
+class TestPatterns(unittest.TestCase):
+    def test_block_line_agrees_with_separate_patterns(self):
+        lines = ["# Heading", "###### Six", "####### Seven", "#NoSpace", "> quote", "   > indented quote", ">",
+                 "- item", "* item", "  - nested", "1. one", "a) alpha", "IV. roman", ". bare", "-no space",
+                 "plain text", "", "   ", "#. odd", "> - quoted list"]
+        for line in lines:
+            kind = BLOCK_LINE.match(line)
+            heading = kind != None and kind.lastindex == HEADING_KIND
+            quote = kind != None and kind.lastindex == QUOTE_KIND
+            listed = kind != None and kind.lastindex == None
+            assert heading == bool(HEADING_LINE.match(line)), line
+            assert quote == bool(QUOTE_LINE.match(line)), line
+            assert listed == bool(LIST_LINE.match(line)), line
@@ -0,0 +1,47 @@
+import unittest
+import os, threading, time
+
+from pipeline import run_pipeline, atomic_open, write_atomic, make_directories
+from test_support import TempDir
+
+
+class TestPipeline(TempDir, unittest.TestCase):
+    def test_renders_in_order(self):
+        rendered = []
+        written = {}
+        def read(item):
+            # Later items finish reading first.
+            time.sleep(0.001 * (10 - item))
+            return item * 2
+        def render(item, data):
+            assert threading.current_thread() is threading.main_thread()
+            rendered.append(item)
+            return data + 1
+        def write(item, output):
+            written[item] = output
+        run_pipeline(range(10), read, render, write, io_threads = 3, queue_size = 4)
+        assert rendered == list(range(10))
+        assert written == {item: item * 2 + 1 for item in range(10)}
+
+    def test_errors_come_through(self):
+        def read(item):
+            if item == 3:
+                raise ValueError("bad read")
+            return item
+        with self.assertRaises(ValueError):
+            run_pipeline(range(5), read, lambda item, data : data, lambda item, output : None)
+
+    def test_atomic_open(self):
+        path = os.path.join(self.root, "page.html")
+        write_atomic(path, "old")
+        with self.assertRaises(RuntimeError):
+            with atomic_open(path) as f:
+                f.write("half a pa")
+                raise RuntimeError()
+        with open(path) as f:
+            assert f.read() == "old"
+        assert os.listdir(self.root) == ["page.html"]
+
+    def test_make_directories(self):
+        make_directories([os.path.join(self.root, "a", "b", "x.html"), os.path.join(self.root, "a", "y.html"), "z.html"])
+        assert os.path.isdir(os.path.join(self.root, "a", "b"))
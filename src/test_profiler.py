@@ -0,0 +1,38 @@
+import unittest
+import time
+
+from profiler import Profiler, phase
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phases_and_pages(self):
+        profiler = Profiler()
+        profiler.start()
+        with profiler.phase("read", "a.md"):
+            pass
+        with profiler.phase("read", "b.md"):
+            time.sleep(0.01)
+        with profiler.phase("parse", "b.md"):
+            data = [str(idx) for idx in range(1000)]
+        with profiler.phase("static"):
+            pass
+        profiler.stop()
+        totals = profiler.phase_totals()
+        assert totals["read"][2] == 2
+        assert totals["parse"][1] > 0
+        assert [page for page, phases in profiler.slowest_pages(1)] == ["b.md"]
+        assert set(profiler.to_dict()["pages"]) == {"a.md", "b.md"}
+        assert "Slowest 2 pages:" in profiler.summary()
+
+    def test_no_profiler(self):
+        with phase(None, "read"):
+            pass
+
+    def test_records_move_between_profilers(self):
+        worker = Profiler(trace_allocations = False)
+        with worker.phase("write", "a.md"):
+            pass
+        parent = Profiler(trace_allocations = False)
+        parent.add_records(worker.take_records())
+        assert worker.records == []
+        assert parent.page_totals().keys() == {"a.md"}
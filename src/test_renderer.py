@@ -0,0 +1,63 @@
+import unittest
+import os, io, json, contextlib
+
+from renderer import Renderer
+from test_support import TempDir
+
+
+class TestRenderer(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.path("content", "blog"))
+        os.makedirs(self.path("static"))
+        self.write(self.path("template.html"), "<title>{{ Title }}</title>{{ Content }}")
+        self.write(self.path("content", "blog", "_template.html"), "<article>{{ Content }}</article>")
+        self.write(self.path("content", "blog", "post.md"), "# Post\n\n[home](/)")
+        self.write(self.path("content", "index.md"), "# Home")
+        self.renderer = Renderer("/site/", self.path("template.html"), self.path("content"), self.path("static"), self.path("docs"), self.path(".cache", "manifest.json"))
+
+    def test_render_strings(self):
+        assert self.renderer.render_markdown("Some *text* and a [link](/x)") == "<div><p>Some <i>text</i> and a <a href=\"/site/x\">link</a></p></div>"
+        assert self.renderer.render_page("# Hi\n\nthere") == "<title>Hi</title><div><h1 id=\"hi\">Hi</h1><p>there</p></div>"
+        assert self.renderer.render_page("no heading", title = "Given") == "<title>Given</title><div><p>no heading</p></div>"
+        # Blocks repeated across renders come out of the cache.
+        hits = self.renderer.cache.hits
+        self.renderer.render_markdown("Some *text* and a [link](/x)")
+        assert self.renderer.cache.hits == hits + 1
+
+    def test_template_edits_are_picked_up(self):
+        assert self.renderer.render_page("# A").startswith("<title>")
+        self.write(self.path("template.html"), "<h>{{ Title }}</h>{{ Content }}")
+        assert self.renderer.render_page("# A").startswith("<h>A</h>")
+
+    def test_render_file(self):
+        assert self.renderer.render_file(self.path("content", "blog", "post.md")).startswith("<article>")
+        output = self.path("elsewhere", "post.html")
+        assert self.renderer.render_file(self.path("content", "index.md"), output) == None
+        with open(output) as f:
+            assert f.read().startswith("<title>Home</title>")
+
+    def test_batch(self):
+        requests = [
+            {"id": 1, "markdown": "**hi**"},
+            {"id": "two", "page": "# T"},
+            {"id": 3, "file": self.path("content", "blog", "post.md")},
+            {"id": 4, "page": "no heading"},
+            {"id": 5},
+            {"id": 6, "build": {}},
+        ]
+        requests = io.StringIO("\n".join(json.dumps(request) for request in requests) + "\n\nnot json\n[1]\n")
+        responses = io.StringIO()
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.renderer.serve_batch(requests, responses)
+        responses = [json.loads(line) for line in responses.getvalue().splitlines()]
+        assert [response["id"] for response in responses] == [1, "two", 3, 4, 5, 6, None, None]
+        assert responses[0] == {"id": 1, "html": "<div><p><b>hi</b></p></div>"}
+        assert responses[1]["html"].startswith("<title>T</title>")
+        assert responses[2]["html"].startswith("<article>")
+        assert responses[2]["links"]["links"] == ["/site/"]
+        assert responses[3]["error"] == "No header found!"
+        assert "error" in responses[4]
+        assert responses[5] == {"id": 6, "pages": 2}
+        assert os.path.isfile(self.path("docs", "blog", "post.html"))
+        assert responses[6]["error"].startswith("Bad request") and responses[7]["error"].startswith("Bad request")
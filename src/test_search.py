@@ -0,0 +1,130 @@
+import unittest
+import os, shutil, io, contextlib, json
+
+from search import tokenize, node_text, SearchIndexer, PageTermStore, PageTextRecorder
+from markdown_to_nodes import markdown_to_html_node
+from blockcache import BlockCache
+from main import build, generate_pages
+from test_support import TempDir
+
+
+def read_index(directory):
+    with open(os.path.join(directory, "index.json")) as f:
+        index = json.load(f)
+    terms = {}
+    for first, name in index["shards"]:
+        with open(os.path.join(directory, name)) as f:
+            terms.update(json.load(f))
+    return index, terms
+
+
+class TestSearch(TempDir, unittest.TestCase):
+    def test_tokenize(self):
+        assert tokenize(["The cat, the hat", "THE end"]) == {"the": [0, 2, 2], "cat": [1], "hat": [3], "end": [5]}
+
+    def test_collects_block_text(self):
+        texts = []
+        md = "# A **bold** title\n\nSome [linked](/x/) words\n\n```\ncode here\n```"
+        markdown_to_html_node(md, texts = texts).to_html()
+        # Leaves are joined with spaces, so that list items and the like don't run together.
+        assert texts == ["A  bold  title", "Some  linked  words", "code here\n"]
+
+    def test_cache_hits_still_collect(self):
+        cache = BlockCache()
+        first, second = [], []
+        markdown_to_html_node("Some *text*", "/", cache, texts = first).to_html()
+        markdown_to_html_node("Some *text*", "/", cache, texts = second).to_html()
+        assert cache.hits == 1
+        assert first == second == ["Some  text"]
+
+    def test_node_text(self):
+        node = markdown_to_html_node("- one\n- two")
+        node.children = list(node.children)
+        assert node_text(node) == "one two"
+
+    def test_spilled_index_matches_in_memory(self):
+        pages = [(f"/page{i}.html", f"Page {i}", tokenize([f"word{i % 7} common text number{i}"])) for i in range(50)]
+        written = []
+        for name, max_postings in (("memory", 1 << 20), ("spilled", 10)):
+            indexer = SearchIndexer(os.path.join(self.root, name + "-work"), max_postings)
+            for url, title, terms in pages:
+                indexer.add_page(url, title, terms)
+            if max_postings == 10:
+                assert len(indexer.runs) > 1
+            indexer.write(os.path.join(self.root, name), shard_bytes = 256)
+            written.append(read_index(os.path.join(self.root, name)))
+            assert not os.path.exists(os.path.join(self.root, name + "-work"))
+        assert written[0][1] == written[1][1]
+        index, terms = written[0]
+        assert len(index["shards"]) > 1
+        assert terms["common"] == [[i, 1] for i in range(50)]
+        # Shards are in term order, and each one starts where it says it does.
+        firsts = [first for first, name in index["shards"]]
+        assert firsts == sorted(firsts)
+
+    def test_term_store(self):
+        store = PageTermStore(os.path.join(self.root, "pages"))
+        store.put("a.html", "hash", "A", {"x": [0]})
+        assert store.get("a.html", "hash") == ("A", {"x": [0]})
+        assert store.get("a.html", "other hash") == None
+        store.retain([])
+        assert store.get("a.html", "hash") == None
+
+
+class TestBuildSearch(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = os.path.join(self.root, "template.html")
+        self.docs = os.path.join(self.root, "docs")
+        self.manifest = os.path.join(self.root, ".cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nA post about home")
+
+    def build(self, search = True, jobs = 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/site/", self.static, self.content, self.template, self.docs, self.manifest, jobs = jobs, cache = BlockCache(), search = search)
+        if search:
+            return read_index(os.path.join(self.docs, "search"))
+
+    def test_index(self):
+        index, terms = self.build()
+        assert index["pages"] == [["/site/blog/post.html", "Post"], ["/site/index.html", "Home"]]
+        assert terms["home"] == [[0, 4], [1, 0, 2]]
+
+    def test_incremental_build_keeps_unchanged_pages(self):
+        self.build()
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nNothing to see")
+        index, terms = self.build()
+        assert terms["home"] == [[1, 0, 2]]
+        assert terms["nothing"] == [[0, 1]]
+
+    def test_turning_search_on_later(self):
+        self.build(search = False)
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nSomething else")
+        self.build(search = False)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome back")
+        index, terms = self.build()
+        assert terms["something"] == [[0, 1]]
+        assert terms["back"] == [[1, 2]]
+
+    def test_parallel_build_matches(self):
+        serial = self.build()
+        shutil.rmtree(self.docs)
+        assert self.build(jobs = 2) == serial
+
+    def test_pages_are_tokenized_as_they_render(self):
+        # Serially, pipelined and across processes, the terms end up in the
+        # store without the build keeping any page's text.
+        pages = [(os.path.join(self.content, "index.md"), os.path.join(self.docs, "index.html")), (os.path.join(self.content, "blog", "post.md"), os.path.join(self.docs, "blog", "post.html"))]
+        for jobs, io_threads in ((1, 0), (1, 2), (2, 2)):
+            store = PageTermStore(os.path.join(self.root, f"pages{jobs}{io_threads}"))
+            recorder = PageTextRecorder(store, self.docs, {source: "hash" for source, target in pages})
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages(pages, self.template, "/", jobs, io_threads = io_threads, search = recorder)
+            assert store.get("blog/post.html", "hash") == ("Post", tokenize(["Post", "A post about home"]))
+            assert store.get("index.html", "hash") == ("Home", tokenize(["Home", "Welcome home"]))
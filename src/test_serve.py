@@ -0,0 +1,88 @@
+import unittest
+import os, shutil, io, contextlib
+
+from serve import Site, PollingWatcher, make_watcher
+from test_support import TempDir
+
+
+class TestSite(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.path("content", "blog"))
+        os.makedirs(self.path("static"))
+        self.write(self.path("template.html"), "{{ Title }}|{{ Content }}")
+        self.write(self.path("content", "index.md"), "# Home")
+        self.write(self.path("content", "blog", "post.md"), "# Post")
+        self.write(self.path("static", "index.css"), "body {}")
+        self.site = Site("/", self.path("static"), self.path("content"), self.path("template.html"), self.path("docs"), self.path(".cache", "manifest.json"))
+        self.quietly(self.site.build)
+
+    def quietly(self, function, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args)
+
+    def test_rebuilds_only_the_changed_page(self):
+        self.write(self.path("docs", "index.html"), "sentinel")
+        self.write(self.path("content", "blog", "post.md"), "# Edited")
+        assert self.quietly(self.site.rebuild, {self.path("content", "blog", "post.md")}) == 1
+        assert self.read(self.path("docs", "blog", "post.html")) == "Edited|<div><h1 id=\"edited\">Edited</h1></div>"
+        assert self.read(self.path("docs", "index.html")) == "sentinel"
+
+    def test_dated_post_updates_listings(self):
+        self.write(self.path("content", "blog", "post.md"), "---\ndate: 2024-05-01\n---\n# Post")
+        # The page, plus the archive (as 1.html and index.html) and both feeds
+        # for blog/ and for the site.
+        assert self.quietly(self.site.rebuild, {self.path("content", "blog", "post.md")}) == 9
+        assert "/blog/post.html" in self.read(self.path("docs", "blog", "archive", "index.html"))
+        self.write(self.path("content", "blog", "post.md"), "# Post")
+        self.quietly(self.site.rebuild, {self.path("content", "blog", "post.md")})
+        assert not os.path.exists(self.path("docs", "blog", "archive"))
+        assert self.site.manifest.listings == {}
+
+    def test_new_and_deleted_files(self):
+        os.makedirs(self.path("content", "new"))
+        self.write(self.path("content", "new", "page.md"), "# New")
+        os.remove(self.path("static", "index.css"))
+        shutil.rmtree(self.path("content", "blog"))
+        changed = {self.path("content", "new"), self.path("static", "index.css"), self.path("content", "blog")}
+        self.quietly(self.site.rebuild, changed)
+        assert os.path.isfile(self.path("docs", "new", "page.html"))
+        assert not os.path.exists(self.path("docs", "index.css"))
+        assert not os.path.exists(self.path("docs", "blog"))
+        assert set(self.site.manifest.pages) == {self.path("content", "index.md"), self.path("content", "new", "page.md")}
+
+    def test_template_change_rebuilds_everything(self):
+        self.write(self.path("template.html"), "<{{ Title }}>")
+        assert self.quietly(self.site.rebuild, {self.path("template.html")}) == 2
+        assert self.read(self.path("docs", "index.html")) == "<Home>"
+
+    def test_partial_change_rebuilds_its_pages(self):
+        os.makedirs(self.path("content", "blog", "partials"))
+        self.write(self.path("content", "blog", "partials", "footer.html"), "old")
+        self.write(self.path("content", "blog", "_template.html"), "{{ Title }}|{{> footer }}")
+        self.quietly(self.site.rebuild, {self.path("content", "blog", "_template.html")})
+        assert self.read(self.path("docs", "blog", "post.html")) == "Post|old"
+        self.write(self.path("docs", "index.html"), "sentinel")
+        self.write(self.path("content", "blog", "partials", "footer.html"), "newer")
+        self.quietly(self.site.rebuild, {self.path("content", "blog", "partials", "footer.html")})
+        assert self.read(self.path("docs", "blog", "post.html")) == "Post|newer"
+        assert self.read(self.path("docs", "index.html")) == "sentinel"
+
+    def test_static_change_rebuilds_pages_using_it(self):
+        self.write(self.path("static", "logo.png"), "one")
+        self.write(self.path("content", "blog", "post.md"), "# Post\n\n![logo](/logo.png)")
+        self.quietly(self.site.rebuild, {self.path("static", "logo.png"), self.path("content", "blog", "post.md")})
+        self.write(self.path("docs", "blog", "post.html"), "sentinel")
+        self.write(self.path("docs", "index.html"), "sentinel")
+        self.write(self.path("static", "logo.png"), "two")
+        self.quietly(self.site.rebuild, {self.path("static", "logo.png")})
+        assert self.read(self.path("docs", "blog", "post.html")) != "sentinel"
+        assert self.read(self.path("docs", "index.html")) == "sentinel"
+        assert self.read(self.path("docs", "logo.png")) == "two"
+
+    def test_watchers(self):
+        for watcher in (PollingWatcher([self.path("content")], [self.path("template.html")], interval = 0.01), make_watcher([self.path("content")], [self.path("template.html")])):
+            self.write(self.path("content", "index.md"), "# Changed " + type(watcher).__name__)
+            changed = watcher.wait(2)
+            assert self.path("content", "index.md") in changed
+            assert watcher.wait(0.05) == set()
@@ -0,0 +1,138 @@
+import unittest
+import argparse, os, tempfile, shutil, io, contextlib, json
+
+from main import build
+from merge import merge
+from shard import parse_shard, partition, shard_pages, shard_paths, load_costs
+from test_support import TempDir
+
+
+class TestPartition(unittest.TestCase):
+    def test_parse_shard(self):
+        assert parse_shard("2/4") == (2, 4)
+        for text in ("0/4", "5/4", "1/0", "two/four", "3"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(text)
+
+    def test_every_page_lands_on_exactly_one_shard(self):
+        pages = [(f"content/page{idx}.md", f"docs/page{idx}.html") for idx in range(200)]
+        for costs in (None, {f"content/page{idx}.md": idx % 7 + 1 for idx in range(150)}):
+            slices = [shard_pages(pages, index, 4, costs) for index in range(1, 5)]
+            assert sorted(page for pages_slice in slices for page in pages_slice) == sorted(pages)
+            assert all(pages_slice for pages_slice in slices)
+            # Same answer every time (and in every process).
+            assert slices == [shard_pages(list(reversed(pages)), index, 4, costs)[::-1] for index in range(1, 5)]
+
+    def test_hash_partition_is_stable(self):
+        keys = [f"page{idx}" for idx in range(100)]
+        before = partition(keys, 3)
+        after = partition(keys + ["new"], 3)
+        assert all(after[key] == before[key] for key in keys)
+
+    def test_cost_partition_balances(self):
+        costs = {"huge": 10.0, "a": 3.0, "b": 3.0, "c": 2.0, "d": 2.0}
+        assignment = partition(list(costs), 2, costs)
+        loads = [sum(cost for key, cost in costs.items() if assignment[key] == shard) for shard in range(2)]
+        assert sorted(loads) == [10.0, 10.0]
+
+    def test_load_costs(self):
+        directory = tempfile.mkdtemp()
+        try:
+            paths = []
+            for idx, pages in enumerate(({"content/a.md": {"parse": 1.0, "write": 0.5}}, {"content/b.md": {"parse": 2.0}})):
+                paths.append(os.path.join(directory, f"{idx}.json"))
+                with open(paths[-1], "w") as f:
+                    json.dump({"pages": pages}, f)
+            assert load_costs(paths) == {"content/a.md": 1.5, "content/b.md": 2.0}
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestShardedBuild(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.path("content", "blog"))
+        os.makedirs(self.path("static"))
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        for idx in range(12):
+            self.write(self.path("content", "blog", f"post{idx}.md"), f"# Post {idx}\n\n[next](/blog/post{(idx + 1) % 12}.html) ![logo](/logo.png)")
+        self.write(self.path("static", "logo.png"), "png")
+        self.shards = self.path("shards")
+        self.docs = self.path("docs")
+        self.manifest = self.path(".cache", "manifest.json")
+
+    def build_shard(self, index, count):
+        dest_path, manifest_path = shard_paths(self.shards, index)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.path("static"), self.path("content"), self.path("template.html"), dest_path, manifest_path, shard = (index, count))
+
+    def merge(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            merge(self.shards, self.path("content"), self.docs, self.manifest, template_path = self.path("template.html"))
+        return output.getvalue()
+
+    def read_tree(self, root):
+        files = {}
+        for directory, dirs, names in os.walk(root):
+            for name in names:
+                with open(os.path.join(directory, name)) as f:
+                    files[os.path.relpath(os.path.join(directory, name), root)] = f.read()
+        return files
+
+    def test_merge_matches_unsharded_build(self):
+        for index in range(1, 4):
+            self.build_shard(index, 3)
+        output = self.merge()
+        assert "broken" not in output
+        merged = self.read_tree(self.docs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.path("static"), self.path("content"), self.path("template.html"), self.path("single"), self.path("single-cache", "manifest.json"))
+        assert merged == self.read_tree(self.path("single"))
+        # The merged manifest is good for an ordinary incremental build.
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.path("static"), self.path("content"), self.path("template.html"), self.docs, self.manifest)
+        assert self.read_tree(self.docs) == merged
+
+    def test_merge_makes_listings(self):
+        for idx in range(12):
+            with open(self.path("content", "blog", f"post{idx}.md"), "w") as f:
+                f.write(f"---\ndate: 2024-02-{idx + 1:02d}\ntags: shard {idx % 3}\n---\n# Post {idx}")
+        for index in range(1, 3):
+            self.build_shard(index, 2)
+        assert not os.path.exists(self.path("shards", "1", "docs", "blog", "archive"))
+        self.merge()
+        merged = self.read_tree(self.docs)
+        assert os.path.join("blog", "archive", "index.html") in merged
+        with contextlib.redirect_stdout(io.StringIO()):
+            build("/", self.path("static"), self.path("content"), self.path("template.html"), self.path("single"), self.path("single-cache", "manifest.json"))
+        assert merged == self.read_tree(self.path("single"))
+
+    def test_missing_shard(self):
+        self.build_shard(1, 3)
+        self.build_shard(3, 3)
+        with self.assertRaises(Exception) as caught:
+            self.merge()
+        assert "Shard 2/3 is missing" in str(caught.exception)
+        assert not os.path.exists(self.docs)
+
+    def test_missed_and_duplicated_pages(self):
+        for index in range(1, 3):
+            self.build_shard(index, 2)
+        # A page that appeared after the shards were built, and a page that
+        # two shards both think is theirs.
+        with open(self.path("content", "late.md"), "w") as f:
+            f.write("# Late")
+        first, second = [shard_paths(self.shards, index)[1] for index in (1, 2)]
+        with open(first) as f:
+            data = json.load(f)
+        with open(second) as f:
+            other = json.load(f)
+        source, entry = sorted(other["pages"].items())[0]
+        data["pages"][source] = entry
+        with open(first, "w") as f:
+            json.dump(data, f)
+        with self.assertRaises(Exception) as caught:
+            self.merge()
+        assert "No shard built " + self.path("content", "late.md") in str(caught.exception)
+        assert source + " was built by more than one shard: [1, 2]" in str(caught.exception)
@@ -0,0 +1,56 @@
+import unittest
+import os, time
+
+from staticsync import sync_static, sync_file, scan_tree
+from test_support import TempDir
+
+
+class TestStaticSync(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.root, "static")
+        self.target = os.path.join(self.root, "docs")
+        os.makedirs(os.path.join(self.source, "images"))
+        self.write(os.path.join(self.source, "index.css"), "body {}")
+        self.write(os.path.join(self.source, "images", "a.png"), "png")
+
+    def test_scan_tree(self):
+        files = [(source, target) for source, target, stat in scan_tree(self.source, self.target)]
+        assert files == [
+            (os.path.join(self.source, "images", "a.png"), os.path.join(self.target, "images", "a.png")),
+            (os.path.join(self.source, "index.css"), os.path.join(self.target, "index.css")),
+        ]
+
+    def test_skips_unchanged(self):
+        entries, placed = sync_static(self.source, self.target, {})
+        assert placed == 2
+        css = os.path.join(self.target, "index.css")
+        assert self.read(css) == "body {}"
+        entries, placed = sync_static(self.source, self.target, entries)
+        assert placed == 0
+        # Touching a file without changing it means a hash, but no copy.
+        os.utime(os.path.join(self.source, "index.css"), ns = (time.time_ns(), time.time_ns() + 10 ** 9))
+        entries, placed = sync_static(self.source, self.target, entries)
+        assert placed == 0
+        self.write(os.path.join(self.source, "index.css"), "body { margin: 0; }")
+        entries, placed = sync_static(self.source, self.target, entries)
+        assert placed == 1
+        assert self.read(css) == "body { margin: 0; }"
+
+    def test_missing_output_is_replaced(self):
+        entries, placed = sync_static(self.source, self.target, {})
+        os.remove(os.path.join(self.target, "index.css"))
+        entries, placed = sync_static(self.source, self.target, entries)
+        assert placed == 1
+
+    def test_hardlink(self):
+        sync_static(self.source, self.target, {}, "hardlink")
+        assert os.path.samefile(os.path.join(self.source, "index.css"), os.path.join(self.target, "index.css"))
+        # Switching back to copies mustn't write through the link into static/.
+        entry, placed = sync_file(os.path.join(self.source, "index.css"), os.path.join(self.target, "index.css"), None, "copy")
+        assert placed
+        assert not os.path.samefile(os.path.join(self.source, "index.css"), os.path.join(self.target, "index.css"))
+
+    def test_reflink_falls_back_to_copy(self):
+        sync_static(self.source, self.target, {}, "reflink")
+        assert self.read(os.path.join(self.target, "images", "a.png")) == "png"
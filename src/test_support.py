@@ -0,0 +1,31 @@
+import os, tempfile, shutil
+
+# What the tests that work on real files share, instead of each one having
+# its own copy. Mix it in ahead of unittest.TestCase:
+#
+#   class TestSomething(TempDir, unittest.TestCase):
+#
+# and call super().setUp() first if you need a setUp of your own.
+
+
+class TempDir():
+    # A fresh directory, self.root, for every test, removed after it.
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, *parts):
+        # Relative to self.root; an absolute path comes back as it is.
+        return os.path.join(self.root, *parts)
+
+    def write(self, path, text):
+        path = self.path(path)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def read(self, *parts):
+        with open(self.path(*parts)) as f:
+            return f.read()
@@ -0,0 +1,64 @@
+import unittest
+import os
+
+from template import Template, load_template
+from markdown_to_nodes import markdown_to_html_node
+from test_support import TempDir
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title><article>{{ Content }}</article>")
+        assert template.render(Title = "Hi", Content = "<p>there</p>") == "<title>Hi</title><article><p>there</p></article>"
+
+    def test_repeated_placeholder(self):
+        template = Template("{{ Title }}|{{Title}}")
+        assert template.render(Title = "x") == "x|x"
+
+    def test_missing_value(self):
+        template = Template("{{ Title }}")
+        with self.assertRaises(Exception):
+            template.render()
+
+    def test_basepath_only_touches_template(self):
+        template = Template('<link href="/index.css" /><img src="/a.png" /><a href="//cdn.example.com/">{{ Content }}', "/site/")
+        assert template.render(Content = 'href="/raw') == '<link href="/site/index.css" /><img src="/site/a.png" /><a href="//cdn.example.com/">href="/raw'
+
+    def test_basepath_in_content_nodes(self):
+        html = markdown_to_html_node("A [link](/blog/) and ![pic](/img.png) and [away](https://example.com/)\n\n```\nhref=\"/code\n```", "/site/").to_html()
+        assert html == '<div><p>A <a href="/site/blog/">link</a> and <img src="/site/img.png" alt="pic"> and <a href="https://example.com/">away</a></p><pre><code>href="/code\n</code></pre></div>'
+
+
+class TestPartials(TempDir, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.root, "partials"))
+        os.makedirs(os.path.join(self.root, "blog", "partials"))
+
+    def test_nested_partials(self):
+        template = self.write("template.html", "<body>{{> nav }}{{ Content }}</body>")
+        nav = self.write("partials/nav.html", "<nav>{{> logo }}{{ Title }}</nav>")
+        logo = self.write("partials/logo.html", '<img src="/logo.png">')
+        loaded = load_template(template, "/site/")
+        assert loaded.render(Title = "T", Content = "C") == '<body><nav><img src="/site/logo.png">T</nav>C</body>'
+        assert loaded.files == {template: ([nav], []), nav: ([logo], []), logo: ([], ["logo.png"])}
+
+    def test_nearest_partial_wins(self):
+        self.write("partials/footer.html", "site")
+        self.write("blog/partials/footer.html", "blog")
+        assert load_template(self.write("blog/_template.html", "{{> footer }}")).render() == "blog"
+        assert load_template(self.write("template.html", "{{> footer }}")).render() == "site"
+
+    def test_edited_partial_is_reloaded(self):
+        template = self.write("template.html", "{{> footer }}")
+        self.write("partials/footer.html", "old")
+        assert load_template(template).render() == "old"
+        self.write("partials/footer.html", "newer")
+        assert load_template(template).render() == "newer"
+
+    def test_partial_cycle(self):
+        template = self.write("template.html", "{{> a }}")
+        self.write("partials/a.html", "{{> b }}")
+        self.write("partials/b.html", "{{> a }}")
+        with self.assertRaises(Exception):
+            load_template(template)
@@ -1,5 +1,5 @@
 from enum import Enum
-from htmlnode import LeafNode, ParentNode
+from htmlnode import LeafNode, ParentNode, VoidNode
 
 class TextType(Enum):
     PARAGRAPH = None
@@ -11,6 +11,8 @@ class TextType(Enum):
     STRIKETHROUGH = "s"
 
 class TextNode:
+    __slots__ = ("text", "text_types", "url")
+
     def __init__(self, text, text_types, url = None):
         self.text = text
         self.text_types = text_types
@@ -28,16 +30,32 @@ class TextNode:
     def __repr__(self):
         return f"TextNode(\"{self.text}\", {self.text_types}, {self.url})"
     
-    def to_html_node(self):
+    def to_html_node(self, basepath = "/"):
+        # The innermost type becomes a LeafNode with the text in it, and
+        # every type outside that wraps it in a ParentNode. Untyped text is a
+        # bare LeafNode. Images are always innermost, and their text is their
+        # alt text, since an <img> can't have anything inside it.
         types = self.text_types
-        node = LeafNode(None, self.text)
-        while types != []:
-            current_type = types.pop()
+        if types == []:
+            return LeafNode(None, self.text)
+        node = None
+        for current_type in reversed(types):
             if current_type == TextType.LINK:
-                node = ParentNode("a", [node], {"href": self.url})
+                tag, props = "a", {"href": rebase_url(self.url, basepath)}
             elif current_type == TextType.IMAGE:
-                node = ParentNode("img", [node], {"src": self.url, "alt": ""})
+                node = VoidNode("img", {"src": rebase_url(self.url, basepath), "alt": self.text})
+                continue
+            else:
+                tag, props = current_type.value, None
+            if node == None:
+                node = LeafNode(tag, self.text, props)
             else:
-                node = ParentNode(current_type.value, [node])
+                node = ParentNode(tag, [node], props)
         return node
 
+def rebase_url(url, basepath):
+    # Site-absolute URLs ("/blog/") get pointed at basepath ("/site/blog/").
+    # Everything else (relative, external, protocol-relative) is left alone.
+    if basepath == "/" or not url.startswith("/") or url.startswith("//"):
+        return url
+    return basepath + url[1:]